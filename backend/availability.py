@@ -0,0 +1,210 @@
+"""Slotta Availability Engine
+
+Computes a master's free time from:
+- Active bookings (pending / confirmed / rescheduled) and their duration
+- Calendar blocks (manual or imported from Google Calendar)
+
+Busy time is kept in a sorted, merged interval index so that overlap
+checks and range lookups are binary searches instead of list scans.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, time, timezone
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo
+
+from reservations import BUCKET_MINUTES
+
+# Booking statuses that occupy the master's time
+ACTIVE_BOOKING_STATUSES = ["pending", "confirmed", "rescheduled"]
+
+# Defaults mirror the public booking page (Mon-Sat, 09:00-17:00, 30 min grid)
+DEFAULT_WORKING_HOURS = {"start": "09:00", "end": "17:00"}
+DEFAULT_SLOT_STEP_MINUTES = 30
+DEFAULT_CLOSED_WEEKDAYS = [6]  # Sunday
+
+# Longest booking we expect; bounds the lookback when loading bookings
+MAX_BOOKING_MINUTES = 24 * 60
+MAX_RANGE_DAYS = 62
+
+
+class IntervalIndex:
+    """Sorted, non-overlapping busy intervals with O(log n) lookups"""
+
+    def __init__(self, intervals: Iterable[Tuple[datetime, datetime]] = ()):
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+
+        for start, end in sorted(i for i in intervals if i[1] > i[0]):
+            if self._ends and start <= self._ends[-1]:
+                # Touching or overlapping: extend the previous interval
+                if end > self._ends[-1]:
+                    self._ends[-1] = end
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """Return True if [start, end) intersects any busy interval"""
+        # Last interval starting before `end` is the only candidate
+        i = bisect_left(self._starts, end) - 1
+        return i >= 0 and self._ends[i] > start
+
+    def busy_between(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Return busy intervals intersecting [start, end)"""
+        lo = bisect_right(self._ends, start)
+        hi = bisect_left(self._starts, end)
+        return list(zip(self._starts[lo:hi], self._ends[lo:hi]))
+
+    def next_free(self, start: datetime) -> datetime:
+        """Return the earliest instant >= start that is not busy"""
+        i = bisect_right(self._starts, start) - 1
+        if i >= 0 and self._ends[i] > start:
+            return self._ends[i]
+        return start
+
+
+def _parse_hhmm(value: str, fallback: str) -> time:
+    try:
+        hour, minute = map(int, str(value).split(':'))
+        return time(hour, minute)
+    except (TypeError, ValueError):
+        hour, minute = map(int, fallback.split(':'))
+        return time(hour, minute)
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Normalise a datetime to the naive-UTC form stored in MongoDB"""
+    if value.tzinfo is not None:
+        return (value - value.utcoffset()).replace(tzinfo=None)
+    return value
+
+
+def _master_zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or "UTC")
+    except Exception:
+        return ZoneInfo("UTC")
+
+
+def align_up(value: datetime) -> datetime:
+    """Round a naive-UTC instant up to the next BUCKET_MINUTES boundary"""
+    floored = value.replace(minute=value.minute - value.minute % BUCKET_MINUTES, second=0, microsecond=0)
+    return floored if floored == value else floored + timedelta(minutes=BUCKET_MINUTES)
+
+
+def free_slots(
+    index: IntervalIndex,
+    range_start: datetime,
+    range_end: datetime,
+    duration_minutes: int,
+    settings: Optional[dict] = None,
+    not_before: Optional[datetime] = None
+) -> List[datetime]:
+    """Return bookable start times for a service of `duration_minutes`
+
+    Working hours are read in the master's `timezone` setting and converted to
+    naive UTC. Candidate start times are laid on the master's slot grid from
+    the first bucket boundary at or after opening; each candidate is kept if
+    [start, start + duration) is free.
+    """
+    settings = settings or {}
+    hours = settings.get('working_hours') or DEFAULT_WORKING_HOURS
+    day_open = _parse_hhmm(hours.get('start'), DEFAULT_WORKING_HOURS['start'])
+    day_close = _parse_hhmm(hours.get('end'), DEFAULT_WORKING_HOURS['end'])
+    step_minutes = int(settings.get('slot_step_minutes') or DEFAULT_SLOT_STEP_MINUTES)
+    # Only offer starts on the reservation bucket grid, which claim_slot requires
+    step = timedelta(minutes=max(-(-step_minutes // BUCKET_MINUTES), 1) * BUCKET_MINUTES)
+    closed_weekdays = set(settings.get('closed_weekdays', DEFAULT_CLOSED_WEEKDAYS))
+    duration = timedelta(minutes=duration_minutes)
+    tz = _master_zone(settings.get('timezone'))
+
+    earliest = max(range_start, not_before) if not_before else range_start
+    slots: List[datetime] = []
+
+    # Working days are the master's local calendar days
+    day = range_start.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    last_day = range_end.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    while day <= last_day:
+        if day.weekday() not in closed_weekdays:
+            opening = align_up(to_naive_utc(datetime.combine(day, day_open, tzinfo=tz)))
+            closing = to_naive_utc(datetime.combine(day, day_close, tzinfo=tz))
+            candidate = opening
+            while candidate + duration <= closing and candidate < range_end:
+                if candidate >= earliest:
+                    if not index.overlaps(candidate, candidate + duration):
+                        slots.append(candidate)
+                        candidate += step
+                        continue
+                    # Jump straight past the blocking interval, staying on the grid
+                    free_at = align_up(index.next_free(candidate))
+                    if free_at > candidate:
+                        steps = -(-(free_at - opening) // step)
+                        candidate = opening + steps * step
+                        continue
+                candidate += step
+        day += timedelta(days=1)
+
+    return slots
+
+
+async def build_interval_index(
+    db,
+    master_id: str,
+    range_start: datetime,
+    range_end: datetime,
+    exclude_booking_id: Optional[str] = None
+) -> IntervalIndex:
+    """Load busy time for a master overlapping [range_start, range_end)"""
+
+    booking_query = {
+        "master_id": master_id,
+        "status": {"$in": ACTIVE_BOOKING_STATUSES},
+        "booking_date": {
+            "$gte": range_start - timedelta(minutes=MAX_BOOKING_MINUTES),
+            "$lt": range_end
+        }
+    }
+    if exclude_booking_id:
+        booking_query["id"] = {"$ne": exclude_booking_id}
+
+    bookings = await db.bookings.find(
+        booking_query,
+        {"_id": 0, "booking_date": 1, "duration_minutes": 1}
+    ).to_list(None)
+
+    blocks = await db.calendar_blocks.find(
+        {
+            "master_id": master_id,
+            "start_datetime": {"$lt": range_end},
+            "end_datetime": {"$gt": range_start}
+        },
+        {"_id": 0, "start_datetime": 1, "end_datetime": 1}
+    ).to_list(None)
+
+    intervals = [
+        (b['booking_date'], b['booking_date'] + timedelta(minutes=b.get('duration_minutes') or 0))
+        for b in bookings
+    ]
+    intervals.extend((b['start_datetime'], b['end_datetime']) for b in blocks)
+    return IntervalIndex(intervals)
+
+
+async def is_slot_available(
+    db,
+    master_id: str,
+    start: datetime,
+    duration_minutes: int,
+    exclude_booking_id: Optional[str] = None
+) -> bool:
+    """Check a single [start, start + duration) window against busy time"""
+    end = start + timedelta(minutes=duration_minutes)
+    index = await build_interval_index(db, master_id, start, end, exclude_booking_id)
+    return not index.overlaps(start, end)
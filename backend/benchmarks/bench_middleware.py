@@ -0,0 +1,168 @@
+"""Benchmark: BaseHTTPMiddleware vs pure-ASGI security middleware
+
+Builds the same app twice (CORS + security headers + rate limiting in front
+of /api/health and /api/masters/{slug}) once with the previous
+BaseHTTPMiddleware classes and once with asgi_middleware, then drives each
+directly through the ASGI interface (no sockets, so only framework and
+middleware cost is measured) and prints requests/sec.
+
+Both variants use the same in-memory GCRA limiter with a limit high enough
+never to trigger, so the difference is the middleware mechanism alone.
+
+    cd backend && python benchmarks/bench_middleware.py [requests] [concurrency]
+"""
+
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime
+
+from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from asgi_middleware import SecurityHeadersMiddleware, RateLimitMiddleware
+from models import MasterResponse
+from rate_limiter import Limit, RateLimiter
+
+BENCH_LIMIT = Limit("bench", 10 ** 9, 60)
+
+MASTER = {
+    "id": "3f1c1f7e-6a0b-4a43-9d1e-0c1f6b0d2a11",
+    "email": "sophia@slotta.app",
+    "name": "Sophia Brown",
+    "phone": "+1-555-0123",
+    "specialty": "Hair Styling & Coloring",
+    "bio": "Award-winning stylist with 10+ years experience.",
+    "photo_url": "https://images.unsplash.com/photo-1580618672591-eb180b1a973f?w=400",
+    "location": "Manhattan, NY",
+    "booking_slug": "sophiabrown",
+    "subscription_active": True,
+    "settings": {"timezone": "America/New_York", "daily_summary_enabled": True},
+    "created_at": datetime(2025, 1, 1),
+    "updated_at": datetime(2025, 6, 1),
+}
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "no-referrer"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        response.headers["Content-Security-Policy"] = "default-src 'self'"
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, limiter: RateLimiter, limit: Limit):
+        super().__init__(app)
+        self.limiter = limiter
+        self.limit = limit
+
+    async def dispatch(self, request: Request, call_next):
+        ip = request.client.host if request.client else "unknown"
+        cost = self.limiter.route_costs.cost(request.method, request.url.path)
+        decision = await self.limiter.hit(ip, self.limit, cost)
+        if not decision.allowed:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+        return await call_next(request)
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(prefix="/api")
+
+    @router.get("/health")
+    async def health_check():
+        return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+
+    @router.get("/masters/{booking_slug}", response_model=MasterResponse)
+    async def get_master_by_slug(booking_slug: str):
+        return MASTER
+
+    app.include_router(router)
+
+    limiter = RateLimiter(backend="memory")
+    if variant == "base":
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+        app.add_middleware(LegacyRateLimitMiddleware, limiter=limiter, limit=BENCH_LIMIT)
+    else:
+        app.add_middleware(SecurityHeadersMiddleware)
+        app.add_middleware(RateLimitMiddleware, limiter=limiter, limit=BENCH_LIMIT)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    return app
+
+
+async def request(app, path: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"origin", b"http://bench")],
+        "client": ("10.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    status = 0
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        # Like a real server: the body once, then block until the response is done
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            response_done.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path: str, total: int, concurrency: int) -> float:
+    # Warm up routing / validation caches
+    for _ in range(200):
+        assert await request(app, path) == 200
+
+    async def worker(count: int):
+        for _ in range(count):
+            await request(app, path)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(total // concurrency) for _ in range(concurrency)))
+    return (total // concurrency * concurrency) / (time.perf_counter() - started)
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    apps = {variant: build_app(variant) for variant in ("base", "asgi")}
+
+    print(f"requests: {total:,} per run, concurrency {concurrency}")
+    for path in ("/api/health", "/api/masters/sophiabrown"):
+        base = await measure(apps["base"], path, total, concurrency)
+        asgi = await measure(apps["asgi"], path, total, concurrency)
+        print(f"{path:<28} BaseHTTPMiddleware {base:>10,.0f} req/s   pure ASGI {asgi:>10,.0f} req/s   x{asgi / base:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""Benchmark: response_model validation vs trusted-read serialization
+
+Encodes a 1,000-booking page the way FastAPI does for `response_model=
+List[Booking]` (validate, jsonable_encoder, json.dumps) and the trusted way
+(TrustedSerializer + orjson), checks both produce the same JSON and prints
+CPU time per response.
+
+    cd backend && python benchmarks/bench_serialization.py [items] [repeats]
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from models import Booking, BookingStatus
+from serialization import FastJSONResponse, trusted
+
+
+def make_bookings(n: int, seed: int = 7) -> List[dict]:
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    docs = []
+    for _ in range(n):
+        booking_date = start + timedelta(minutes=15 * rng.randrange(50_000))
+        # Mongo keeps millisecond precision
+        created_at = start + timedelta(milliseconds=rng.randrange(10 ** 10))
+        docs.append(Booking(
+            master_id=str(uuid.uuid4()),
+            client_id=str(uuid.uuid4()),
+            service_id=str(uuid.uuid4()),
+            booking_date=booking_date,
+            duration_minutes=rng.choice([30, 60, 90, 120]),
+            service_price=round(rng.uniform(20, 300), 2),
+            slotta_amount=round(rng.uniform(5, 90), 2),
+            risk_score=rng.randrange(101),
+            status=rng.choice(list(BookingStatus)),
+            reschedule_deadline=booking_date - timedelta(hours=24),
+            notes=rng.choice([None, "Balayage touch-up", "Première visite — café ☕"]),
+            created_at=created_at,
+            updated_at=created_at
+        ).model_dump())
+    return docs
+
+
+def validated_body(adapter: TypeAdapter, docs: List[dict]) -> bytes:
+    # What FastAPI does for response_model=List[Booking]
+    value = adapter.validate_python(docs)
+    return JSONResponse(jsonable_encoder(adapter.dump_python(value, mode="json"))).body
+
+
+def trusted_body(docs: List[dict]) -> bytes:
+    return FastJSONResponse(trusted(Booking).dump_many(docs)).body
+
+
+def cpu_per_call(fn, repeats: int) -> float:
+    fn()
+    started = time.process_time()
+    for _ in range(repeats):
+        fn()
+    return (time.process_time() - started) / repeats
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    docs = make_bookings(n)
+    adapter = TypeAdapter(List[Booking])
+
+    assert json.loads(validated_body(adapter, docs)) == json.loads(trusted_body(docs)), "trusted JSON differs"
+
+    validated = cpu_per_call(lambda: validated_body(adapter, docs), repeats)
+    fast = cpu_per_call(lambda: trusted_body(docs), repeats)
+    print(f"items: {n:,} per response (identical JSON)")
+    print(f"response_model + json   {validated * 1000:8.2f} ms CPU/response")
+    print(f"trusted + orjson        {fast * 1000:8.2f} ms CPU/response   x{validated / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark: SlottaEngine batch pricing vs the scalar loop
+
+Prices 1M random rows both ways, asserts the results are bit-identical and
+prints throughput.
+
+    cd backend && python benchmarks/bench_slotta_batch.py [rows]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from slotta_engine import SlottaEngine
+
+
+def make_rows(n: int, seed: int = 7) -> dict:
+    rng = np.random.default_rng(seed)
+    # Whole cents plus values sitting on .xx5 rounding ties
+    prices = np.round(rng.uniform(1, 500, n), 2)
+    prices[::7] = np.round(rng.uniform(1, 500, len(prices[::7])), 3)
+    durations = rng.choice([15, 30, 45, 59, 60, 90, 120, 180, 181, 240, 300], n)
+    reliability = rng.integers(-1, 3, n).astype(np.int8)
+    cancellations = rng.integers(0, 5, n)
+    peak = rng.random(n) < 0.3
+    total = rng.integers(0, 40, n)
+    no_shows = np.minimum(rng.integers(0, 5, n), total)
+    lead = rng.uniform(0, 72, n)
+    lead[::5] = np.nan
+    lead[::11] = 0
+    return {
+        "prices": prices, "durations": durations, "reliability": reliability,
+        "cancellations": cancellations, "peak": peak, "total": total,
+        "no_shows": no_shows, "lead": lead
+    }
+
+
+def scalar_prices(rows: dict) -> np.ndarray:
+    tags = SlottaEngine.RELIABILITY_CODES
+    return np.array([
+        SlottaEngine.calculate_slotta(
+            price=float(p),
+            duration_minutes=int(d),
+            client_reliability=tags[r] if r >= 0 else 'unknown',
+            cancellations=int(c),
+            is_peak_slot=bool(k)
+        )
+        for p, d, r, c, k in zip(
+            rows["prices"], rows["durations"], rows["reliability"], rows["cancellations"], rows["peak"]
+        )
+    ])
+
+
+def scalar_risk(rows: dict) -> np.ndarray:
+    return np.array([
+        SlottaEngine.calculate_risk_score(
+            total_bookings=int(t),
+            completed_bookings=0,
+            no_shows=int(ns),
+            cancellations=int(c),
+            booking_lead_time_hours=None if np.isnan(lt) else float(lt)
+        )
+        for t, ns, c, lt in zip(rows["total"], rows["no_shows"], rows["cancellations"], rows["lead"])
+    ])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rows = make_rows(n)
+
+    batch, batch_s = timed(lambda: SlottaEngine.calculate_slotta_batch(
+        rows["prices"], rows["durations"], rows["reliability"], rows["cancellations"], rows["peak"]
+    ))
+    scalar, scalar_s = timed(lambda: scalar_prices(rows))
+    assert np.array_equal(batch.view(np.int64), scalar.view(np.int64)), "calculate_slotta_batch differs from scalar"
+
+    risk_batch, risk_batch_s = timed(lambda: SlottaEngine.calculate_risk_score_batch(
+        rows["total"], np.zeros(n), rows["no_shows"], rows["cancellations"], rows["lead"]
+    ))
+    risk_scalar, risk_scalar_s = timed(lambda: scalar_risk(rows))
+    assert np.array_equal(risk_batch, risk_scalar), "calculate_risk_score_batch differs from scalar"
+
+    tags = SlottaEngine.RELIABILITY_CODES
+    reliability_batch = SlottaEngine.determine_reliability_batch(rows["total"], rows["no_shows"])
+    reliability_scalar = SlottaEngine.reliability_codes(
+        SlottaEngine.determine_reliability(int(t), int(ns)) for t, ns in zip(rows["total"], rows["no_shows"])
+    )
+    assert np.array_equal(reliability_batch, reliability_scalar), "determine_reliability_batch differs from scalar"
+
+    print(f"rows: {n:,} (all results bit-identical)")
+    print(f"calculate_slotta      scalar {n / scalar_s:>14,.0f} rows/s   batch {n / batch_s:>14,.0f} rows/s   x{scalar_s / batch_s:.0f}")
+    print(f"calculate_risk_score  scalar {n / risk_scalar_s:>14,.0f} rows/s   batch {n / risk_batch_s:>14,.0f} rows/s   x{risk_scalar_s / risk_batch_s:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Per-Client Risk Features
+
+One `client_risk_features` document per client, updated with a single
+`$inc`/`$push` on every booking event (created, rescheduled, cancelled,
+completed, no-show). The booking path reads it with one `find_one`, so
+risk scoring never aggregates raw booking history.
+
+Document shape:
+    {
+        "client_id": str,
+        "bookings": int, "completed": int, "no_shows": int,
+        "cancellations": int, "reschedules": int,        # lifetime
+        "recent_outcomes": ["completed", "no-show", ...], # last ROLLING_WINDOW
+        "recent_lead_times": [hours, ...],                # last ROLLING_WINDOW
+        "decayed": {"bookings": float, "no_shows": float, "cancellations": float},
+        "per_master": {master_id: {"bookings": int, "completed": int, ...}},
+        "last_event_at": datetime
+    }
+
+Decayed counters are stored pre-scaled by 2 ** (t / half-life), measured
+from DECAY_EPOCH, so decay needs only `$inc`. Dividing two of them gives a
+decayed rate directly, and multiplying by 2 ** (-now / half-life) gives
+today's decayed count.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+ROLLING_WINDOW = int(os.getenv("CLIENT_RISK_ROLLING_WINDOW", "20"))
+HALF_LIFE_DAYS = float(os.getenv("CLIENT_RISK_HALF_LIFE_DAYS", "90"))
+DECAY_EPOCH = datetime(2024, 1, 1)
+
+OUTCOME_COMPLETED = "completed"
+OUTCOME_NO_SHOW = "no-show"
+OUTCOME_CANCELLED = "cancelled"
+
+_OUTCOME_COUNTERS = {
+    OUTCOME_COMPLETED: ("completed", None),
+    OUTCOME_NO_SHOW: ("no_shows", "no_shows"),
+    OUTCOME_CANCELLED: ("cancellations", "cancellations"),
+}
+
+
+def _decay_weight(at: datetime) -> float:
+    return 2 ** ((at - DECAY_EPOCH).total_seconds() / (HALF_LIFE_DAYS * 86400))
+
+
+def lead_time_hours(booking_date: datetime, booked_at: datetime) -> float:
+    return max((booking_date - booked_at).total_seconds() / 3600, 0.0)
+
+
+async def _apply(db, client_id: str, update: dict):
+    if not client_id:
+        return
+    try:
+        await db.client_risk_features.update_one({"client_id": client_id}, update, upsert=True)
+    except Exception as e:
+        # Drift is repaired by rebuild_client_features; never fail the request
+        log_error(logger, "client_risk_update_failed", client_id=client_id, error=str(e))
+
+
+async def record_client_booking(db, client_id: str, master_id: str, booking_date: datetime, at: Optional[datetime] = None):
+    at = at or datetime.utcnow()
+    await _apply(db, client_id, {
+        "$inc": {
+            "bookings": 1,
+            "decayed.bookings": _decay_weight(at),
+            f"per_master.{master_id}.bookings": 1
+        },
+        "$push": {"recent_lead_times": {"$each": [round(lead_time_hours(booking_date, at), 2)], "$slice": -ROLLING_WINDOW}},
+        "$set": {"last_event_at": at}
+    })
+
+
+async def record_client_reschedule(db, client_id: str, master_id: str, at: Optional[datetime] = None):
+    await _apply(db, client_id, {
+        "$inc": {"reschedules": 1, f"per_master.{master_id}.reschedules": 1},
+        "$set": {"last_event_at": at or datetime.utcnow()}
+    })
+
+
+async def record_client_outcome(
+    db,
+    client_id: str,
+    master_id: str,
+    outcome: str,
+    booked_at: Optional[datetime] = None,
+    at: Optional[datetime] = None
+):
+    """Record a completed / no-show / cancelled booking
+
+    The decayed counter is weighted by when the booking was made (its
+    `created_at`), like decayed.bookings, so decayed rates stay within 0-1.
+    """
+    at = at or datetime.utcnow()
+    counter, decayed_counter = _OUTCOME_COUNTERS[outcome]
+    inc = {counter: 1, f"per_master.{master_id}.{counter}": 1}
+    if decayed_counter:
+        inc[f"decayed.{decayed_counter}"] = _decay_weight(booked_at or at)
+    await _apply(db, client_id, {
+        "$inc": inc,
+        "$push": {"recent_outcomes": {"$each": [outcome], "$slice": -ROLLING_WINDOW}},
+        "$set": {"last_event_at": at}
+    })
+
+
+def _rate(numerator: float, denominator: float) -> float:
+    return min(numerator / denominator, 1.0) if denominator > 0 else 0.0
+
+
+def _median(values: list) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def summarize(doc: Optional[dict], master_id: Optional[str] = None, now: Optional[datetime] = None) -> dict:
+    """Turn a stored feature document into engine-ready features"""
+    doc = doc or {}
+    now = now or datetime.utcnow()
+    decayed = doc.get("decayed") or {}
+    outcomes = doc.get("recent_outcomes") or []
+    decay_now = 1 / _decay_weight(now)
+
+    features = {
+        "total_bookings": doc.get("bookings", 0),
+        "completed_bookings": doc.get("completed", 0),
+        "no_shows": doc.get("no_shows", 0),
+        "cancellations": doc.get("cancellations", 0),
+        "rolling_no_show_rate": _rate(outcomes.count(OUTCOME_NO_SHOW), len(outcomes)),
+        "rolling_cancellation_rate": _rate(outcomes.count(OUTCOME_CANCELLED), len(outcomes)),
+        "decayed_no_show_rate": _rate(decayed.get("no_shows", 0), decayed.get("bookings", 0)),
+        "decayed_cancellation_rate": _rate(decayed.get("cancellations", 0), decayed.get("bookings", 0)),
+        "decayed_bookings": round(decayed.get("bookings", 0) * decay_now, 4),
+        "typical_lead_time_hours": _median(doc.get("recent_lead_times") or []),
+        "last_event_at": doc.get("last_event_at")
+    }
+    if master_id:
+        per_master = (doc.get("per_master") or {}).get(master_id) or {}
+        features["master_bookings"] = per_master.get("bookings", 0)
+        features["master_no_show_rate"] = _rate(per_master.get("no_shows", 0), per_master.get("bookings", 0))
+        features["master_cancellation_rate"] = _rate(per_master.get("cancellations", 0), per_master.get("bookings", 0))
+    return features
+
+
+FEATURE_PROJECTION = {
+    "_id": 0, "bookings": 1, "completed": 1, "no_shows": 1, "cancellations": 1,
+    "recent_outcomes": 1, "recent_lead_times": 1, "decayed": 1, "last_event_at": 1
+}
+
+
+async def get_client_features(db, client_id: str, master_id: Optional[str] = None) -> dict:
+    """One indexed read; only the requested master's breakdown is fetched"""
+    projection = dict(FEATURE_PROJECTION)
+    if master_id:
+        projection[f"per_master.{master_id}"] = 1
+    doc = await db.client_risk_features.find_one({"client_id": client_id}, projection)
+    return summarize(doc, master_id)
+
+
+async def rebuild_client_features(db, client_id: Optional[str] = None) -> int:
+    """Recompute feature documents from raw bookings (backfill / reconciliation)"""
+    query = {"client_id": client_id} if client_id else {"client_id": {"$ne": None}}
+    docs: Dict[str, dict] = {}
+
+    cursor = db.bookings.find(
+        query,
+        {"_id": 0, "client_id": 1, "master_id": 1, "booking_date": 1, "status": 1, "created_at": 1, "updated_at": 1}
+    ).sort("created_at", 1)
+    async for booking in cursor:
+        doc = docs.setdefault(booking["client_id"], {
+            "client_id": booking["client_id"],
+            "bookings": 0, "completed": 0, "no_shows": 0, "cancellations": 0, "reschedules": 0,
+            "recent_outcomes": [], "recent_lead_times": [],
+            "decayed": {"bookings": 0.0, "no_shows": 0.0, "cancellations": 0.0},
+            "per_master": {}, "last_event_at": None
+        })
+        per_master = doc["per_master"].setdefault(booking["master_id"], {})
+        created_at = booking.get("created_at") or booking.get("booking_date")
+
+        doc["bookings"] += 1
+        per_master["bookings"] = per_master.get("bookings", 0) + 1
+        doc["decayed"]["bookings"] += _decay_weight(created_at)
+        if booking.get("booking_date"):
+            doc["recent_lead_times"] = (doc["recent_lead_times"] + [round(lead_time_hours(booking["booking_date"], created_at), 2)])[-ROLLING_WINDOW:]
+
+        status = booking.get("status")
+        if status in _OUTCOME_COUNTERS:
+            counter, decayed_counter = _OUTCOME_COUNTERS[status]
+            doc[counter] += 1
+            per_master[counter] = per_master.get(counter, 0) + 1
+            if decayed_counter:
+                doc["decayed"][decayed_counter] += _decay_weight(created_at)
+            doc["recent_outcomes"] = (doc["recent_outcomes"] + [status])[-ROLLING_WINDOW:]
+        elif status == "rescheduled":
+            doc["reschedules"] += 1
+            per_master["reschedules"] = per_master.get("reschedules", 0) + 1
+        doc["last_event_at"] = booking.get("updated_at") or created_at
+
+    operations = [UpdateOne({"client_id": cid}, {"$set": doc}, upsert=True) for cid, doc in docs.items()]
+    for i in range(0, len(operations), 1000):
+        await db.client_risk_features.bulk_write(operations[i:i + 1000], ordered=False)
+
+    log_info(logger, "client_risk_features_rebuilt", clients=len(operations), client_id=client_id)
+    return len(operations)
@@ -0,0 +1,310 @@
+"""Daily Summary Scheduler
+
+Each master document carries `next_summary_at`: the next UTC instant at
+which their summary is due (settings.summary_time in settings.timezone,
+default 08:00 UTC; None when settings.daily_summary_enabled is False).
+
+An in-process loop wakes every SUMMARY_TICK_SECONDS and pulls only the
+masters that are due, SUMMARY_BATCH_SIZE at a time, from the
+`next_summary_at` index. Per batch:
+
+- `next_summary_at` is advanced first, conditionally on the value just read,
+  together with a per-run claim token; only masters whose update matched are
+  sent, so when several workers read the same due masters each summary goes
+  out from exactly one of them
+- today's agendas for the whole batch come from one `$group` aggregation
+- totals come from master_stats in one `$in` query
+- clients and services are resolved with batched loaders
+
+Batches are sent via the bulk SendGrid path, up to
+SUMMARY_SEND_CONCURRENCY at once, while the next batch is being built.
+Summaries more than SUMMARY_MAX_LATENESS late, e.g. after downtime, are
+skipped rather than sent hours after the morning.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    from backports.zoneinfo import ZoneInfo
+
+from loaders import Loaders
+from services import email_service
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+DEFAULT_SUMMARY_TIME = "08:00"
+AGENDA_LIMIT = 100
+
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "500"))
+SUMMARY_SEND_CONCURRENCY = int(os.getenv("SUMMARY_SEND_CONCURRENCY", "4"))
+SUMMARY_TICK_SECONDS = float(os.getenv("SUMMARY_TICK_SECONDS", "60"))
+SUMMARY_MAX_LATENESS = timedelta(minutes=int(os.getenv("SUMMARY_MAX_LATENESS_MINUTES", "60")))
+
+MASTER_PROJECTION = {"_id": 0, "id": 1, "name": 1, "email": 1, "settings": 1, "next_summary_at": 1}
+
+
+def zone_or_utc(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or "UTC")
+    except Exception:
+        logger.warning(f"Invalid timezone {name}, falling back to UTC")
+        return ZoneInfo("UTC")
+
+
+def _summary_clock(settings: dict) -> time:
+    try:
+        hour, minute = map(int, (settings.get("summary_time") or DEFAULT_SUMMARY_TIME).split(":"))
+        return time(hour, minute)
+    except ValueError:
+        return time(8, 0)
+
+
+def next_summary_at(settings: Optional[dict], after: datetime) -> Optional[datetime]:
+    """Next naive-UTC send time strictly after `after` (naive UTC)"""
+    settings = settings or {}
+    if settings.get("daily_summary_enabled") is False:
+        return None
+
+    tz = zone_or_utc(settings.get("timezone"))
+    clock = _summary_clock(settings)
+    local_after = after.replace(tzinfo=timezone.utc).astimezone(tz)
+    for days in range(3):
+        candidate = datetime.combine(local_after.date() + timedelta(days=days), clock, tzinfo=tz)
+        if candidate > local_after:
+            return candidate.astimezone(timezone.utc).replace(tzinfo=None)
+    return None
+
+
+def local_day_bounds(settings: Optional[dict], at: datetime) -> Tuple[datetime, datetime]:
+    """Naive-UTC [start, end) of the master's local calendar day containing `at`"""
+    tz = zone_or_utc((settings or {}).get("timezone"))
+    local_date = at.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    start = datetime.combine(local_date, time(0, 0), tzinfo=tz)
+    end = datetime.combine(local_date + timedelta(days=1), time(0, 0), tzinfo=tz)
+    return (
+        start.astimezone(timezone.utc).replace(tzinfo=None),
+        end.astimezone(timezone.utc).replace(tzinfo=None)
+    )
+
+
+async def format_upcoming_bookings(bookings: List[dict], loaders: Loaders, tz: Optional[ZoneInfo] = None) -> List[dict]:
+    """Format a day's bookings for the summary email using batched lookups"""
+    services = await loaders.services.load_many(b['service_id'] for b in bookings)
+    clients = await loaders.clients.load_many(b['client_id'] for b in bookings)
+    upcoming = []
+    for b in bookings:
+        service = services.get(b['service_id'])
+        client = clients.get(b['client_id'])
+        start = b['booking_date']
+        if tz:
+            start = start.replace(tzinfo=timezone.utc).astimezone(tz)
+        upcoming.append({
+            "time": start.strftime("%H:%M"),
+            "client": client['name'] if client else "Client",
+            "service": service['name'] if service else "Service"
+        })
+    return upcoming
+
+
+def summary_totals(stats: Optional[dict]) -> Tuple[float, float]:
+    """(time_protected, pending_payouts) from a master_stats document"""
+    stats = stats or {}
+    time_protected = (stats.get("status_slotta") or {}).get("confirmed", 0)
+    pending_payouts = sum((stats.get("transaction_totals") or {}).values())
+    return round(time_protected, 2), round(pending_payouts, 2)
+
+
+async def build_summaries(db, masters: List[dict], now: datetime) -> List[dict]:
+    """Build send_daily_summaries payloads for a batch of masters"""
+    if not masters:
+        return []
+
+    windows = {m["id"]: local_day_bounds(m.get("settings"), now) for m in masters}
+    ids = list(windows)
+
+    agendas: Dict[str, List[dict]] = {}
+    pipeline = [
+        {"$match": {
+            "master_id": {"$in": ids},
+            "status": {"$in": ["confirmed", "pending"]},
+            "booking_date": {
+                "$gte": min(start for start, _ in windows.values()),
+                "$lt": max(end for _, end in windows.values())
+            }
+        }},
+        {"$match": {"$or": [
+            {"master_id": mid, "booking_date": {"$gte": start, "$lt": end}}
+            for mid, (start, end) in windows.items()
+        ]}},
+        {"$sort": {"booking_date": 1}},
+        {"$group": {
+            "_id": "$master_id",
+            "bookings": {"$push": {
+                "booking_date": "$booking_date",
+                "client_id": "$client_id",
+                "service_id": "$service_id"
+            }}
+        }},
+        {"$project": {"bookings": {"$slice": ["$bookings", AGENDA_LIMIT]}}}
+    ]
+    async for group in db.bookings.aggregate(pipeline):
+        agendas[group["_id"]] = group["bookings"]
+
+    stats = {}
+    async for doc in db.master_stats.find({"master_id": {"$in": ids}}, {"_id": 0}):
+        stats[doc["master_id"]] = doc
+
+    # One $in per collection for the whole batch; per-master formatting hits the cache
+    loaders = Loaders(db)
+    all_bookings = [b for bookings in agendas.values() for b in bookings]
+    await loaders.services.load_many(b['service_id'] for b in all_bookings)
+    await loaders.clients.load_many(b['client_id'] for b in all_bookings)
+
+    summaries = []
+    for master in masters:
+        time_protected, pending_payouts = summary_totals(stats.get(master["id"]))
+        summaries.append({
+            "to_email": master['email'],
+            "master_name": master['name'],
+            "upcoming_bookings": await format_upcoming_bookings(
+                agendas.get(master["id"], []),
+                loaders,
+                zone_or_utc((master.get("settings") or {}).get("timezone"))
+            ),
+            "time_protected": time_protected,
+            "pending_payouts": pending_payouts
+        })
+    return summaries
+
+
+async def schedule_unscheduled(db, now: Optional[datetime] = None) -> int:
+    """Set next_summary_at on masters that have never been scheduled"""
+    now = now or datetime.utcnow()
+    scheduled = 0
+    while True:
+        masters = await db.masters.find(
+            {"next_summary_at": {"$exists": False}},
+            {"_id": 0, "id": 1, "settings": 1}
+        ).limit(SUMMARY_BATCH_SIZE).to_list(SUMMARY_BATCH_SIZE)
+        if not masters:
+            return scheduled
+        await db.masters.bulk_write([
+            UpdateOne({"id": m["id"]}, {"$set": {"next_summary_at": next_summary_at(m.get("settings"), now)}})
+            for m in masters
+        ], ordered=False)
+        scheduled += len(masters)
+
+
+async def reschedule_master(db, master_id: str, settings: Optional[dict]):
+    """Recompute next_summary_at after a settings change"""
+    await db.masters.update_one(
+        {"id": master_id},
+        {"$set": {"next_summary_at": next_summary_at(settings, datetime.utcnow())}}
+    )
+
+
+async def run_due_summaries(db, now: Optional[datetime] = None) -> dict:
+    """Send every summary that is due at `now`"""
+    now = now or datetime.utcnow()
+    await schedule_unscheduled(db, now)
+
+    claim = str(uuid.uuid4())
+    semaphore = asyncio.Semaphore(SUMMARY_SEND_CONCURRENCY)
+    sends: List[asyncio.Task] = []
+    due_count = 0
+    late_count = 0
+
+    async def send(summaries: List[dict]) -> int:
+        try:
+            return await email_service.send_daily_summaries(summaries)
+        finally:
+            semaphore.release()
+
+    while True:
+        masters = await db.masters.find(
+            {"next_summary_at": {"$lte": now}},
+            MASTER_PROJECTION
+        ).sort("next_summary_at", 1).limit(SUMMARY_BATCH_SIZE).to_list(SUMMARY_BATCH_SIZE)
+        if not masters:
+            break
+
+        # Advance before sending so this batch drops out of the next query;
+        # the match on the old value is the claim against other workers
+        claimed = await db.masters.bulk_write([
+            UpdateOne(
+                {"id": m["id"], "next_summary_at": m["next_summary_at"]},
+                {"$set": {
+                    "next_summary_at": next_summary_at(m.get("settings"), now),
+                    "summary_claim": claim
+                }}
+            )
+            for m in masters
+        ], ordered=False)
+        if claimed.modified_count < len(masters):
+            ours = await db.masters.find(
+                {"id": {"$in": [m["id"] for m in masters]}, "summary_claim": claim},
+                {"_id": 0, "id": 1}
+            ).to_list(len(masters))
+            ours = {m["id"] for m in ours}
+            masters = [m for m in masters if m["id"] in ours]
+
+        on_time = [m for m in masters if now - m["next_summary_at"] <= SUMMARY_MAX_LATENESS]
+        due_count += len(on_time)
+        late_count += len(masters) - len(on_time)
+        if not on_time:
+            continue
+
+        summaries = await build_summaries(db, on_time, now)
+        await semaphore.acquire()
+        sends.append(asyncio.create_task(send(summaries)))
+
+    sent_count = sum(await asyncio.gather(*sends)) if sends else 0
+    result = {"due_count": due_count, "sent_count": sent_count, "late_skipped_count": late_count}
+    if due_count or late_count:
+        log_info(logger, "daily_summaries_sent", **result)
+    return result
+
+
+class DailySummaryScheduler:
+    """Background loop calling run_due_summaries every tick"""
+
+    def __init__(self):
+        self.db = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db):
+        if os.getenv("DAILY_SUMMARY_SCHEDULER_ENABLED", "true").lower() != "true":
+            log_info(logger, "daily_summary_scheduler_disabled")
+            return
+        self.db = db
+        self._task = asyncio.create_task(self._run())
+        log_info(logger, "daily_summary_scheduler_started", tick_seconds=SUMMARY_TICK_SECONDS)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await run_due_summaries(self.db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_error(logger, "daily_summary_tick_failed", error=str(e))
+            await asyncio.sleep(SUMMARY_TICK_SECONDS)
+
+# Global instance
+daily_summary_scheduler = DailySummaryScheduler()
@@ -0,0 +1,380 @@
+"""Slotta Database Migrations
+
+Versioned index / schema migrations applied from `startup_event`.
+
+Each migration is an async callable registered in MIGRATIONS with a
+monotonically increasing version. On startup every migration newer than the
+version recorded in `schema_migrations` is applied in order and the new
+version is stored.
+
+Several migrations rebuild derived data (dedupe clients, master stats,
+heatmaps, risk features) that live requests update with `$inc`, so they must
+not run twice concurrently. Workers therefore take a lease document in
+`schema_migrations` (owner + expiry, renewed while migrating); only the
+holder migrates and the other workers wait until the version reaches
+LATEST_VERSION. A holder that dies lets its lease expire after
+MIGRATION_LEASE_SECONDS and another worker takes over. `run_migrations`
+raises if the schema cannot be brought up to date, which fails startup:
+the unique indexes that guard bookings and clients come from migrations.
+
+To add a migration: append `(version, name, coroutine)` to MIGRATIONS.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from master_stats import rebuild_master_stats
+from daily_summaries import schedule_unscheduled
+from slotta_engine import SlottaEngine
+from demand_heatmap import rebuild_heatmaps
+from client_risk import rebuild_client_features
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+MIGRATIONS_DOC_ID = "slotta"
+MIGRATIONS_LEASE_ID = "slotta_lease"
+
+MIGRATION_LEASE_SECONDS = int(os.getenv("MIGRATION_LEASE_SECONDS", "120"))
+MIGRATION_WAIT_SECONDS = int(os.getenv("MIGRATION_WAIT_SECONDS", "900"))
+MIGRATION_POLL_SECONDS = 2
+
+
+# Baseline indexes for every collection the API queries
+INDEXES: Dict[str, List[IndexModel]] = {
+    "masters": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("booking_slug", ASCENDING)], unique=True, name="booking_slug_unique"),
+        IndexModel([("telegram_chat_id", ASCENDING)], sparse=True, name="telegram_chat_id"),
+        IndexModel([("stripe_customer_id", ASCENDING)], sparse=True, name="stripe_customer_id"),
+    ],
+    "services": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("master_id", ASCENDING), ("active", ASCENDING)], name="master_active"),
+    ],
+    "clients": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "bookings": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("master_id", ASCENDING), ("booking_date", DESCENDING)], name="master_booking_date"),
+        IndexModel([("master_id", ASCENDING), ("status", ASCENDING), ("booking_date", ASCENDING)], name="master_status_booking_date"),
+        IndexModel([("client_id", ASCENDING), ("booking_date", DESCENDING)], name="client_booking_date"),
+    ],
+    "transactions": [
+        IndexModel([("id", ASCENDING)], name="id"),
+        IndexModel([("master_id", ASCENDING), ("created_at", DESCENDING)], name="master_created_at"),
+        IndexModel([("client_id", ASCENDING), ("created_at", DESCENDING)], sparse=True, name="client_created_at"),
+        IndexModel([("booking_id", ASCENDING)], sparse=True, name="booking_id"),
+    ],
+    "calendar_blocks": [
+        IndexModel([("id", ASCENDING)], name="id"),
+        IndexModel([("master_id", ASCENDING), ("start_datetime", ASCENDING)], name="master_start"),
+        IndexModel([("master_id", ASCENDING), ("google_event_id", ASCENDING)], sparse=True, name="master_google_event"),
+    ],
+    "google_sync_logs": [
+        IndexModel([("master_id", ASCENDING), ("created_at", DESCENDING)], name="master_created_at"),
+    ],
+    "messages": [
+        IndexModel([("id", ASCENDING)], name="id"),
+        IndexModel([("master_id", ASCENDING), ("sent_at", DESCENDING)], name="master_sent_at"),
+        IndexModel([("client_id", ASCENDING), ("sent_at", DESCENDING)], name="client_sent_at"),
+    ],
+    "slot_reservations": [
+        IndexModel([("master_id", ASCENDING), ("bucket", ASCENDING)], unique=True, name="master_bucket_unique"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+        IndexModel([("reservation_id", ASCENDING)], name="reservation_id"),
+        IndexModel([("booking_id", ASCENDING)], sparse=True, name="booking_id"),
+    ],
+}
+
+
+async def _create_indexes(db, indexes: Dict[str, List[IndexModel]]):
+    for collection, models in indexes.items():
+        await db[collection].create_indexes(models)
+        log_info(logger, "db_indexes_ensured", collection=collection, count=len(models))
+
+
+# Client fields summed into the surviving document when duplicates are merged
+CLIENT_COUNTERS = ("total_bookings", "completed_bookings", "no_shows", "cancellations", "wallet_balance", "credit_balance")
+CLIENT_REFERENCES = ("bookings", "transactions", "messages")
+
+
+async def dedupe_clients(db) -> int:
+    """Merge clients sharing an email into the oldest one; returns how many were merged
+
+    The old get-or-create could insert two clients for one email under
+    concurrent first bookings, which would fail the unique email index.
+    """
+    merged = 0
+    groups = db.clients.aggregate([
+        {"$sort": {"created_at": 1}},
+        {"$group": {"_id": "$email", "ids": {"$push": "$id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    async for group in groups:
+        keep, duplicates = group["ids"][0], group["ids"][1:]
+        keeper = await db.clients.find_one({"id": keep}, {"_id": 0})
+        docs = await db.clients.find({"id": {"$in": duplicates}}, {"_id": 0}).to_list(None)
+
+        totals = {field: (keeper.get(field) or 0) + sum(d.get(field) or 0 for d in docs) for field in CLIENT_COUNTERS}
+        totals["reliability"] = SlottaEngine.determine_reliability(
+            total_bookings=totals["total_bookings"],
+            no_shows=totals["no_shows"]
+        )
+        if not keeper.get("stripe_customer_id"):
+            totals["stripe_customer_id"] = next((d["stripe_customer_id"] for d in docs if d.get("stripe_customer_id")), None)
+
+        await db.clients.update_one({"id": keep}, {"$set": totals})
+        for collection in CLIENT_REFERENCES:
+            await db[collection].update_many({"client_id": {"$in": duplicates}}, {"$set": {"client_id": keep}})
+        await db.client_risk_features.delete_many({"client_id": {"$in": duplicates}})
+        await db.clients.delete_many({"id": {"$in": duplicates}})
+        await rebuild_client_features(db, keep)
+        merged += len(duplicates)
+
+    if merged:
+        log_info(logger, "duplicate_clients_merged", merged=merged)
+    return merged
+
+
+async def migration_001_baseline_indexes(db):
+    # Before the unique clients.email index, which existing duplicates would fail
+    await dedupe_clients(db)
+    await _create_indexes(db, INDEXES)
+
+
+async def migration_002_master_stats(db):
+    await _create_indexes(db, {
+        "master_stats": [IndexModel([("master_id", ASCENDING)], unique=True, name="master_id_unique")]
+    })
+    await rebuild_master_stats(db)
+
+
+async def migration_003_wallet_checkpoints(db):
+    # Per-status slotta sums used for pending holds come from migration 2's rebuild
+    await _create_indexes(db, {
+        "wallet_checkpoints": [IndexModel([("master_id", ASCENDING), ("as_of", DESCENDING)], name="master_as_of")]
+    })
+
+
+# Keyset pagination sorts on (field, id); these replace the date-only indexes
+PAGINATION_INDEXES: Dict[str, List[IndexModel]] = {
+    "bookings": [
+        IndexModel([("master_id", ASCENDING), ("booking_date", DESCENDING), ("id", DESCENDING)], name="master_booking_date_id"),
+        IndexModel([("client_id", ASCENDING), ("booking_date", DESCENDING), ("id", DESCENDING)], name="client_booking_date_id"),
+    ],
+    "transactions": [
+        IndexModel([("master_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="master_created_at_id"),
+    ],
+    "calendar_blocks": [
+        IndexModel([("master_id", ASCENDING), ("start_datetime", ASCENDING), ("id", ASCENDING)], name="master_start_id"),
+    ],
+    "clients": [
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+}
+
+SUPERSEDED_INDEXES = {
+    "bookings": ["master_booking_date", "client_booking_date"],
+    "transactions": ["master_created_at"],
+    "calendar_blocks": ["master_start"],
+}
+
+
+async def migration_004_pagination_indexes(db):
+    await _create_indexes(db, PAGINATION_INDEXES)
+    for collection, names in SUPERSEDED_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+
+
+async def migration_005_outbox(db):
+    await _create_indexes(db, {
+        "outbox": [
+            IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+            IndexModel([("channel", ASCENDING), ("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="channel_status_next_attempt"),
+            IndexModel([("channel", ASCENDING), ("status", ASCENDING), ("locked_until", ASCENDING)], name="channel_status_locked_until"),
+            IndexModel([("booking_id", ASCENDING)], sparse=True, name="booking_id"),
+            # Delivered messages are kept for a week, dead letters until requeued
+            IndexModel(
+                [("completed_at", ASCENDING)],
+                expireAfterSeconds=7 * 24 * 3600,
+                partialFilterExpression={"status": "sent"},
+                name="sent_ttl"
+            ),
+        ]
+    })
+
+
+async def migration_006_daily_summary_schedule(db):
+    await _create_indexes(db, {
+        "masters": [IndexModel([("next_summary_at", ASCENDING)], name="next_summary_at")]
+    })
+    await schedule_unscheduled(db)
+
+
+async def migration_007_service_quote_matrix(db):
+    operations = []
+    async for service in db.services.find({}, {"_id": 0, "id": 1, "price": 1, "duration_minutes": 1}):
+        operations.append(UpdateOne(
+            {"id": service["id"]},
+            {"$set": {"slotta_quotes": SlottaEngine.build_quote_matrix(service["price"], service["duration_minutes"])}}
+        ))
+    for i in range(0, len(operations), 1000):
+        await db.services.bulk_write(operations[i:i + 1000], ordered=False)
+    log_info(logger, "service_quote_matrix_backfilled", services=len(operations))
+
+
+async def migration_008_demand_heatmaps(db):
+    await _create_indexes(db, {
+        "demand_heatmaps": [IndexModel([("master_id", ASCENDING)], unique=True, name="master_id_unique")]
+    })
+    await rebuild_heatmaps(db)
+
+
+async def migration_009_client_risk_features(db):
+    await _create_indexes(db, {
+        "client_risk_features": [IndexModel([("client_id", ASCENDING)], unique=True, name="client_id_unique")]
+    })
+    await rebuild_client_features(db)
+
+
+async def migration_010_rate_limits(db):
+    await _create_indexes(db, {
+        # Keys are idle once their theoretical arrival time has passed
+        "rate_limits": [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl")]
+    })
+
+
+async def migration_011_outbox_staged(db):
+    await _create_indexes(db, {
+        "outbox": [IndexModel(
+            [("created_at", ASCENDING)],
+            partialFilterExpression={"status": "pending_booking"},
+            name="staged_created_at"
+        )]
+    })
+
+
+MIGRATIONS = [
+    (1, "baseline_indexes", migration_001_baseline_indexes),
+    (2, "master_stats", migration_002_master_stats),
+    (3, "wallet_checkpoints", migration_003_wallet_checkpoints),
+    (4, "pagination_indexes", migration_004_pagination_indexes),
+    (5, "outbox", migration_005_outbox),
+    (6, "daily_summary_schedule", migration_006_daily_summary_schedule),
+    (7, "service_quote_matrix", migration_007_service_quote_matrix),
+    (8, "demand_heatmaps", migration_008_demand_heatmaps),
+    (9, "client_risk_features", migration_009_client_risk_features),
+    (10, "rate_limits", migration_010_rate_limits),
+    (11, "outbox_staged", migration_011_outbox_staged),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def get_schema_version(db) -> int:
+    doc = await db[MIGRATIONS_COLLECTION].find_one({"_id": MIGRATIONS_DOC_ID})
+    return doc.get("version", 0) if doc else 0
+
+
+async def _acquire_lease(db, owner: str) -> bool:
+    now = datetime.utcnow()
+    try:
+        await db[MIGRATIONS_COLLECTION].find_one_and_update(
+            {"_id": MIGRATIONS_LEASE_ID, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=MIGRATION_LEASE_SECONDS)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Held by another worker: the upsert collided with the live lease
+        return False
+
+
+async def _release_lease(db, owner: str):
+    await db[MIGRATIONS_COLLECTION].delete_one({"_id": MIGRATIONS_LEASE_ID, "owner": owner})
+
+
+async def _renew_lease(db, owner: str):
+    while True:
+        await asyncio.sleep(MIGRATION_LEASE_SECONDS / 3)
+        try:
+            await _acquire_lease(db, owner)
+        except Exception as e:
+            log_error(logger, "db_migration_lease_renew_failed", error=str(e))
+
+
+async def run_migrations(db) -> int:
+    """Bring the schema to LATEST_VERSION; returns it, raises if that fails
+
+    Exactly one worker applies pending migrations under the lease; the
+    others wait for the version to reach LATEST_VERSION.
+    """
+    owner = str(uuid.uuid4())
+    deadline = datetime.utcnow() + timedelta(seconds=MIGRATION_WAIT_SECONDS)
+
+    while True:
+        current = await get_schema_version(db)
+        if current >= LATEST_VERSION:
+            return current
+        if await _acquire_lease(db, owner):
+            break
+        if datetime.utcnow() > deadline:
+            raise RuntimeError(f"Timed out waiting for schema version {LATEST_VERSION} (at {current})")
+        await asyncio.sleep(MIGRATION_POLL_SECONDS)
+
+    renewal = asyncio.create_task(_renew_lease(db, owner))
+    try:
+        return await _apply_pending(db)
+    finally:
+        renewal.cancel()
+        await asyncio.gather(renewal, return_exceptions=True)
+        await _release_lease(db, owner)
+
+
+async def _apply_pending(db) -> int:
+    # Re-read under the lease: the previous holder may have finished meanwhile
+    current = await get_schema_version(db)
+
+    for version, name, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        started = datetime.utcnow()
+        try:
+            await migration(db)
+        except Exception as e:
+            log_error(logger, "db_migration_failed", version=version, name=name, error=str(e))
+            raise
+
+        await db[MIGRATIONS_COLLECTION].update_one(
+            {"_id": MIGRATIONS_DOC_ID},
+            {
+                "$max": {"version": version},
+                "$push": {"applied": {"version": version, "name": name, "applied_at": datetime.utcnow()}}
+            },
+            upsert=True
+        )
+        current = version
+        log_info(
+            logger,
+            "db_migration_applied",
+            version=version,
+            name=name,
+            duration_ms=int((datetime.utcnow() - started).total_seconds() * 1000)
+        )
+
+    return current
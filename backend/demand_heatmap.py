@@ -0,0 +1,164 @@
+"""Per-Master Demand Heatmap
+
+One `demand_heatmaps` document per master holds a time-of-week histogram of
+booked time: `counts[i]` is the number of bookings that occupied bucket `i`
+of the week (Monday 00:00 UTC = bucket 0). The default is 168 hourly
+buckets; DEMAND_BUCKET_MINUTES=5 gives 2016.
+
+Booking create / reschedule / cancel apply `$inc` to the buckets the booking
+covers. After each write the peak threshold (the PEAK_PERCENTILE of the
+non-empty buckets) is refreshed on the document, so the booking path decides
+`is_peak_slot` from a single-element `$slice` read without scanning the
+histogram. A bucket is peak only when its count is strictly above the
+threshold: with uniform or sparse demand the percentile equals every active
+bucket, and none of them should be priced as peak. Buckets are in UTC; the heatmap endpoint adds the master's
+current UTC offset so the UI can rotate them into local time.
+
+After changing DEMAND_BUCKET_MINUTES run POST /api/admin/rebuild-heatmaps.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+WEEK_MINUTES = 7 * 24 * 60
+BUCKET_MINUTES = int(os.getenv("DEMAND_BUCKET_MINUTES", "60"))
+BUCKETS = WEEK_MINUTES // BUCKET_MINUTES
+
+PEAK_PERCENTILE = float(os.getenv("DEMAND_PEAK_PERCENTILE", "0.8"))
+# Below this much recorded demand every slot is off-peak
+PEAK_MIN_TOTAL = int(os.getenv("DEMAND_PEAK_MIN_TOTAL", "20"))
+
+ACTIVE_BOOKING_STATUSES = ["pending", "confirmed", "rescheduled", "completed", "no-show"]
+
+
+def bucket_of(at: datetime) -> int:
+    """Time-of-week bucket of a naive-UTC datetime"""
+    minute_of_week = at.weekday() * 24 * 60 + at.hour * 60 + at.minute
+    return minute_of_week // BUCKET_MINUTES
+
+
+def covered_buckets(start: datetime, duration_minutes: int) -> List[int]:
+    """Buckets overlapped by [start, start + duration)"""
+    first = bucket_of(start)
+    span = max(1, -(-(start.minute % BUCKET_MINUTES + (duration_minutes or 0)) // BUCKET_MINUTES))
+    return [(first + i) % BUCKETS for i in range(min(span, BUCKETS))]
+
+
+def peak_threshold(counts: List[int]) -> Optional[int]:
+    nonzero = sorted(c for c in counts if c > 0)
+    if not nonzero:
+        return None
+    return nonzero[int(PEAK_PERCENTILE * (len(nonzero) - 1))]
+
+
+def _empty_heatmap(master_id: str) -> dict:
+    return {
+        "master_id": master_id,
+        "bucket_minutes": BUCKET_MINUTES,
+        "counts": [0] * BUCKETS,
+        "total": 0,
+        "peak_threshold": None,
+        "updated_at": datetime.utcnow()
+    }
+
+
+async def _increment(db, master_id: str, buckets: List[int], delta: int) -> Optional[dict]:
+    inc = {f"counts.{b}": delta for b in buckets}
+    inc["total"] = delta * len(buckets)
+    return await db.demand_heatmaps.find_one_and_update(
+        {"master_id": master_id, "bucket_minutes": BUCKET_MINUTES},
+        {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"_id": 0, "counts": 1, "peak_threshold": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def record_demand(db, master_id: str, start: datetime, duration_minutes: int, delta: int = 1):
+    """Add (delta=1) or remove (delta=-1) a booking's demand"""
+    if not master_id or not start:
+        return
+    buckets = covered_buckets(start, duration_minutes)
+    try:
+        heatmap = await _increment(db, master_id, buckets, delta)
+        if heatmap is None:
+            try:
+                await db.demand_heatmaps.insert_one(_empty_heatmap(master_id))
+            except DuplicateKeyError:
+                pass
+            heatmap = await _increment(db, master_id, buckets, delta)
+        if heatmap is None:
+            return
+
+        threshold = peak_threshold(heatmap["counts"])
+        if threshold != heatmap.get("peak_threshold"):
+            await db.demand_heatmaps.update_one(
+                {"master_id": master_id},
+                {"$set": {"peak_threshold": threshold}}
+            )
+    except Exception as e:
+        # Drift is repaired by rebuild_heatmaps; never fail the booking
+        log_error(logger, "demand_heatmap_update_failed", master_id=master_id, error=str(e))
+
+
+async def is_peak_slot(db, master_id: str, start: datetime) -> bool:
+    """Whether `start` falls in one of the master's busiest buckets"""
+    bucket = bucket_of(start)
+    heatmap = await db.demand_heatmaps.find_one(
+        {"master_id": master_id, "bucket_minutes": BUCKET_MINUTES},
+        {"_id": 0, "counts": {"$slice": [bucket, 1]}, "total": 1, "peak_threshold": 1}
+    )
+    if not heatmap or not heatmap.get("peak_threshold") or heatmap.get("total", 0) < PEAK_MIN_TOTAL:
+        return False
+    counts = heatmap.get("counts") or [0]
+    return counts[0] > heatmap["peak_threshold"]
+
+
+async def get_heatmap(db, master_id: str) -> dict:
+    heatmap = await db.demand_heatmaps.find_one(
+        {"master_id": master_id, "bucket_minutes": BUCKET_MINUTES},
+        {"_id": 0}
+    ) or _empty_heatmap(master_id)
+    threshold = heatmap.get("peak_threshold")
+    peak_enabled = bool(threshold) and heatmap.get("total", 0) >= PEAK_MIN_TOTAL
+    heatmap["peak_buckets"] = [
+        i for i, count in enumerate(heatmap["counts"]) if peak_enabled and count > threshold
+    ]
+    return heatmap
+
+
+async def rebuild_heatmaps(db, master_id: Optional[str] = None) -> int:
+    """Recompute heatmaps from raw bookings (backfill / reconciliation)"""
+    query = {"status": {"$in": ACTIVE_BOOKING_STATUSES}}
+    if master_id:
+        query["master_id"] = master_id
+
+    heatmaps = {}
+    cursor = db.bookings.find(query, {"_id": 0, "master_id": 1, "booking_date": 1, "duration_minutes": 1})
+    async for booking in cursor:
+        if not booking.get("booking_date"):
+            continue
+        heatmap = heatmaps.setdefault(booking["master_id"], _empty_heatmap(booking["master_id"]))
+        for b in covered_buckets(booking["booking_date"], booking.get("duration_minutes") or 0):
+            heatmap["counts"][b] += 1
+            heatmap["total"] += 1
+
+    if master_id and master_id not in heatmaps:
+        heatmaps[master_id] = _empty_heatmap(master_id)
+
+    operations = []
+    for mid, heatmap in heatmaps.items():
+        heatmap["peak_threshold"] = peak_threshold(heatmap["counts"])
+        operations.append(UpdateOne({"master_id": mid}, {"$set": heatmap}, upsert=True))
+    for i in range(0, len(operations), 500):
+        await db.demand_heatmaps.bulk_write(operations[i:i + 500], ordered=False)
+
+    log_info(logger, "demand_heatmaps_rebuilt", masters=len(operations), master_id=master_id)
+    return len(operations)
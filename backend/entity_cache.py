@@ -0,0 +1,167 @@
+"""Read-Through Entity Cache
+
+In-process LRU + TTL cache for master and service documents. Most traffic
+re-reads the same few thousand masters (auth, subscription checks, booking
+pages), so these lookups are served from memory instead of a `find_one` each.
+
+- masters are keyed by id; a slug index maps booking_slug -> id
+- every write path calls `invalidate_master` / `invalidate_service`, which
+  drops the entry and bumps the cache version; a load that started before
+  the bump is not stored, so a racing read can't put the old document back
+- entries expire after ENTITY_CACHE_TTL_SECONDS, which bounds staleness
+  across worker processes (invalidation is per process)
+- callers get a copy and may mutate it freely
+
+Configuration (.env):
+    ENTITY_CACHE_ENABLED=true
+    ENTITY_CACHE_TTL_SECONDS=30
+    ENTITY_CACHE_MAX_MASTERS=5000
+    ENTITY_CACHE_MAX_SERVICES=20000
+"""
+
+import os
+import copy
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL_SECONDS = float(os.getenv("ENTITY_CACHE_TTL_SECONDS", "30"))
+
+
+class LRUCache:
+    """Bounded LRU with per-entry expiry and hit/miss counters"""
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def set(self, key: str, value: Any, version: Optional[int] = None):
+        """Store `value` unless the cache was invalidated since `version` was read"""
+        if version is not None and version != self.version:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str):
+        self.version += 1
+        self.invalidations += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        found, value = self.get(key)
+        if found:
+            return value
+        version = self.version
+        value = await loader()
+        if value is not None:
+            self.set(key, value, version)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "version": self.version
+        }
+
+
+masters_cache = LRUCache("masters", int(os.getenv("ENTITY_CACHE_MAX_MASTERS", "5000")))
+master_slugs_cache = LRUCache("master_slugs", int(os.getenv("ENTITY_CACHE_MAX_MASTERS", "5000")))
+services_cache = LRUCache("services", int(os.getenv("ENTITY_CACHE_MAX_SERVICES", "20000")))
+
+
+async def cached_master(db, master_id: str) -> Optional[dict]:
+    """Full master document (including secrets) by id"""
+    if not CACHE_ENABLED:
+        return await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await masters_cache.get_or_load(
+        master_id,
+        lambda: db.masters.find_one({"id": master_id}, {"_id": 0})
+    )
+    return copy.deepcopy(master)
+
+
+async def cached_master_by_slug(db, booking_slug: str) -> Optional[dict]:
+    if not CACHE_ENABLED:
+        return await db.masters.find_one({"booking_slug": booking_slug}, {"_id": 0})
+
+    found, master_id = master_slugs_cache.get(booking_slug)
+    if found:
+        master = await cached_master(db, master_id)
+        # The slug may have changed since the alias was cached
+        if master and master.get("booking_slug") == booking_slug:
+            return master
+        master_slugs_cache.invalidate(booking_slug)
+
+    version = masters_cache.version
+    master = await db.masters.find_one({"booking_slug": booking_slug}, {"_id": 0})
+    if master:
+        masters_cache.set(master["id"], master, version)
+        master_slugs_cache.set(booking_slug, master["id"])
+    return copy.deepcopy(master)
+
+
+async def cached_service(db, service_id: str) -> Optional[dict]:
+    if not CACHE_ENABLED:
+        return await db.services.find_one({"id": service_id}, {"_id": 0})
+    service = await services_cache.get_or_load(
+        service_id,
+        lambda: db.services.find_one({"id": service_id}, {"_id": 0})
+    )
+    return copy.deepcopy(service)
+
+
+def invalidate_master(master_id: Optional[str]):
+    if master_id:
+        masters_cache.invalidate(master_id)
+
+
+def invalidate_service(service_id: Optional[str]):
+    if service_id:
+        services_cache.invalidate(service_id)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "enabled": CACHE_ENABLED,
+        "caches": {cache.name: cache.stats() for cache in (masters_cache, master_slugs_cache, services_cache)}
+    }
@@ -0,0 +1,115 @@
+"""Streaming Exports
+
+Streams bookings / transactions straight from a Motor cursor as CSV or
+NDJSON. Rows are pulled in bounded batches and each batch is encoded and
+yielded immediately, so memory stays flat regardless of export size and the
+first bytes reach the client before the query has finished.
+
+CSV exports are opened in spreadsheets, so text cells starting with a
+formula character (= + - @, tab, CR) are prefixed with `'` to be shown as
+text rather than evaluated (CSV injection via client names / notes).
+NDJSON is left untouched.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, List
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# kind -> (collection, date field, columns)
+EXPORT_KINDS = {
+    "bookings": ("bookings", "booking_date", [
+        "id", "master_id", "client_id", "service_id", "booking_date", "duration_minutes",
+        "service_price", "slotta_amount", "status", "stripe_payment_intent_id",
+        "payment_authorized", "risk_score", "reschedule_deadline", "notes",
+        "created_at", "updated_at"
+    ]),
+    "transactions": ("transactions", "created_at", [
+        "id", "booking_id", "master_id", "client_id", "type", "amount",
+        "stripe_transaction_id", "description", "created_at"
+    ]),
+}
+
+
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    value = _cell(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def _csv_rows(cursor, columns: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # Send the header before the first batch arrives
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    pending = 0
+
+    async for doc in cursor:
+        writer.writerow([_csv_cell(doc.get(c)) for c in columns])
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if pending:
+        yield buffer.getvalue().encode()
+
+
+async def _ndjson_rows(cursor, columns: List[str]) -> AsyncIterator[bytes]:
+    chunk: List[str] = []
+
+    async for doc in cursor:
+        chunk.append(json.dumps({c: _cell(doc.get(c)) for c in columns}, default=str))
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield ("\n".join(chunk) + "\n").encode()
+            chunk = []
+
+    if chunk:
+        yield ("\n".join(chunk) + "\n").encode()
+
+
+def export_stream(db, kind: str, fmt: str, master_id: str, date_from=None, date_to=None) -> AsyncIterator[bytes]:
+    """Build the byte stream for an export (kind/fmt must be validated by caller)"""
+    collection, date_field, columns = EXPORT_KINDS[kind]
+
+    query = {"master_id": master_id}
+    date_range = {}
+    if date_from:
+        date_range["$gte"] = date_from
+    if date_to:
+        date_range["$lt"] = date_to
+    if date_range:
+        query[date_field] = date_range
+
+    projection = {"_id": 0, **{c: 1 for c in columns}}
+    cursor = db[collection].find(query, projection).sort([(date_field, 1), ("id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+
+    if fmt == "csv":
+        return _csv_rows(cursor, columns)
+    return _ndjson_rows(cursor, columns)
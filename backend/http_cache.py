@@ -0,0 +1,70 @@
+"""HTTP Conditional Caching
+
+Strong ETags and Cache-Control for the public booking-page reads. The ETag
+is derived from what identifies a document version (id + `updated_at`,
+falling back to `created_at`), not from the response body, so a matching
+`If-None-Match` is answered with 304 before anything is serialized.
+
+Every write path to masters and services sets `updated_at`; derived fields
+that can change without a write (the service quote matrix) are covered by
+adding SlottaEngine.PRICING_VERSION to the tag.
+
+Cache-Control lets browsers keep the response for PUBLIC_CACHE_MAX_AGE and a
+shared cache / CDN for PUBLIC_CACHE_S_MAXAGE, serving stale copies while it
+revalidates in the background.
+
+Configuration (.env):
+    PUBLIC_CACHE_MAX_AGE=60
+    PUBLIC_CACHE_S_MAXAGE=300
+    PUBLIC_CACHE_STALE_WHILE_REVALIDATE=60
+"""
+
+import os
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "60"))
+PUBLIC_CACHE_S_MAXAGE = int(os.getenv("PUBLIC_CACHE_S_MAXAGE", "300"))
+PUBLIC_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("PUBLIC_CACHE_STALE_WHILE_REVALIDATE", "60"))
+
+PUBLIC_CACHE_CONTROL = (
+    f"public, max-age={PUBLIC_CACHE_MAX_AGE}, s-maxage={PUBLIC_CACHE_S_MAXAGE}, "
+    f"stale-while-revalidate={PUBLIC_CACHE_STALE_WHILE_REVALIDATE}"
+)
+
+
+def document_version(doc: dict) -> str:
+    stamp = doc.get("updated_at") or doc.get("created_at")
+    return stamp.isoformat() if isinstance(stamp, datetime) else str(stamp)
+
+
+def make_etag(kind: str, docs: Iterable[dict], *extra) -> str:
+    """Strong ETag over the (id, version) pairs of the documents in a response"""
+    digest = hashlib.sha1(kind.encode())
+    for doc in docs:
+        digest.update(f"|{doc.get('id')}@{document_version(doc)}".encode())
+    for part in extra:
+        digest.update(f"|{part}".encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set ETag / Cache-Control; returns a 304 to send instead if the client is current"""
+    headers = {"ETag": etag, "Cache-Control": PUBLIC_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,90 @@
+"""Batched Entity Loaders
+
+DataLoader-style batching for enrichment paths. Instead of one `find_one`
+per booking, every `load()` issued in the same event-loop tick is collected
+and resolved with a single `{"id": {"$in": [...]}}` query per collection.
+Results are memoized for the lifetime of the Loaders instance, so create one
+per request (or per job run) and drop it afterwards.
+
+Usage:
+    loaders = Loaders(db)
+    services = await loaders.services.load_many(b['service_id'] for b in bookings)
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+
+class BatchLoader:
+    """Coalesces id lookups on one collection into `$in` queries"""
+
+    def __init__(self, collection, key: str = "id", projection: Optional[dict] = None):
+        self.collection = collection
+        self.key = key
+        self.projection = projection or {"_id": 0}
+        self._cache: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self.query_count = 0
+
+    def prime(self, doc: dict):
+        """Seed the cache with a document the caller already holds"""
+        key = doc.get(self.key)
+        if key is None or key in self._cache:
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(doc)
+        self._cache[key] = future
+
+    async def load(self, key: str) -> Optional[dict]:
+        """Load one document by key (None if missing)"""
+        if key is None:
+            return None
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            self._pending.append(key)
+            if len(self._pending) == 1:
+                # Let every load() in this tick enqueue before dispatching
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return await future
+
+    async def load_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Load several documents; returns {key: doc} for those that exist"""
+        unique_keys = list(dict.fromkeys(k for k in keys if k is not None))
+        docs = await asyncio.gather(*(self.load(k) for k in unique_keys))
+        return {k: d for k, d in zip(unique_keys, docs) if d is not None}
+
+    async def _dispatch(self):
+        keys, self._pending = self._pending, []
+        if not keys:
+            return
+        try:
+            self.query_count += 1
+            docs = await self.collection.find(
+                {self.key: {"$in": keys}},
+                self.projection
+            ).to_list(None)
+        except Exception as e:
+            for k in keys:
+                self._cache.pop(k, None).set_exception(e)
+            return
+
+        found = {d.get(self.key): d for d in docs}
+        for k in keys:
+            future = self._cache[k]
+            if not future.done():
+                future.set_result(found.get(k))
+
+
+class Loaders:
+    """Per-request set of loaders for the core entity collections"""
+
+    def __init__(self, db):
+        self.db = db
+        self.masters = BatchLoader(db.masters, projection={
+            "_id": 0, "password_hash": 0, "google_access_token": 0, "google_refresh_token": 0
+        })
+        self.services = BatchLoader(db.services)
+        self.clients = BatchLoader(db.clients)
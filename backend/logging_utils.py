@@ -1,19 +1,135 @@
+"""Structured Logging
+
+`log_info` / `log_error` emit one JSON object per event. After
+`configure_logging()` (called by server.py) the pipeline is non-blocking:
+
+- the caller only builds a payload and enqueues it on a bounded queue;
+  JSON encoding (orjson when available) and stream / file I/O happen on the
+  QueueListener thread
+- when the queue is full, info records are dropped rather than blocking
+  the event loop; an error record evicts the oldest queued record instead.
+  The next record that gets through carries `log_dropped` with the count
+- high-volume info events can be sampled and rate limited per event
+  (LOG_EVENT_POLICIES); emitted records then carry `sample_rate` and, after
+  throttling, `suppressed` with the number skipped. Errors are never sampled
+
+Configuration (.env):
+    LOG_QUEUE_SIZE=10000
+    LOG_EVENT_POLICIES="booking_created=1.0:50,google_calendar_event_created=0.1:20"
+        # event=sample_rate:max_per_second (0 = no rate limit)
+"""
+
+import os
+import sys
 import json
+import time
+import queue
+import random
+import atexit
 import logging
+import logging.handlers
 from datetime import datetime
+from typing import Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+DEFAULT_EVENT_POLICIES = (
+    "booking_created=1.0:50,"
+    "booking_created_with_payment=1.0:50,"
+    "google_calendar_event_created=0.1:20"
+)
+
+
+def encode_json(payload: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(payload, default=str)
+
+
+class JsonMessage:
+    """Log message encoded lazily, on whichever thread formats the record"""
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+
+    def __str__(self) -> str:
+        return encode_json(self.payload)
+
+
+class EventPolicy:
+    """Sampling plus a token bucket of `per_second` for one event name"""
+
+    def __init__(self, sample_rate: float, per_second: float):
+        self.sample_rate = sample_rate
+        self.per_second = per_second
+        self.tokens = per_second
+        self.updated_at = time.monotonic()
+        self.suppressed = 0
+
+    def admit(self) -> Optional[dict]:
+        """Extra fields for an admitted record, or None to drop it"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        if self.per_second > 0:
+            now = time.monotonic()
+            self.tokens = min(self.per_second, self.tokens + (now - self.updated_at) * self.per_second)
+            self.updated_at = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return None
+            self.tokens -= 1
+
+        extra = {}
+        if self.sample_rate < 1.0:
+            extra["sample_rate"] = self.sample_rate
+        if self.suppressed:
+            extra["suppressed"] = self.suppressed
+            self.suppressed = 0
+        return extra
+
+
+def parse_event_policies(spec: Optional[str]) -> Dict[str, EventPolicy]:
+    policies = {}
+    for item in (spec or "").split(","):
+        event, _, rule = item.strip().partition("=")
+        if not event or not rule:
+            continue
+        rate, _, per_second = rule.partition(":")
+        try:
+            policies[event] = EventPolicy(float(rate), float(per_second or 0))
+        except ValueError:
+            continue
+    return policies
+
+
+_event_policies = parse_event_policies(os.getenv("LOG_EVENT_POLICIES", DEFAULT_EVENT_POLICIES))
 
 
 def _log(logger: logging.Logger, level: str, event: str, **fields):
+    log_level = logging.ERROR if level == "error" else logging.INFO
+    if not logger.isEnabledFor(log_level):
+        return
+    if log_level == logging.INFO:
+        policy = _event_policies.get(event)
+        if policy is not None:
+            extra = policy.admit()
+            if extra is None:
+                return
+            fields.update(extra)
+
     payload = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "event": event,
         **fields,
     }
-    message = json.dumps(payload, default=str)
-    if level == "error":
-        logger.error(message)
-    else:
-        logger.info(message)
+    logger.log(log_level, JsonMessage(payload))
 
 
 def log_info(logger: logging.Logger, event: str, **fields):
@@ -22,3 +138,105 @@ def log_info(logger: logging.Logger, event: str, **fields):
 
 def log_error(logger: logging.Logger, event: str, **fields):
     _log(logger, "error", event, **fields)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Encoding happens on the listener thread; only attach the drop count
+        if self.dropped:
+            record.log_dropped = self.dropped
+            self.dropped = 0
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if record.levelno >= logging.ERROR:
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                self.queue.put_nowait(record)
+                return
+            except (queue.Empty, queue.Full):
+                pass
+        self.dropped += 1
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Structured records as-is; plain records and drop counts wrapped in JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dropped = getattr(record, "log_dropped", 0)
+        if isinstance(record.msg, JsonMessage):
+            if not dropped and not record.exc_info:
+                return str(record.msg)
+            payload = dict(record.msg.payload)
+        else:
+            payload = {
+                "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "message": record.getMessage(),
+            }
+        if dropped:
+            payload["log_dropped"] = dropped
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return encode_json(payload)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = "INFO", log_file: Optional[str] = None):
+    """Route all logging through a bounded queue to a background listener"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = JsonLineFormatter()
+    sinks = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        sinks.append(logging.FileHandler(log_file))
+    for sink in sinks:
+        sink.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(BoundedQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE)))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(root.handlers[0].queue, *sinks, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    handler = next(
+        (h for h in logging.getLogger().handlers if isinstance(h, BoundedQueueHandler)), None
+    )
+    return {
+        "queued": handler.queue.qsize() if handler else 0,
+        "max_queue": LOG_QUEUE_SIZE,
+        "pending_dropped": handler.dropped if handler else 0,
+        "suppressed": {event: policy.suppressed for event, policy in _event_policies.items()},
+    }
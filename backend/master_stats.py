@@ -0,0 +1,146 @@
+"""Per-Master Booking Statistics
+
+Maintains one `master_stats` document per master, updated with `$inc` on
+every booking status transition and transaction insert, so analytics reads
+are a single indexed `find_one` regardless of history size.
+
+Document shape:
+    {
+        "master_id": str,
+        "total_bookings": int,
+        "status_counts": {"confirmed": int, "completed": int, "no-show": int, ...},
+        "total_slotta": float,          # sum of slotta_amount over all bookings
+        "status_slotta": {"confirmed": float, ...},  # slotta_amount per current status
+        "transaction_totals": {"wallet_credit": float, "payout": float, ...},
+        "updated_at": datetime
+    }
+
+`rebuild_master_stats` recomputes the documents from raw bookings and
+transactions with aggregation pipelines (reconciliation / backfill).
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+
+def _status_value(status) -> str:
+    return getattr(status, "value", status)
+
+
+async def _apply(db, master_id: str, inc: Dict[str, float]):
+    if not master_id or not inc:
+        return
+    try:
+        await db.master_stats.update_one(
+            {"master_id": master_id},
+            {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+    except Exception as e:
+        # Stats drift is repaired by rebuild_master_stats; never fail the request
+        log_error(logger, "master_stats_update_failed", master_id=master_id, error=str(e))
+
+
+async def record_booking_created(db, master_id: str, status, slotta_amount: float):
+    await _apply(db, master_id, {
+        "total_bookings": 1,
+        f"status_counts.{_status_value(status)}": 1,
+        f"status_slotta.{_status_value(status)}": slotta_amount or 0,
+        "total_slotta": slotta_amount or 0
+    })
+
+
+async def record_status_change(db, master_id: str, old_status, new_status, slotta_amount: float = 0):
+    old_status, new_status = _status_value(old_status), _status_value(new_status)
+    if old_status == new_status:
+        return
+    await _apply(db, master_id, {
+        f"status_counts.{old_status}": -1,
+        f"status_counts.{new_status}": 1,
+        f"status_slotta.{old_status}": -(slotta_amount or 0),
+        f"status_slotta.{new_status}": slotta_amount or 0
+    })
+
+
+async def record_transaction(db, transaction: dict):
+    await _apply(db, transaction.get("master_id"), {
+        f"transaction_totals.{_status_value(transaction.get('type'))}": transaction.get("amount", 0)
+    })
+
+
+async def get_master_stats(db, master_id: str) -> dict:
+    stats = await db.master_stats.find_one({"master_id": master_id}, {"_id": 0})
+    return stats or {
+        "master_id": master_id,
+        "total_bookings": 0,
+        "status_counts": {},
+        "status_slotta": {},
+        "total_slotta": 0.0,
+        "transaction_totals": {}
+    }
+
+
+async def rebuild_master_stats(db, master_id: Optional[str] = None) -> int:
+    """Recompute master_stats from bookings and transactions
+
+    Returns the number of master documents written.
+    """
+    booking_match = {"master_id": master_id} if master_id else {"master_id": {"$ne": None}}
+    transaction_match = {"master_id": master_id} if master_id else {"master_id": {"$ne": None}}
+
+    stats: Dict[str, dict] = {}
+
+    def entry(mid: str) -> dict:
+        return stats.setdefault(mid, {
+            "master_id": mid,
+            "total_bookings": 0,
+            "status_counts": {},
+            "status_slotta": {},
+            "total_slotta": 0.0,
+            "transaction_totals": {}
+        })
+
+    booking_groups = db.bookings.aggregate([
+        {"$match": booking_match},
+        {"$group": {
+            "_id": {"master_id": "$master_id", "status": "$status"},
+            "count": {"$sum": 1},
+            "slotta": {"$sum": {"$ifNull": ["$slotta_amount", 0]}}
+        }}
+    ])
+    async for group in booking_groups:
+        doc = entry(group["_id"]["master_id"])
+        doc["status_counts"][group["_id"]["status"]] = group["count"]
+        doc["status_slotta"][group["_id"]["status"]] = group["slotta"]
+        doc["total_bookings"] += group["count"]
+        doc["total_slotta"] += group["slotta"]
+
+    transaction_groups = db.transactions.aggregate([
+        {"$match": transaction_match},
+        {"$group": {
+            "_id": {"master_id": "$master_id", "type": "$type"},
+            "amount": {"$sum": "$amount"}
+        }}
+    ])
+    async for group in transaction_groups:
+        entry(group["_id"]["master_id"])["transaction_totals"][group["_id"]["type"]] = group["amount"]
+
+    if master_id:
+        entry(master_id)
+
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne({"master_id": mid}, {"$set": {**doc, "updated_at": now}}, upsert=True)
+        for mid, doc in stats.items()
+    ]
+    for i in range(0, len(operations), 1000):
+        await db.master_stats.bulk_write(operations[i:i + 1000], ordered=False)
+
+    log_info(logger, "master_stats_rebuilt", masters=len(operations), master_id=master_id)
+    return len(operations)
@@ -0,0 +1,282 @@
+"""Request and Outbound Call Metrics
+
+In-process counters, gauges and histograms rendered in the Prometheus text
+exposition format by the admin-protected `GET /metrics` endpoint:
+
+- http_requests_total{method,route,status}, http_request_duration_seconds
+  {method,route} and http_requests_in_flight, recorded by MetricsMiddleware.
+  `route` is the matched route template (/api/masters/{booking_slug}), never
+  the raw path, so label cardinality stays bounded
+- outbound_calls_total{service,method,outcome}, outbound_call_duration_seconds
+  {service,method} and outbound_calls_in_flight{service}, recorded by the
+  `@instrumented` decorator on StripeService / EmailService / TelegramService /
+  GoogleCalendarService methods
+- the existing stats() snapshots (SDK executor, password hasher, entity
+  caches, log queue), registered with `register_stats`
+
+Every observation happens on the event loop thread (the middleware and the
+decorated coroutines), so updates are plain dict / list increments with no
+locks; a histogram observation is one bisect and two additions.
+"""
+
+import time
+import functools
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OUTBOUND_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, labels: Labels, value: float):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]; cumulated on render
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames + ("le",), labels + (bound,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._stats: List[Tuple[str, Callable[[], dict], Optional[str]]] = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_stats(self, prefix: str, snapshot: Callable[[], dict], label: Optional[str] = None):
+        """Export the numeric fields of a stats() snapshot as `<prefix>_<field>`
+
+        With `label`, the snapshot maps label value -> flat stats dict
+        (e.g. sdk_executor.stats() keyed by provider).
+        """
+        self._stats.append((prefix, snapshot, label))
+
+    def _render_stats(self) -> List[str]:
+        lines = []
+        for prefix, snapshot, label in self._stats:
+            try:
+                groups = snapshot() if label else {None: snapshot()}
+            except Exception:
+                continue
+            samples: Dict[str, List[str]] = {}
+            for label_value, fields in groups.items():
+                label_text = _format_labels((label,), (label_value,)) if label else ""
+                for field, value in fields.items():
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    samples.setdefault(f"{prefix}_{field}", []).append(
+                        f"{prefix}_{field}{label_text} {_format_value(value)}"
+                    )
+            for name, series in samples.items():
+                lines.append(f"# TYPE {name} untyped")
+                lines.extend(series)
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.extend(self._render_stats())
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+http_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being served")
+
+outbound_calls = metrics.counter(
+    "outbound_calls_total", "Calls to external services", ("service", "method", "outcome")
+)
+outbound_call_duration = metrics.histogram(
+    "outbound_call_duration_seconds", "External service call latency", ("service", "method"),
+    buckets=OUTBOUND_BUCKETS
+)
+outbound_in_flight = metrics.gauge(
+    "outbound_calls_in_flight", "External service calls in progress", ("service",)
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_label(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Pure-ASGI request counter / latency histogram; add it outermost"""
+
+    def __init__(self, app, exclude_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started_at = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            # The router stores the matched route on the shared scope
+            route = route_label(scope)
+            method = scope["method"]
+            http_request_duration.observe((method, route), time.perf_counter() - started_at)
+            http_requests.inc((method, route, str(status)))
+
+
+def instrumented(fn):
+    """Time an outbound-call coroutine method, labelled Class / method
+
+    Services log and swallow their own errors, so a None / False result counts
+    as outcome="error" along with raised exceptions. Calls made while the
+    service is disabled (mock mode) are not recorded.
+    """
+    service = fn.__qualname__.split(".")[0]
+    method = fn.__name__
+    labels = (service, method)
+    in_flight_labels = (service,)
+
+    @functools.wraps(fn)
+    async def wrapper(self, *args, **kwargs):
+        if not getattr(self, "enabled", True):
+            return await fn(self, *args, **kwargs)
+
+        outcome = "error"
+        started_at = time.perf_counter()
+        outbound_in_flight.inc(in_flight_labels)
+        try:
+            result = await fn(self, *args, **kwargs)
+            if result is not None and result is not False:
+                outcome = "ok"
+            return result
+        finally:
+            outbound_in_flight.dec(in_flight_labels)
+            outbound_call_duration.observe(labels, time.perf_counter() - started_at)
+            outbound_calls.inc(labels + (outcome,))
+
+    return wrapper
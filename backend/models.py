@@ -96,9 +96,11 @@ class Service(MongoModel):
     duration_minutes: int
     price: float
     base_slotta: float = 0.0  # Calculated Slotta amount
+    slotta_quotes: Optional[dict] = None  # SlottaEngine.build_quote_matrix
     active: bool = True
     new_clients_only: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None
 
 class ServiceCreate(BaseModel):
     master_id: str
@@ -215,6 +217,26 @@ class CalendarBlockCreate(BaseModel):
     start_datetime: datetime
     end_datetime: datetime
 
+# Slotta quotes
+class SlottaQuoteBatch(BaseModel):
+    """Columnar batch quote request; optional columns default per row"""
+    prices: List[float]
+    durations: List[int]
+    client_reliability: Optional[List[str]] = None      # default 'new'
+    cancellations: Optional[List[int]] = None           # default 0
+    is_peak_slot: Optional[List[bool]] = None           # default False
+    # Risk scores are returned only when total_bookings is given
+    total_bookings: Optional[List[int]] = None
+    no_shows: Optional[List[int]] = None
+    booking_lead_time_hours: Optional[List[Optional[float]]] = None
+
+# Messaging
+class BroadcastCreate(BaseModel):
+    """Email a message to a master's clients (all clients if client_ids is omitted)"""
+    # Sent as a SendGrid substitution; those are capped at 10,000 bytes per recipient
+    message: str = Field(..., min_length=1, max_length=4000)
+    client_ids: Optional[List[str]] = None
+
 # Google Calendar
 class GoogleEventCreate(BaseModel):
     summary: str
@@ -0,0 +1,276 @@
+"""Notification Outbox
+
+Booking endpoints no longer call SendGrid / Telegram / Google inline.
+They write one `outbox` document per notification and return. A pool of
+asyncio workers drains the outbox:
+
+- Per-channel concurrency limits (OUTBOX_CONCURRENCY_<CHANNEL>)
+- Atomic claim with a lease, so several API processes can share the queue
+  and a crashed worker's entries are picked up again after the lease
+- Exponential backoff between attempts, dead-lettering after max attempts
+
+Notifications for a new booking are staged before the booking is inserted
+(status "pending_booking", invisible to the workers) and released right
+after it, so a crash between the two writes cannot lose them. Staged rows
+left behind by a crash are swept after OUTBOX_STAGED_GRACE_SECONDS:
+released when their booking exists, deleted when it was never written.
+
+Handlers are registered per channel by the application (see server.py):
+    outbox_worker.register("email", handler)   # handler(kind, payload) -> bool
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+STATUS_STAGED = "pending_booking"
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_SENT = "sent"
+STATUS_DEAD = "dead"
+
+DEFAULT_CONCURRENCY = {"email": 4, "telegram": 4, "google_calendar": 2}
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1.0"))
+STAGED_GRACE_SECONDS = int(os.getenv("OUTBOX_STAGED_GRACE_SECONDS", "60"))
+
+Handler = Callable[[str, dict], Awaitable[bool]]
+
+
+def outbox_message(channel: str, kind: str, payload: dict, booking_id: Optional[str] = None) -> dict:
+    """Build an outbox document (not yet persisted)"""
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "channel": channel,
+        "kind": kind,
+        "payload": payload,
+        "booking_id": booking_id,
+        "status": STATUS_PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "locked_until": None,
+        "last_error": None,
+        "created_at": now,
+        "completed_at": None
+    }
+
+
+def backoff_seconds(attempts: int) -> float:
+    return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+
+class OutboxWorker:
+    """Asyncio worker pool draining the outbox collection"""
+
+    def __init__(self):
+        self.db = None
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._stopping = False
+
+    def register(self, channel: str, handler: Handler):
+        self._handlers[channel] = handler
+
+    def _concurrency(self, channel: str) -> int:
+        env_value = os.getenv(f"OUTBOX_CONCURRENCY_{channel.upper()}")
+        return int(env_value) if env_value else DEFAULT_CONCURRENCY.get(channel, 2)
+
+    async def enqueue(self, db, messages: List[dict]):
+        """Persist messages in one round trip and wake the channel workers"""
+        if not messages:
+            return
+        await db.outbox.insert_many(messages, ordered=False)
+        self._wake(message["channel"] for message in messages)
+
+    async def stage(self, db, messages: List[dict]):
+        """Persist a new booking's messages before the booking itself
+
+        Staged messages are not delivered until `release(booking_id)` (or the
+        staged sweep) finds the booking written.
+        """
+        if not messages:
+            return
+        for message in messages:
+            message["status"] = STATUS_STAGED
+        await db.outbox.insert_many(messages, ordered=False)
+
+    async def release(self, db, booking_id: str):
+        """Hand a booking's staged messages to the workers"""
+        await db.outbox.update_many(
+            {"booking_id": booking_id, "status": STATUS_STAGED},
+            {"$set": {"status": STATUS_PENDING, "next_attempt_at": datetime.utcnow()}}
+        )
+        self._wake(self._wakeups)
+
+    async def discard(self, db, booking_id: str):
+        """Drop a booking's staged messages after its insert failed"""
+        await db.outbox.delete_many({"booking_id": booking_id, "status": STATUS_STAGED})
+
+    def _wake(self, channels):
+        for channel in set(channels):
+            event = self._wakeups.get(channel)
+            if event:
+                event.set()
+
+    def start(self, db):
+        self.db = db
+        self._stopping = False
+        for channel in self._handlers:
+            self._wakeups[channel] = asyncio.Event()
+            for _ in range(self._concurrency(channel)):
+                self._tasks.append(asyncio.create_task(self._run(channel)))
+        self._tasks.append(asyncio.create_task(self._sweep_staged()))
+        log_info(logger, "outbox_started", channels={c: self._concurrency(c) for c in self._handlers})
+
+    async def stop(self):
+        self._stopping = True
+        for event in self._wakeups.values():
+            event.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        log_info(logger, "outbox_stopped")
+
+    async def _sweep_staged(self):
+        while not self._stopping:
+            try:
+                if (await sweep_staged(self.db))["released"]:
+                    self._wake(self._wakeups)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_error(logger, "outbox_staged_sweep_failed", error=str(e))
+            await asyncio.sleep(STAGED_GRACE_SECONDS)
+
+    async def _claim(self, channel: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await self.db.outbox.find_one_and_update(
+            {
+                "channel": channel,
+                "$or": [
+                    {"status": STATUS_PENDING, "next_attempt_at": {"$lte": now}},
+                    {"status": STATUS_PROCESSING, "locked_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {"status": STATUS_PROCESSING, "locked_until": now + timedelta(seconds=LEASE_SECONDS)},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _run(self, channel: str):
+        wakeup = self._wakeups[channel]
+        while not self._stopping:
+            try:
+                message = await self._claim(channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_error(logger, "outbox_claim_failed", channel=channel, error=str(e))
+                message = None
+
+            if message is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._deliver(message)
+
+    async def _deliver(self, message: dict):
+        handler = self._handlers[message["channel"]]
+        error = None
+        try:
+            ok = await handler(message["kind"], message["payload"])
+            if not ok:
+                error = "handler returned failure"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e)
+
+        now = datetime.utcnow()
+        if error is None:
+            await self.db.outbox.update_one(
+                {"id": message["id"]},
+                {"$set": {"status": STATUS_SENT, "completed_at": now, "locked_until": None, "last_error": None}}
+            )
+            return
+
+        if message["attempts"] >= MAX_ATTEMPTS:
+            await self.db.outbox.update_one(
+                {"id": message["id"]},
+                {"$set": {"status": STATUS_DEAD, "completed_at": now, "locked_until": None, "last_error": error}}
+            )
+            log_error(logger, "outbox_dead_lettered", id=message["id"], channel=message["channel"], kind=message["kind"], error=error)
+            return
+
+        delay = backoff_seconds(message["attempts"])
+        await self.db.outbox.update_one(
+            {"id": message["id"]},
+            {"$set": {
+                "status": STATUS_PENDING,
+                "next_attempt_at": now + timedelta(seconds=delay),
+                "locked_until": None,
+                "last_error": error
+            }}
+        )
+        log_error(logger, "outbox_delivery_retry", id=message["id"], channel=message["channel"], attempts=message["attempts"], retry_in=delay, error=error)
+
+
+async def sweep_staged(db) -> dict:
+    """Resolve staged messages older than the grace period
+
+    Their request crashed between staging and release: deliver them when the
+    booking was written, delete them when it was not.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=STAGED_GRACE_SECONDS)
+    stale = {"status": STATUS_STAGED, "created_at": {"$lt": cutoff}}
+    booking_ids = await db.outbox.distinct("booking_id", stale)
+    if not booking_ids:
+        return {"released": 0, "discarded": 0}
+
+    written = await db.bookings.distinct("id", {"id": {"$in": booking_ids}})
+    released = await db.outbox.update_many(
+        {**stale, "booking_id": {"$in": written}},
+        {"$set": {"status": STATUS_PENDING, "next_attempt_at": datetime.utcnow()}}
+    )
+    discarded = await db.outbox.delete_many({**stale, "booking_id": {"$nin": written}})
+    counts = {"released": released.modified_count, "discarded": discarded.deleted_count}
+    log_info(logger, "outbox_staged_swept", **counts)
+    return counts
+
+
+async def requeue_dead(db, message_id: Optional[str] = None) -> int:
+    """Move dead-lettered messages back to pending"""
+    query = {"status": STATUS_DEAD}
+    if message_id:
+        query["id"] = message_id
+    result = await db.outbox.update_many(
+        query,
+        {"$set": {"status": STATUS_PENDING, "attempts": 0, "next_attempt_at": datetime.utcnow(), "completed_at": None}}
+    )
+    return result.modified_count
+
+
+# Global instance
+outbox_worker = OutboxWorker()
@@ -0,0 +1,101 @@
+"""Keyset (Cursor) Pagination
+
+List endpoints page on (sort_field, id) instead of skip/limit, so every page
+is an index range scan that costs the same as the first one. Cursors are
+opaque url-safe tokens encoding the last row's sort value and id.
+
+Usage:
+    page = await paginate(db.bookings, {"master_id": mid}, "booking_date", limit, cursor)
+    page["items"], page["next_cursor"]
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+
+MAX_PAGE_SIZE = 1000
+# count_documents stops here; larger totals are reported as a lower bound
+TOTAL_COUNT_CAP = 10000
+
+
+def encode_cursor(value, doc_id: str) -> str:
+    if isinstance(value, datetime):
+        payload = {"t": "dt", "v": value.isoformat(), "id": doc_id}
+    else:
+        payload = {"t": "raw", "v": value, "id": doc_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload["v"]
+        if payload.get("t") == "dt":
+            value = datetime.fromisoformat(value)
+        return value, payload["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def clamp_limit(limit: int) -> int:
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+async def paginate(
+    collection,
+    query: dict,
+    sort_field: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    direction: int = -1,
+    projection: Optional[dict] = None,
+    include_total: bool = False
+) -> dict:
+    """Fetch one page ordered by (sort_field, id) in `direction`
+
+    Returns {"items", "next_cursor", "has_more", "total"?}.
+    """
+    limit = clamp_limit(limit)
+    page_query = dict(query)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        op = "$lt" if direction < 0 else "$gt"
+        after = {"$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, "id": {op: last_id}}
+        ]}
+        page_query = {"$and": [query, after]} if query else after
+
+    docs = await collection.find(
+        page_query,
+        projection or {"_id": 0}
+    ).sort([(sort_field, direction), ("id", direction)]).limit(limit + 1).to_list(limit + 1)
+
+    has_more = len(docs) > limit
+    items = docs[:limit]
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last.get("id"))
+
+    page = {"items": items, "next_cursor": next_cursor, "has_more": has_more}
+    if include_total:
+        page["total"] = await collection.count_documents(query, limit=TOTAL_COUNT_CAP)
+        page["total_is_estimate"] = page["total"] >= TOTAL_COUNT_CAP
+    return page
+
+
+def set_page_headers(response, page: dict):
+    """Expose cursor metadata for endpoints that return a bare list"""
+    if page.get("next_cursor"):
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    if "total" in page:
+        response.headers["X-Total-Count"] = str(page["total"])
@@ -0,0 +1,218 @@
+"""GCRA Rate Limiter
+
+Generic Cell Rate Algorithm: a limit of `limit` units per `period` seconds
+is enforced with a single number per key, the theoretical arrival time
+(TAT). A request of cost `c` is allowed when
+
+    max(TAT, now) + c * period / limit - now <= period
+
+and then advances TAT to that value. That is O(1) work and one float of
+state per key, with the smoothness of a sliding window and bursts of up to
+`limit`.
+
+Stores:
+- MemoryStore: per-process LRU capped at RATE_LIMIT_MEMORY_MAX_KEYS; idle
+  keys fall off the end. Used for tests and as the fallback.
+- MongoStore: `rate_limits` collection shared by all workers. Each decision
+  is one atomic pipeline `find_one_and_update`; a TTL index on `expires_at`
+  (= TAT) deletes keys once they are idle.
+
+If the shared store errors, the limiter falls back to its in-memory store
+instead of failing requests.
+
+Configuration (.env):
+    RATE_LIMIT_BACKEND=mongo             # or memory
+    RATE_LIMIT_MEMORY_MAX_KEYS=100000
+    RATE_LIMIT_ROUTE_COSTS="POST /api/auth/login=5,POST /api/bookings=3"
+"""
+
+import os
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_error
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "mongo").lower()
+RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "100000"))
+
+# Cost of one request by "METHOD /path-prefix"; the longest matching prefix wins
+DEFAULT_ROUTE_COSTS = {
+    "POST /api/auth/login": 5,
+    "POST /api/auth/register": 5,
+    "POST /api/bookings": 3,
+    "GET /api/export": 10,
+    "POST /api/slotta/quote-batch": 5,
+}
+
+
+@dataclass(frozen=True)
+class Limit:
+    name: str
+    limit: int
+    period: float
+
+    @property
+    def emission_interval(self) -> float:
+        return self.period / self.limit
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    retry_after: float
+    remaining: int
+
+
+def parse_route_costs(spec: Optional[str]) -> Dict[str, int]:
+    costs = dict(DEFAULT_ROUTE_COSTS)
+    for item in (spec or "").split(","):
+        route, _, cost = item.strip().rpartition("=")
+        if route and cost.isdigit():
+            costs[" ".join(route.split())] = int(cost)
+    return costs
+
+
+class RouteCosts:
+
+    def __init__(self, costs: Dict[str, int]):
+        # Longest prefix first so "/api/bookings/x/no-show" beats "/api/bookings"
+        self._routes: List[Tuple[str, str, int]] = sorted(
+            ((route.split(" ", 1)[0].upper(), route.split(" ", 1)[1], cost) for route, cost in costs.items()),
+            key=lambda r: len(r[1]),
+            reverse=True
+        )
+
+    def cost(self, method: str, path: str) -> int:
+        for route_method, prefix, cost in self._routes:
+            if route_method == method and path.startswith(prefix):
+                return cost
+        return 1
+
+
+def _decide(tat: Optional[float], now: float, cost: int, limit: Limit) -> Tuple[bool, float, float]:
+    """(allowed, new_tat, retry_after) for one GCRA step"""
+    start = max(tat or now, now)
+    new_tat = start + cost * limit.emission_interval
+    if new_tat - now <= limit.period:
+        return True, new_tat, 0.0
+    return False, start, new_tat - limit.period - now
+
+
+def _remaining(tat: float, now: float, limit: Limit) -> int:
+    return max(int((limit.period - (tat - now)) // limit.emission_interval), 0)
+
+
+class MemoryStore:
+    """Process-local TAT store with LRU eviction"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    async def hit(self, key: str, cost: int, limit: Limit, now: float) -> Decision:
+        allowed, new_tat, retry_after = _decide(self._tats.get(key), now, cost, limit)
+        self._tats[key] = new_tat
+        self._tats.move_to_end(key)
+        while len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+        return Decision(allowed, retry_after, _remaining(new_tat, now, limit))
+
+    async def peek(self, key: str, limit: Limit, now: float) -> Decision:
+        tat = self._tats.get(key)
+        allowed, _, retry_after = _decide(tat, now, 1, limit)
+        return Decision(allowed, retry_after, _remaining(tat or now, now, limit))
+
+    async def reset(self, key: str):
+        self._tats.pop(key, None)
+
+
+class MongoStore:
+    """TAT store shared across workers via the `rate_limits` collection"""
+
+    def __init__(self, db):
+        self.collection = db.rate_limits
+
+    @staticmethod
+    def _pipeline(cost: int, limit: Limit, now: float) -> list:
+        start = {"$max": [{"$ifNull": ["$tat", now]}, now]}
+        new_tat = {"$add": [start, cost * limit.emission_interval]}
+        allowed = {"$lte": [{"$subtract": [new_tat, now]}, limit.period]}
+        return [
+            {"$set": {
+                "allowed": allowed,
+                "tat": {"$cond": [allowed, new_tat, start]}
+            }},
+            {"$set": {"expires_at": {"$toDate": {"$multiply": ["$tat", 1000]}}}}
+        ]
+
+    async def hit(self, key: str, cost: int, limit: Limit, now: float) -> Decision:
+        update = self._pipeline(cost, limit, now)
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": key}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost an upsert race with another worker; the document exists now
+            doc = await self.collection.find_one_and_update(
+                {"_id": key}, update, return_document=ReturnDocument.AFTER
+            )
+        tat = doc["tat"]
+        if doc["allowed"]:
+            return Decision(True, 0.0, _remaining(tat, now, limit))
+        return Decision(False, tat + cost * limit.emission_interval - limit.period - now, 0)
+
+    async def peek(self, key: str, limit: Limit, now: float) -> Decision:
+        doc = await self.collection.find_one({"_id": key}, {"tat": 1})
+        tat = doc.get("tat") if doc else None
+        allowed, _, retry_after = _decide(tat, now, 1, limit)
+        return Decision(allowed, retry_after, _remaining(tat or now, now, limit))
+
+    async def reset(self, key: str):
+        await self.collection.delete_one({"_id": key})
+
+
+class RateLimiter:
+
+    def __init__(self, backend: str = RATE_LIMIT_BACKEND):
+        self.backend = backend
+        self.fallback = MemoryStore()
+        self.store = self.fallback
+        self.route_costs = RouteCosts(parse_route_costs(os.getenv("RATE_LIMIT_ROUTE_COSTS")))
+
+    def start(self, db):
+        """Switch to the shared Mongo store (called once the app has a db)"""
+        if self.backend == "mongo":
+            self.store = MongoStore(db)
+
+    async def _call(self, method: str, *args) -> Decision:
+        try:
+            return await getattr(self.store, method)(*args)
+        except Exception as e:
+            if self.store is self.fallback:
+                raise
+            log_error(logger, "rate_limit_store_failed", operation=method, error=str(e))
+            return await getattr(self.fallback, method)(*args)
+
+    async def hit(self, key: str, limit: Limit, cost: int = 1) -> Decision:
+        return await self._call("hit", f"{limit.name}:{key}", cost, limit, time.time())
+
+    async def peek(self, key: str, limit: Limit) -> Decision:
+        """Would one more unit be allowed? Does not consume"""
+        return await self._call("peek", f"{limit.name}:{key}", limit, time.time())
+
+    async def reset(self, key: str, limit: Limit):
+        try:
+            await self.store.reset(f"{limit.name}:{key}")
+        except Exception as e:
+            log_error(logger, "rate_limit_store_failed", operation="reset", error=str(e))
+        await self.fallback.reset(f"{limit.name}:{key}")
+
+# Global instance
+rate_limiter = RateLimiter()
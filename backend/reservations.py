@@ -0,0 +1,154 @@
+"""Slot Reservations
+
+Atomic double-booking prevention. Before a booking is persisted (and before
+any Stripe hold is created) the caller claims every time bucket the booking
+covers in `slot_reservations`. A unique index on (master_id, bucket) makes
+the claim a single `insert_many` round trip that either succeeds for the
+whole window or fails with a duplicate key error - no locks involved.
+
+Start times must lie on the BUCKET_MINUTES grid: a window then shares a
+bucket with another only if the two really overlap (10:00-10:32 holds the
+10:30 bucket, and the next bookable start is 10:35). Unaligned starts would
+make back-to-back bookings collide on the bucket they both floor into.
+
+Unconfirmed claims carry a short `expires_at`, so a worker that dies between
+claim and confirm never blocks the slot for longer than the hold TTL.
+Indexes are declared in db_migrations.
+"""
+
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+BUCKET_MINUTES = int(os.getenv("SLOT_RESERVATION_BUCKET_MINUTES", "5"))
+HOLD_TTL_SECONDS = int(os.getenv("SLOT_RESERVATION_HOLD_TTL_SECONDS", "600"))
+
+# Keep confirmed reservations around for a day after the slot ends
+RETENTION_AFTER_END = timedelta(days=1)
+
+
+class SlotUnavailableError(Exception):
+    """Raised when another booking already holds part of the window"""
+
+
+class UnalignedSlotError(ValueError):
+    """Raised when a start time is not on the BUCKET_MINUTES grid"""
+
+
+def is_aligned(start: datetime) -> bool:
+    return start.second == 0 and start.microsecond == 0 and start.minute % BUCKET_MINUTES == 0
+
+
+def slot_buckets(start: datetime, duration_minutes: int) -> List[datetime]:
+    """Return the bucket start times covering [start, start + duration)"""
+    if not is_aligned(start):
+        raise UnalignedSlotError(f"must be on a {BUCKET_MINUTES}-minute boundary")
+    bucket = timedelta(minutes=BUCKET_MINUTES)
+    first = start
+    end = start + timedelta(minutes=max(duration_minutes, 1))
+
+    buckets = []
+    current = first
+    while current < end:
+        buckets.append(current)
+        current += bucket
+    return buckets
+
+
+async def claim_slot(
+    db,
+    master_id: str,
+    start: datetime,
+    duration_minutes: int,
+    held_by: Optional[str] = None
+) -> str:
+    """Atomically claim a booking window, returning the reservation id
+
+    Buckets already held by booking `held_by` are skipped, so a reschedule
+    can claim a window overlapping its current one while keeping it.
+
+    Raises SlotUnavailableError if any bucket is already held and
+    UnalignedSlotError if `start` is off the bucket grid.
+    """
+    reservation_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=HOLD_TTL_SECONDS)
+    buckets = slot_buckets(start, duration_minutes)
+    if held_by:
+        held = await db.slot_reservations.distinct(
+            "bucket", {"master_id": master_id, "booking_id": held_by, "bucket": {"$in": buckets}}
+        )
+        buckets = [b for b in buckets if b not in set(held)]
+    if not buckets:
+        return reservation_id
+
+    docs = [
+        {
+            "master_id": master_id,
+            "bucket": bucket,
+            "reservation_id": reservation_id,
+            "booking_id": None,
+            "created_at": now,
+            "expires_at": expires_at
+        }
+        for bucket in buckets
+    ]
+
+    try:
+        await db.slot_reservations.insert_many(docs, ordered=True)
+    except (BulkWriteError, DuplicateKeyError):
+        # Ordered insert stops at the first conflict; drop what we did claim
+        await release_slot(db, reservation_id)
+        log_info(logger, "slot_claim_conflict", master_id=master_id, start=start)
+        raise SlotUnavailableError()
+
+    return reservation_id
+
+
+async def confirm_slot(db, reservation_id: str, booking_id: str, end: datetime):
+    """Attach a claimed window to its booking and extend its lifetime"""
+    await db.slot_reservations.update_many(
+        {"reservation_id": reservation_id},
+        {"$set": {"booking_id": booking_id, "expires_at": end + RETENTION_AFTER_END}}
+    )
+
+
+async def move_booking_slot(db, reservation_id: str, booking_id: str, start: datetime, duration_minutes: int):
+    """Finish a reschedule: the booking keeps exactly its new window
+
+    `reservation_id` is a claim_slot(..., held_by=booking_id) for the new
+    window. Old buckets outside it are released only now, after the new
+    window is secured, so the booking is never left without a reservation.
+    """
+    end = start + timedelta(minutes=max(duration_minutes, 1))
+    await db.slot_reservations.delete_many({
+        "booking_id": booking_id,
+        "bucket": {"$nin": slot_buckets(start, duration_minutes)}
+    })
+    await db.slot_reservations.update_many(
+        {"$or": [{"reservation_id": reservation_id}, {"booking_id": booking_id}]},
+        {"$set": {"booking_id": booking_id, "expires_at": end + RETENTION_AFTER_END}}
+    )
+
+
+async def release_slot(db, reservation_id: str):
+    """Release a claim (booking failed or was never created)"""
+    try:
+        await db.slot_reservations.delete_many({"reservation_id": reservation_id})
+    except Exception as e:
+        log_error(logger, "slot_release_failed", reservation_id=reservation_id, error=str(e))
+
+
+async def release_booking_slot(db, booking_id: str):
+    """Release the window held by a booking (cancelled / rescheduled)"""
+    try:
+        await db.slot_reservations.delete_many({"booking_id": booking_id})
+    except Exception as e:
+        log_error(logger, "slot_release_failed", booking_id=booking_id, error=str(e))
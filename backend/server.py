@@ -1,17 +1,18 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, status, Depends, Request, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Optional
-import hashlib
+from typing import List, Optional, Tuple
+import uuid
 import jwt
 import stripe
 import sentry_sdk
@@ -26,21 +27,47 @@ from models import (
     Master, MasterCreate, MasterLogin, MasterResponse, Service, ServiceCreate,
     Client, ClientCreate, Booking, BookingCreate, BookingCreateWithPayment,
     Transaction, TransactionCreate, BookingStatus, ClientReliability,
-    CalendarBlockCreate, GoogleEventCreate, BookingReschedule
+    CalendarBlockCreate, GoogleEventCreate, BookingReschedule, BroadcastCreate,
+    SlottaQuoteBatch
 )
 from slotta_engine import SlottaEngine
-from services import email_service, telegram_service, stripe_service, google_calendar_service
+from availability import build_interval_index, free_slots, is_slot_available, to_naive_utc, MAX_RANGE_DAYS
+from reservations import SlotUnavailableError, UnalignedSlotError, BUCKET_MINUTES, is_aligned, claim_slot, confirm_slot, move_booking_slot, release_slot, release_booking_slot
+from db_migrations import run_migrations
+from loaders import Loaders
+from master_stats import record_booking_created, record_status_change, record_transaction, get_master_stats, rebuild_master_stats
+from wallet_ledger import get_wallet_totals
+from pagination import paginate, set_page_headers
+from exports import export_stream, EXPORT_FORMATS, EXPORT_KINDS
+from outbox import outbox_worker, outbox_message, requeue_dead
+from daily_summaries import build_summaries, run_due_summaries, reschedule_master, daily_summary_scheduler, zone_or_utc
+from demand_heatmap import record_demand, is_peak_slot, get_heatmap, rebuild_heatmaps
+from rate_limiter import rate_limiter, Limit
+from asgi_middleware import SecurityHeadersMiddleware, RateLimitMiddleware
+from serialization import FastJSONResponse, trusted, trusted_response
+from metrics import metrics, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from http_cache import make_etag, conditional_response
+from entity_cache import cached_master, cached_master_by_slug, cached_service, invalidate_master, invalidate_service, cache_stats
+from client_risk import (
+    record_client_booking, record_client_reschedule, record_client_outcome,
+    get_client_features, rebuild_client_features, lead_time_hours,
+    OUTCOME_COMPLETED, OUTCOME_NO_SHOW, OUTCOME_CANCELLED
+)
+from services import email_service, telegram_service, stripe_service, google_calendar_service, http_clients, sdk_executor, password_hasher
+from services.password_hasher import PasswordHasherSaturated
 
 # Environment
 APP_ENV = os.environ.get("APP_ENV", "development")
 if APP_ENV not in {"development", "staging", "production"}:
     raise RuntimeError("APP_ENV must be one of: development, staging, production")
 
-# Configure logging
+# Configure logging: records go through a bounded queue to a listener thread,
+# so log I/O (stderr, optional file in production) never blocks the event loop
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-logging.basicConfig(level=LOG_LEVEL, format='%(message)s')
+LOG_FILE = os.getenv("LOG_FILE")
+from logging_utils import log_info, log_error, configure_logging, stop_logging, logging_stats
+configure_logging(LOG_LEVEL, LOG_FILE if APP_ENV == "production" else None)
 logger = logging.getLogger(__name__)
-from logging_utils import log_info, log_error
 
 # Sentry
 SENTRY_DSN = os.getenv("SENTRY_DSN")
@@ -52,13 +79,6 @@ if SENTRY_DSN:
         integrations=[FastApiIntegration()],
     )
 
-# Log sink (optional file in production)
-LOG_FILE = os.getenv("LOG_FILE")
-if APP_ENV == "production" and LOG_FILE:
-    file_handler = logging.FileHandler(LOG_FILE)
-    file_handler.setFormatter(logging.Formatter('%(message)s'))
-    logger.addHandler(file_handler)
-
 # Environment-derived URLs
 FRONTEND_URL = os.getenv("FRONTEND_URL") or ("http://localhost:3000" if APP_ENV == "development" else "")
 CORS_ORIGINS_RAW = os.getenv("CORS_ORIGINS")
@@ -102,7 +122,7 @@ def require_active_subscription(master: dict):
         raise HTTPException(status_code=402, detail="Subscription required for this feature")
 
 async def require_active_subscription_for_master(master_id: str):
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     require_active_subscription(master)
@@ -112,7 +132,9 @@ async def get_or_create_stripe_customer(master: dict) -> str:
     customer_id = master.get("stripe_customer_id")
     if customer_id:
         return customer_id
-    customer = stripe.Customer.create(
+    customer = await sdk_executor.run(
+        "stripe",
+        stripe.Customer.create,
         email=master.get("email"),
         name=master.get("name"),
         metadata={"master_id": master.get("id")}
@@ -121,6 +143,7 @@ async def get_or_create_stripe_customer(master: dict) -> str:
         {"id": master["id"]},
         {"$set": {"stripe_customer_id": customer.id, "updated_at": datetime.utcnow()}}
     )
+    invalidate_master(master["id"])
     return customer.id
 
 async def get_valid_google_access_token(master: dict) -> Optional[str]:
@@ -153,19 +176,21 @@ async def get_valid_google_access_token(master: dict) -> Optional[str]:
                             "updated_at": datetime.utcnow()
                         }}
                     )
+                    invalidate_master(master["id"])
                     return refreshed.get("access_token")
                 return None
     return access_token
 
-async def delete_google_event_for_booking(booking: dict):
+async def delete_google_event_for_booking(booking: dict) -> bool:
+    """Delete a booking's Google event; returns False only on a retryable failure"""
     if not booking.get("google_event_id"):
-        return
-    master = await db.masters.find_one({"id": booking["master_id"]}, {"_id": 0})
+        return True
+    master = await cached_master(db, booking["master_id"])
     if not master:
-        return
+        return True
     access_token = await get_valid_google_access_token(master)
     if not access_token:
-        return
+        return True
     ok = await google_calendar_service.delete_event(
         access_token=access_token,
         event_id=booking["google_event_id"]
@@ -178,6 +203,74 @@ async def delete_google_event_for_booking(booking: dict):
         await log_google_sync(master["id"], "booking_delete", "success", f"Event {booking['google_event_id']} deleted")
     else:
         await log_google_sync(master["id"], "booking_delete", "failure", f"Failed to delete event {booking['google_event_id']}")
+    return ok
+
+async def create_google_event_for_booking(booking_id: str) -> bool:
+    """Create a booking's Google event; returns False only on a retryable failure"""
+    booking = await db.bookings.find_one({"id": booking_id}, {"_id": 0})
+    if not booking or booking.get("google_event_id"):
+        return True
+    if booking.get("status") not in ("pending", "confirmed", "rescheduled"):
+        return True
+    master = await cached_master(db, booking["master_id"])
+    if not master:
+        return True
+    access_token = await get_valid_google_access_token(master)
+    if not access_token:
+        return True
+    
+    service = await db.services.find_one({"id": booking["service_id"]}, {"_id": 0, "name": 1})
+    client = await db.clients.find_one({"id": booking["client_id"]}, {"_id": 0, "name": 1, "email": 1})
+    service_name = service["name"] if service else "Service"
+    client_name = client["name"] if client else "Client"
+    
+    event_id = await google_calendar_service.create_event(
+        access_token=access_token,
+        summary=f"{service_name} - {client_name}",
+        start_time=booking["booking_date"],
+        end_time=booking["booking_date"] + timedelta(minutes=booking.get("duration_minutes") or 60),
+        description=f"Client: {client_name}\nEmail: {(client or {}).get('email', 'N/A')}\nSlotta: €{booking.get('slotta_amount', 0)}"
+    )
+    if not event_id:
+        await log_google_sync(master["id"], "booking_create", "failure", "Failed to create event")
+        return False
+    
+    await db.bookings.update_one(
+        {"id": booking_id},
+        {"$set": {"google_event_id": event_id}}
+    )
+    await log_google_sync(master["id"], "booking_create", "success", f"Event {event_id} created")
+    return True
+
+def master_has_google_calendar(master: dict) -> bool:
+    return google_calendar_service.enabled and bool(
+        master.get("google_refresh_token") or master.get("google_access_token") or master.get("google_calendar_token")
+    )
+
+# ---------------------------------------------------------------------------
+# Notification outbox handlers (see outbox.py)
+# ---------------------------------------------------------------------------
+async def deliver_email(kind: str, payload: dict) -> bool:
+    if kind.startswith("_"):
+        raise ValueError(f"Unknown email kind: {kind}")
+    return await getattr(email_service, kind)(**payload)
+
+async def deliver_telegram(kind: str, payload: dict) -> bool:
+    if kind.startswith("_"):
+        raise ValueError(f"Unknown telegram kind: {kind}")
+    return await getattr(telegram_service, kind)(**payload)
+
+async def deliver_google_calendar(kind: str, payload: dict) -> bool:
+    if kind == "create_booking_event":
+        return await create_google_event_for_booking(payload["booking_id"])
+    if kind == "delete_booking_event":
+        booking = await db.bookings.find_one({"id": payload["booking_id"]}, {"_id": 0})
+        return await delete_google_event_for_booking(booking) if booking else True
+    raise ValueError(f"Unknown google_calendar kind: {kind}")
+
+outbox_worker.register("email", deliver_email)
+outbox_worker.register("telegram", deliver_telegram)
+outbox_worker.register("google_calendar", deliver_google_calendar)
 
 async def log_google_sync(master_id: str, action: str, status: str, message: str = ""):
     synced_count = 0
@@ -200,13 +293,19 @@ JWT_EXPIRATION_HOURS = 24 * 7  # 7 days
 # Security
 security = HTTPBearer(auto_error=False)
 
-def hash_password(password: str) -> str:
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+async def hash_password(password: str) -> str:
+    """Hash password with bcrypt on the password hashing pool"""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherSaturated:
+        raise HTTPException(status_code=503, detail="Server busy, try again shortly", headers={"Retry-After": "1"})
 
-def verify_password(password: str, password_hash: str) -> bool:
-    """Verify password against hash"""
-    return hash_password(password) == password_hash
+async def verify_password(password: str, password_hash: Optional[str]) -> Tuple[bool, bool]:
+    """Verify password against hash; returns (matches, needs_rehash)"""
+    try:
+        return await password_hasher.verify(password, password_hash)
+    except PasswordHasherSaturated:
+        raise HTTPException(status_code=503, detail="Server busy, try again shortly", headers={"Retry-After": "1"})
 
 def create_token(master_id: str, email: str) -> str:
     """Create JWT token"""
@@ -229,13 +328,12 @@ async def get_current_master(credentials: HTTPAuthorizationCredentials = Depends
         if not master_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        master = await db.masters.find_one(
-            {"id": master_id},
-            {"_id": 0, "password_hash": 0, "google_access_token": 0, "google_refresh_token": 0}
-        )
+        master = await cached_master(db, master_id)
         if not master:
             raise HTTPException(status_code=401, detail="Master not found")
         
+        for secret in ("password_hash", "google_access_token", "google_refresh_token"):
+            master.pop(secret, None)
         return master
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -243,7 +341,7 @@ async def get_current_master(credentials: HTTPAuthorizationCredentials = Depends
         raise HTTPException(status_code=401, detail="Invalid token")
 
 # Create FastAPI app
-app = FastAPI(title="Slotta API", version="1.0.0")
+app = FastAPI(title="Slotta API", version="1.0.0", default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # ---------------------------------------------------------------------------
@@ -255,17 +353,6 @@ if APP_ENV == "production":
 # ---------------------------------------------------------------------------
 # Security Layer: Secure headers (Helmet-style)
 # ---------------------------------------------------------------------------
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "no-referrer"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        response.headers["Content-Security-Policy"] = "default-src 'self'"
-        return response
-
 app.add_middleware(SecurityHeadersMiddleware)
 
 # ---------------------------------------------------------------------------
@@ -276,41 +363,20 @@ RATE_LIMIT_MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "120"))
 BRUTE_FORCE_WINDOW_SECONDS = int(os.getenv("BRUTE_FORCE_WINDOW_SECONDS", "300"))
 BRUTE_FORCE_MAX_ATTEMPTS = int(os.getenv("BRUTE_FORCE_MAX_ATTEMPTS", "6"))
 
-_rate_limit_store = {}
-_brute_force_store = {}
+RATE_LIMIT = Limit("ip", RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW_SECONDS)
+LOGIN_LIMIT = Limit("login", BRUTE_FORCE_MAX_ATTEMPTS, BRUTE_FORCE_WINDOW_SECONDS)
 
 def _get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        ip = _get_client_ip(request)
-        now = datetime.utcnow().timestamp()
-        bucket = _rate_limit_store.get(ip, [])
-        bucket = [ts for ts in bucket if now - ts < RATE_LIMIT_WINDOW_SECONDS]
-        if len(bucket) >= RATE_LIMIT_MAX_REQUESTS:
-            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
-        bucket.append(now)
-        _rate_limit_store[ip] = bucket
-        return await call_next(request)
-
-app.add_middleware(RateLimitMiddleware)
-
-def _record_login_attempt(ip: str, email: str):
-    key = f"{ip}:{email}"
-    now = datetime.utcnow().timestamp()
-    attempts = _brute_force_store.get(key, [])
-    attempts = [ts for ts in attempts if now - ts < BRUTE_FORCE_WINDOW_SECONDS]
-    attempts.append(now)
-    _brute_force_store[key] = attempts
-
-def _is_login_blocked(ip: str, email: str) -> bool:
-    key = f"{ip}:{email}"
-    now = datetime.utcnow().timestamp()
-    attempts = _brute_force_store.get(key, [])
-    attempts = [ts for ts in attempts if now - ts < BRUTE_FORCE_WINDOW_SECONDS]
-    _brute_force_store[key] = attempts
-    return len(attempts) >= BRUTE_FORCE_MAX_ATTEMPTS
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, limit=RATE_LIMIT)
+
+async def _record_login_attempt(ip: str, email: str):
+    await rate_limiter.hit(f"{ip}:{email}", LOGIN_LIMIT)
+
+async def _is_login_blocked(ip: str, email: str) -> bool:
+    decision = await rate_limiter.peek(f"{ip}:{email}", LOGIN_LIMIT)
+    return not decision.allowed
 
 def _sanitize_text(value: Optional[str]) -> Optional[str]:
     if value is None:
@@ -358,7 +424,7 @@ async def register_master(master_input: MasterCreate):
     master_data['email'] = email
     master_data['name'] = name
     master_data['booking_slug'] = booking_slug
-    master_data['password_hash'] = hash_password(password)
+    master_data['password_hash'] = await hash_password(password)
     
     master = Master(**master_data)
     await db.masters.insert_one(master.model_dump())
@@ -382,20 +448,38 @@ async def login_master(login_data: MasterLogin, request: Request):
     """Login master and get JWT token"""
     email = (_sanitize_text(login_data.email) or "").lower()
     ip = _get_client_ip(request)
-    if _is_login_blocked(ip, email):
+    if await _is_login_blocked(ip, email):
         raise HTTPException(status_code=429, detail="Too many login attempts. Try again later.")
     
     # Find master by email
     master = await db.masters.find_one({"email": email})
     if not master:
-        _record_login_attempt(ip, email)
+        # Same bcrypt cost as a wrong password, so timing does not reveal accounts
+        try:
+            await password_hasher.verify_dummy(login_data.password)
+        except PasswordHasherSaturated:
+            raise HTTPException(status_code=503, detail="Server busy, try again shortly", headers={"Retry-After": "1"})
+        await _record_login_attempt(ip, email)
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not master.get('password_hash') or not verify_password(login_data.password, master['password_hash']):
-        _record_login_attempt(ip, email)
+    matches, needs_rehash = await verify_password(login_data.password, master.get('password_hash'))
+    if not matches:
+        await _record_login_attempt(ip, email)
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    _brute_force_store.pop(f"{ip}:{email}", None)
+    if needs_rehash:
+        # Upgrade legacy SHA-256 / lower-cost bcrypt hashes while we have the plaintext;
+        # best effort, a busy hashing pool must not fail a correct login
+        try:
+            await db.masters.update_one(
+                {"id": master['id']},
+                {"$set": {"password_hash": await password_hasher.rehash(login_data.password), "updated_at": datetime.utcnow()}}
+            )
+            invalidate_master(master['id'])
+            log_info(logger, "auth_password_rehashed", master_id=master['id'])
+        except PasswordHasherSaturated:
+            log_info(logger, "auth_password_rehash_skipped", master_id=master['id'])
+    await rate_limiter.reset(f"{ip}:{email}", LOGIN_LIMIT)
     
     # Generate token
     token = create_token(master['id'], master['email'])
@@ -437,21 +521,24 @@ async def create_master(master_input: MasterCreate):
     logger.info(f"✅ Master created: {master.name} ({master.booking_slug})")
     return master
 
-@api_router.get("/masters/{booking_slug}", response_model=Master)
-async def get_master_by_slug(booking_slug: str):
-    """Get master by booking slug"""
+@api_router.get("/masters/{booking_slug}", response_model=MasterResponse)
+async def get_master_by_slug(booking_slug: str, request: Request, response: Response):
+    """Get master by booking slug (public booking page; ETag / 304 aware)"""
     
-    master = await db.masters.find_one({"booking_slug": booking_slug}, {"_id": 0})
+    master = await cached_master_by_slug(db, booking_slug)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
+    not_modified = conditional_response(request, response, make_etag("master", [master]))
+    if not_modified:
+        return not_modified
     return master
 
 @api_router.get("/masters/id/{master_id}", response_model=Master)
 async def get_master(master_id: str):
     """Get master by ID"""
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -461,6 +548,13 @@ async def get_master(master_id: str):
 # SERVICE ENDPOINTS
 # ============================================================================
 
+def with_quote_matrix(service: dict) -> dict:
+    """Fill in the quote matrix for services stored before it existed (or after a pricing change)"""
+    matrix = service.get('slotta_quotes')
+    if not matrix or matrix.get('version') != SlottaEngine.PRICING_VERSION:
+        service['slotta_quotes'] = SlottaEngine.build_quote_matrix(service['price'], service['duration_minutes'])
+    return service
+
 @api_router.post("/services", response_model=Service, status_code=status.HTTP_201_CREATED)
 async def create_service(service_input: ServiceCreate, current_master: dict = Depends(get_current_master)):
     """Create a new service"""
@@ -478,7 +572,8 @@ async def create_service(service_input: ServiceCreate, current_master: dict = De
     
     service = Service(
         **service_input.model_dump(),
-        base_slotta=base_slotta
+        base_slotta=base_slotta,
+        slotta_quotes=SlottaEngine.build_quote_matrix(service_input.price, service_input.duration_minutes)
     )
     
     await db.services.insert_one(service.model_dump())
@@ -487,25 +582,32 @@ async def create_service(service_input: ServiceCreate, current_master: dict = De
     return service
 
 @api_router.get("/services/master/{master_id}", response_model=List[Service])
-async def get_master_services(master_id: str, active_only: bool = True):
-    """Get all services for a master"""
+async def get_master_services(master_id: str, request: Request, response: Response, active_only: bool = True):
+    """Get all services for a master (public booking page; ETag / 304 aware)"""
     
     query = {"master_id": master_id}
     if active_only:
         query["active"] = True
     
     services = await db.services.find(query, {"_id": 0}).to_list(100)
-    return services
+    etag = make_etag("services", services, master_id, active_only, SlottaEngine.PRICING_VERSION)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+    return [with_quote_matrix(s) for s in services]
 
 @api_router.get("/services/{service_id}", response_model=Service)
-async def get_service(service_id: str):
-    """Get service by ID"""
+async def get_service(service_id: str, request: Request, response: Response):
+    """Get service by ID (ETag / 304 aware)"""
     
-    service = await db.services.find_one({"id": service_id}, {"_id": 0})
+    service = await cached_service(db, service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
-    return service
+    not_modified = conditional_response(request, response, make_etag("service", [service], SlottaEngine.PRICING_VERSION))
+    if not_modified:
+        return not_modified
+    return with_quote_matrix(service)
 
 @api_router.put("/services/{service_id}", response_model=Service)
 async def update_service(service_id: str, service_update: ServiceCreate, current_master: dict = Depends(get_current_master)):
@@ -517,7 +619,7 @@ async def update_service(service_id: str, service_update: ServiceCreate, current
         raise HTTPException(status_code=400, detail="Service duration must be greater than 0")
     
     # Check if service exists
-    existing = await db.services.find_one({"id": service_id}, {"_id": 0})
+    existing = await cached_service(db, service_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Service not found")
     
@@ -530,13 +632,16 @@ async def update_service(service_id: str, service_update: ServiceCreate, current
     # Update service
     update_data = service_update.model_dump()
     update_data['base_slotta'] = base_slotta
+    update_data['slotta_quotes'] = SlottaEngine.build_quote_matrix(service_update.price, service_update.duration_minutes)
+    update_data['updated_at'] = datetime.utcnow()
     
     await db.services.update_one(
         {"id": service_id},
         {"$set": update_data}
     )
+    invalidate_service(service_id)
     
-    updated_service = await db.services.find_one({"id": service_id}, {"_id": 0})
+    updated_service = await cached_service(db, service_id)
     
     logger.info(f"✅ Service updated: {service_id}")
     return updated_service
@@ -547,35 +652,39 @@ async def delete_service(service_id: str, current_master: dict = Depends(get_cur
     require_active_subscription(current_master)
     
     # Check if service exists
-    existing = await db.services.find_one({"id": service_id}, {"_id": 0})
+    existing = await cached_service(db, service_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Service not found")
     
     # Soft delete by setting active = false
     await db.services.update_one(
         {"id": service_id},
-        {"$set": {"active": False}}
+        {"$set": {"active": False, "updated_at": datetime.utcnow()}}
     )
+    invalidate_service(service_id)
     
     logger.info(f"✅ Service deleted: {service_id}")
     return {"message": "Service deleted successfully"}
 
 @api_router.get("/services/{service_id}", response_model=Service)
-async def get_service(service_id: str):
-    """Get a service by ID"""
+async def get_service(service_id: str, request: Request, response: Response):
+    """Get a service by ID (ETag / 304 aware)"""
     
-    service = await db.services.find_one({"id": service_id}, {"_id": 0})
+    service = await cached_service(db, service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
-    return service
+    not_modified = conditional_response(request, response, make_etag("service", [service], SlottaEngine.PRICING_VERSION))
+    if not_modified:
+        return not_modified
+    return with_quote_matrix(service)
 
 @api_router.put("/masters/{master_id}", response_model=Master)
 async def update_master(master_id: str, master_data: dict):
     """Update master profile"""
     
     # Check if master exists
-    existing = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    existing = await cached_master(db, master_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -585,34 +694,101 @@ async def update_master(master_id: str, master_data: dict):
         {"id": master_id},
         {"$set": master_data}
     )
+    invalidate_master(master_id)
+    
+    updated_master = await cached_master(db, master_id)
     
-    updated_master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    if any(key == "settings" or key.startswith("settings.") for key in master_data):
+        await reschedule_master(db, master_id, updated_master.get("settings"))
     
     logger.info(f"✅ Master updated: {master_id}")
     return updated_master
 
 
 
+# ============================================================================
+# SLOTTA QUOTE ENDPOINTS
+# ============================================================================
+
+MAX_QUOTE_BATCH = 10000
+
+@api_router.post("/slotta/quote-batch")
+async def quote_slotta_batch(quote: SlottaQuoteBatch):
+    """Price many (service, client, slot) rows in one vectorized call"""
+    n = len(quote.prices)
+    if n > MAX_QUOTE_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUOTE_BATCH} rows per request")
+    
+    columns = {
+        "durations": quote.durations,
+        "client_reliability": quote.client_reliability,
+        "cancellations": quote.cancellations,
+        "is_peak_slot": quote.is_peak_slot,
+        "total_bookings": quote.total_bookings,
+        "no_shows": quote.no_shows,
+        "booking_lead_time_hours": quote.booking_lead_time_hours
+    }
+    for name, column in columns.items():
+        if column is not None and len(column) != n:
+            raise HTTPException(status_code=400, detail=f"{name} must have the same length as prices")
+    
+    reliability_codes = SlottaEngine.reliability_codes(quote.client_reliability or ['new'] * n)
+    slotta_amounts = SlottaEngine.calculate_slotta_batch(
+        quote.prices,
+        quote.durations,
+        reliability_codes,
+        quote.cancellations or [0] * n,
+        quote.is_peak_slot or [False] * n
+    )
+    result = {"count": n, "slotta_amounts": slotta_amounts.tolist()}
+    
+    if quote.total_bookings is not None:
+        lead_times = None
+        if quote.booking_lead_time_hours is not None:
+            lead_times = [float("nan") if h is None else h for h in quote.booking_lead_time_hours]
+        result["risk_scores"] = SlottaEngine.calculate_risk_score_batch(
+            quote.total_bookings,
+            [0] * n,
+            quote.no_shows or [0] * n,
+            quote.cancellations or [0] * n,
+            lead_times
+        ).tolist()
+    
+    return result
+
 # ============================================================================
 # CLIENT ENDPOINTS
 # ============================================================================
 
+async def get_or_create_client(client: Client) -> Tuple[dict, bool]:
+    """(client doc, created) for client.email, inserting `client` if it is new
+    
+    An upsert, so concurrent first bookings for one email converge on a single
+    document; the unique email index backs it, and a duplicate key from a lost
+    race means the other writer's document is there to re-read.
+    """
+    try:
+        doc = await db.clients.find_one_and_update(
+            {"email": client.email},
+            {"$setOnInsert": client.model_dump()},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        doc = await db.clients.find_one({"email": client.email}, {"_id": 0})
+    return doc, doc["id"] == client.id
+
 @api_router.post("/clients", response_model=Client, status_code=status.HTTP_201_CREATED)
 async def create_client(client_input: ClientCreate):
     """Create or get existing client"""
     if not client_input.name.strip():
         raise HTTPException(status_code=400, detail="Client name is required")
     
-    # Check if client exists
-    existing = await db.clients.find_one({"email": client_input.email}, {"_id": 0})
-    if existing:
-        return Client(**existing)
-    
-    client = Client(**client_input.model_dump())
-    await db.clients.insert_one(client.model_dump())
-    
-    logger.info(f"✅ Client created: {client.name} ({client.email})")
-    return client
+    client, created = await get_or_create_client(Client(**client_input.model_dump()))
+    if created:
+        logger.info(f"✅ Client created: {client['name']} ({client['email']})")
+    return Client(**client)
 
 @api_router.get("/clients/{client_id}", response_model=Client)
 async def get_client(client_id: str):
@@ -682,20 +858,29 @@ async def apply_client_credit(payload: dict):
     return {"success": True, "message": "Credit apply placeholder", "clientId": client_id}
 
 @api_router.get("/clients/master/{master_id}", response_model=List[Client])
-async def get_master_clients(master_id: str, current_master: dict = Depends(get_current_master)):
-    """Get all clients who have booked with this master"""
+async def get_master_clients(
+    master_id: str,
+    response: Response,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_master: dict = Depends(get_current_master)
+):
+    """Get clients who have booked with this master (cursor-paginated, see X-Next-Cursor)"""
     require_active_subscription(current_master)
     
-    # Find all bookings for this master
-    bookings = await db.bookings.find({"master_id": master_id}, {"client_id": 1}).to_list(10000)
-    client_ids = list(set(b['client_id'] for b in bookings))
+    # Distinct client ids straight from the (master_id, ...) index
+    client_ids = await db.bookings.distinct("client_id", {"master_id": master_id})
     
     if not client_ids:
         return []
     
-    # Get all clients
-    clients = await db.clients.find({"id": {"$in": client_ids}}, {"_id": 0}).to_list(1000)
-    return clients
+    page = await paginate(
+        db.clients, {"id": {"$in": client_ids}}, "created_at", limit, cursor,
+        projection=trusted(Client).projection, include_total=include_total
+    )
+    set_page_headers(response, page)
+    return trusted_response(Client, page["items"], response)
 
 # ============================================================================
 # BOOKING ENDPOINTS  
@@ -704,12 +889,13 @@ async def get_master_clients(master_id: str, current_master: dict = Depends(get_
 @api_router.post("/bookings", response_model=Booking, status_code=status.HTTP_201_CREATED)
 async def create_booking(booking_input: BookingCreate):
     """Create a new booking"""
+    booking_input.booking_date = to_naive_utc(booking_input.booking_date)
     await require_active_subscription_for_master(booking_input.master_id)
     if booking_input.booking_date <= datetime.utcnow():
         raise HTTPException(status_code=400, detail="Booking date must be in the future")
     
     # Get service details
-    service = await db.services.find_one({"id": booking_input.service_id}, {"_id": 0})
+    service = await cached_service(db, booking_input.service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
@@ -719,30 +905,41 @@ async def create_booking(booking_input: BookingCreate):
         raise HTTPException(status_code=404, detail="Client not found")
 
     # Get master details
-    master = await db.masters.find_one({"id": booking_input.master_id}, {"_id": 0})
+    master = await cached_master(db, booking_input.master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
-    # Calculate Slotta
-    slotta_amount = SlottaEngine.calculate_slotta(
-        price=service['price'],
-        duration_minutes=service['duration_minutes'],
+    # Reject overlaps with existing bookings / blocked time
+    if not await is_slot_available(db, master['id'], booking_input.booking_date, service['duration_minutes']):
+        raise HTTPException(status_code=409, detail="Time slot is no longer available")
+    
+    # Calculate Slotta (peak pricing from the master's demand heatmap)
+    peak_slot = await is_peak_slot(db, master['id'], booking_input.booking_date)
+    slotta_amount = SlottaEngine.quote_for_service(
+        service,
         client_reliability=client['reliability'],
-        no_shows=client['no_shows'],
-        cancellations=client['cancellations']
+        cancellations=client['cancellations'],
+        is_peak_slot=peak_slot
     )
     
-    # Calculate risk score
-    risk_score = SlottaEngine.calculate_risk_score(
-        total_bookings=client['total_bookings'],
-        completed_bookings=client['completed_bookings'],
-        no_shows=client['no_shows'],
-        cancellations=client['cancellations']
+    # Calculate risk score from the client's feature document
+    features = await get_client_features(db, client['id'], master['id'])
+    risk_score = SlottaEngine.calculate_risk_score_from_features(
+        features,
+        booking_lead_time_hours=lead_time_hours(booking_input.booking_date, datetime.utcnow())
     )
     
     # Calculate reschedule deadline (24 hours before)
     reschedule_deadline = booking_input.booking_date - timedelta(hours=24)
     
+    # Atomically claim the time window
+    try:
+        reservation_id = await claim_slot(db, master['id'], booking_input.booking_date, service['duration_minutes'])
+    except SlotUnavailableError:
+        raise HTTPException(status_code=409, detail="Time slot is no longer available")
+    except UnalignedSlotError as e:
+        raise HTTPException(status_code=400, detail=f"Booking time {e}")
+    
     # Create booking
     booking = Booking(
         **booking_input.model_dump(),
@@ -753,7 +950,53 @@ async def create_booking(booking_input: BookingCreate):
         reschedule_deadline=reschedule_deadline
     )
     
-    await db.bookings.insert_one(booking.model_dump())
+    # Stage notifications with the booking (delivered by the outbox workers once it exists)
+    messages = [
+        outbox_message("email", "send_booking_confirmation", {
+            "to_email": client['email'],
+            "client_name": client['name'],
+            "master_name": master['name'],
+            "service_name": service['name'],
+            "booking_date": booking_input.booking_date.strftime("%A, %B %d, %Y"),
+            "booking_time": booking_input.booking_date.strftime("%I:%M %p"),
+            "slotta_amount": slotta_amount
+        }, booking_id=booking.id),
+        outbox_message("email", "send_master_new_booking", {
+            "to_email": master['email'],
+            "master_name": master['name'],
+            "client_name": client['name'],
+            "service_name": service['name'],
+            "booking_date": booking_input.booking_date.strftime("%A, %B %d, %Y"),
+            "booking_time": booking_input.booking_date.strftime("%I:%M %p")
+        }, booking_id=booking.id)
+    ]
+    
+    # Telegram notification if enabled
+    if master.get('telegram_chat_id'):
+        messages.append(outbox_message("telegram", "notify_new_booking", {
+            "chat_id": master['telegram_chat_id'],
+            "client_name": client['name'],
+            "service_name": service['name'],
+            "booking_date": booking_input.booking_date.strftime("%A, %B %d"),
+            "booking_time": booking_input.booking_date.strftime("%I:%M %p")
+        }, booking_id=booking.id))
+
+    # Create Google Calendar event if connected
+    if master_has_google_calendar(master):
+        messages.append(outbox_message("google_calendar", "create_booking_event", {"booking_id": booking.id}, booking_id=booking.id))
+    
+    try:
+        await outbox_worker.stage(db, messages)
+        await db.bookings.insert_one(booking.model_dump())
+    except Exception:
+        await outbox_worker.discard(db, booking.id)
+        await release_slot(db, reservation_id)
+        raise
+    await outbox_worker.release(db, booking.id)
+    await confirm_slot(db, reservation_id, booking.id, booking.booking_date + timedelta(minutes=booking.duration_minutes))
+    await record_booking_created(db, booking.master_id, booking.status, slotta_amount)
+    await record_demand(db, booking.master_id, booking.booking_date, booking.duration_minutes)
+    await record_client_booking(db, booking.client_id, booking.master_id, booking.booking_date)
     
     # Update client stats
     await db.clients.update_one(
@@ -761,107 +1004,65 @@ async def create_booking(booking_input: BookingCreate):
         {"$inc": {"total_bookings": 1}}
     )
     
-    # Send notifications
-    await email_service.send_booking_confirmation(
-        to_email=client['email'],
-        client_name=client['name'],
-        master_name=master['name'],
-        service_name=service['name'],
-        booking_date=booking_input.booking_date.strftime("%A, %B %d, %Y"),
-        booking_time=booking_input.booking_date.strftime("%I:%M %p"),
-        slotta_amount=slotta_amount
-    )
-    
-    await email_service.send_master_new_booking(
-        to_email=master['email'],
-        master_name=master['name'],
-        client_name=client['name'],
-        service_name=service['name'],
-        booking_date=booking_input.booking_date.strftime("%A, %B %d, %Y"),
-        booking_time=booking_input.booking_date.strftime("%I:%M %p")
-    )
-    
-    # Telegram notification if enabled
-    if master.get('telegram_chat_id'):
-        await telegram_service.notify_new_booking(
-            chat_id=master['telegram_chat_id'],
-            client_name=client['name'],
-            service_name=service['name'],
-            booking_date=booking_input.booking_date.strftime("%A, %B %d"),
-            booking_time=booking_input.booking_date.strftime("%I:%M %p")
-        )
-
-    # Create Google Calendar event if connected
-    access_token = await get_valid_google_access_token(master)
-    if access_token:
-        end_time = booking_input.booking_date + timedelta(minutes=service['duration_minutes'])
-        event_id = await google_calendar_service.create_event(
-            access_token=access_token,
-            summary=f"{service['name']} - {client['name']}",
-            start_time=booking_input.booking_date,
-            end_time=end_time,
-            description=f"Client: {client['name']}\nEmail: {client.get('email', 'N/A')}\nSlotta: €{slotta_amount}"
-        )
-        if event_id:
-            await db.bookings.update_one(
-                {"id": booking.id},
-                {"$set": {"google_event_id": event_id}}
-            )
-            await log_google_sync(master['id'], "booking_create", "success", f"Event {event_id} created")
-        else:
-            await log_google_sync(master['id'], "booking_create", "failure", "Failed to create event")
-    
     log_info(logger, "booking_created", master_id=master['id'], client_id=client['id'], slotta_amount=slotta_amount)
     return booking
 
 @api_router.post("/bookings/with-payment")
 async def create_booking_with_payment(booking_input: BookingCreateWithPayment):
     """Create booking with Stripe payment authorization (public booking flow)"""
+    booking_input.booking_date = to_naive_utc(booking_input.booking_date)
     await require_active_subscription_for_master(booking_input.master_id)
     if booking_input.booking_date <= datetime.utcnow():
         raise HTTPException(status_code=400, detail="Booking date must be in the future")
     
     # Get service
-    service = await db.services.find_one({"id": booking_input.service_id}, {"_id": 0})
+    service = await cached_service(db, booking_input.service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
     # Get master
-    master = await db.masters.find_one({"id": booking_input.master_id}, {"_id": 0})
+    master = await cached_master(db, booking_input.master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
+    # Reject overlaps with existing bookings / blocked time
+    if not await is_slot_available(db, master['id'], booking_input.booking_date, service['duration_minutes']):
+        raise HTTPException(status_code=409, detail="Time slot is no longer available")
+    
     # Get or create client
-    client = await db.clients.find_one({"email": booking_input.client_email}, {"_id": 0})
-    if not client:
-        # Create new client
-        new_client = Client(
-            email=booking_input.client_email,
-            name=booking_input.client_name,
-            phone=booking_input.client_phone,
-            reliability=ClientReliability.NEW
-        )
-        await db.clients.insert_one(new_client.model_dump())
-        client = new_client.model_dump()
+    client, created = await get_or_create_client(Client(
+        email=booking_input.client_email,
+        name=booking_input.client_name,
+        phone=booking_input.client_phone,
+        reliability=ClientReliability.NEW
+    ))
+    if created:
         logger.info(f"✅ New client created: {client['name']} ({client['email']})")
     
-    # Calculate Slotta amount
-    slotta_amount = SlottaEngine.calculate_slotta(
-        price=service['price'],
-        duration_minutes=service['duration_minutes'],
+    # Calculate Slotta amount (peak pricing from the master's demand heatmap)
+    peak_slot = await is_peak_slot(db, booking_input.master_id, booking_input.booking_date)
+    slotta_amount = SlottaEngine.quote_for_service(
+        service,
         client_reliability=client.get('reliability', 'new'),
-        no_shows=client.get('no_shows', 0),
-        cancellations=client.get('cancellations', 0)
+        cancellations=client.get('cancellations', 0),
+        is_peak_slot=peak_slot
     )
     
-    # Calculate risk score
-    risk_score = SlottaEngine.calculate_risk_score(
-        total_bookings=client.get('total_bookings', 0),
-        completed_bookings=client.get('completed_bookings', 0),
-        no_shows=client.get('no_shows', 0),
-        cancellations=client.get('cancellations', 0)
+    # Calculate risk score from the client's feature document
+    features = await get_client_features(db, client['id'], master['id'])
+    risk_score = SlottaEngine.calculate_risk_score_from_features(
+        features,
+        booking_lead_time_hours=lead_time_hours(booking_input.booking_date, datetime.utcnow())
     )
     
+    # Atomically claim the time window before any payment hold is created
+    try:
+        reservation_id = await claim_slot(db, master['id'], booking_input.booking_date, service['duration_minutes'])
+    except SlotUnavailableError:
+        raise HTTPException(status_code=409, detail="Time slot is no longer available")
+    except UnalignedSlotError as e:
+        raise HTTPException(status_code=400, detail=f"Booking time {e}")
+    
     # Create Stripe payment intent with hold
     payment_intent = await stripe_service.create_payment_intent(
         amount=slotta_amount,
@@ -875,19 +1076,23 @@ async def create_booking_with_payment(booking_input: BookingCreateWithPayment):
     )
     
     if not payment_intent:
+        await release_slot(db, reservation_id)
         raise HTTPException(status_code=500, detail="Failed to create payment authorization")
     
     # Confirm the payment intent with the payment method
     if stripe_service.enabled:
         import stripe
         try:
-            stripe.PaymentIntent.confirm(
+            await sdk_executor.run(
+                "stripe",
+                stripe.PaymentIntent.confirm,
                 payment_intent['id'],
                 payment_method=booking_input.payment_method_id
             )
             logger.info(f"✅ Payment authorized: {payment_intent['id']}")
         except Exception as e:
             logger.error(f"❌ Payment authorization failed: {e}")
+            await release_slot(db, reservation_id)
             raise HTTPException(status_code=400, detail=f"Payment authorization failed: {str(e)}")
     
     # Calculate reschedule deadline
@@ -910,69 +1115,66 @@ async def create_booking_with_payment(booking_input: BookingCreateWithPayment):
         notes=booking_input.notes
     )
     
-    await db.bookings.insert_one(booking.model_dump())
-    
-    # Update client stats
-    await db.clients.update_one(
-        {"id": client['id']},
-        {"$inc": {"total_bookings": 1}}
-    )
-    
-    # Send notifications
+    # Stage notifications with the booking (delivered by the outbox workers once it exists)
     booking_date_str = booking_input.booking_date.strftime("%A, %B %d, %Y")
     booking_time_str = booking_input.booking_date.strftime("%I:%M %p")
     
-    # Email to client
-    await email_service.send_booking_confirmation(
-        to_email=booking_input.client_email,
-        client_name=booking_input.client_name,
-        master_name=master['name'],
-        service_name=service['name'],
-        booking_date=booking_date_str,
-        booking_time=booking_time_str,
-        slotta_amount=slotta_amount
-    )
-    
-    # Email to master
-    await email_service.send_master_new_booking(
-        to_email=master['email'],
-        master_name=master['name'],
-        client_name=booking_input.client_name,
-        service_name=service['name'],
-        booking_date=booking_date_str,
-        booking_time=booking_time_str
-    )
+    messages = [
+        # Email to client
+        outbox_message("email", "send_booking_confirmation", {
+            "to_email": booking_input.client_email,
+            "client_name": booking_input.client_name,
+            "master_name": master['name'],
+            "service_name": service['name'],
+            "booking_date": booking_date_str,
+            "booking_time": booking_time_str,
+            "slotta_amount": slotta_amount
+        }, booking_id=booking.id),
+        # Email to master
+        outbox_message("email", "send_master_new_booking", {
+            "to_email": master['email'],
+            "master_name": master['name'],
+            "client_name": booking_input.client_name,
+            "service_name": service['name'],
+            "booking_date": booking_date_str,
+            "booking_time": booking_time_str
+        }, booking_id=booking.id)
+    ]
     
     # Telegram notification if enabled
     if master.get('telegram_chat_id'):
-        await telegram_service.send_new_booking_alert(
-            chat_id=master['telegram_chat_id'],
-            client_name=booking_input.client_name,
-            service_name=service['name'],
-            booking_date=booking_date_str,
-            booking_time=booking_time_str,
-            slotta_amount=slotta_amount
-        )
+        messages.append(outbox_message("telegram", "send_new_booking_alert", {
+            "chat_id": master['telegram_chat_id'],
+            "client_name": booking_input.client_name,
+            "service_name": service['name'],
+            "booking_date": booking_date_str,
+            "booking_time": booking_time_str,
+            "slotta_amount": slotta_amount
+        }, booking_id=booking.id))
     
     # Create Google Calendar event if connected
-    access_token = await get_valid_google_access_token(master)
-    if access_token:
-        end_time = booking_input.booking_date + timedelta(minutes=service['duration_minutes'])
-        event_id = await google_calendar_service.create_event(
-            access_token=access_token,
-            summary=f"{service['name']} - {booking_input.client_name}",
-            start_time=booking_input.booking_date,
-            end_time=end_time,
-            description=f"Client: {booking_input.client_name}\nEmail: {booking_input.client_email}\nSlotta: €{slotta_amount}"
-        )
-        if event_id:
-            await db.bookings.update_one(
-                {"id": booking.id},
-                {"$set": {"google_event_id": event_id}}
-            )
-            await log_google_sync(master['id'], "booking_create", "success", f"Event {event_id} created")
-        else:
-            await log_google_sync(master['id'], "booking_create", "failure", "Failed to create event")
+    if master_has_google_calendar(master):
+        messages.append(outbox_message("google_calendar", "create_booking_event", {"booking_id": booking.id}, booking_id=booking.id))
+    
+    try:
+        await outbox_worker.stage(db, messages)
+        await db.bookings.insert_one(booking.model_dump())
+    except Exception:
+        await outbox_worker.discard(db, booking.id)
+        await stripe_service.cancel_payment(payment_intent['id'])
+        await release_slot(db, reservation_id)
+        raise
+    await outbox_worker.release(db, booking.id)
+    await confirm_slot(db, reservation_id, booking.id, booking.booking_date + timedelta(minutes=booking.duration_minutes))
+    await record_booking_created(db, booking.master_id, booking.status, slotta_amount)
+    await record_demand(db, booking.master_id, booking.booking_date, booking.duration_minutes)
+    await record_client_booking(db, booking.client_id, booking.master_id, booking.booking_date)
+    
+    # Update client stats
+    await db.clients.update_one(
+        {"id": client['id']},
+        {"$inc": {"total_bookings": 1}}
+    )
     
     log_info(logger, "booking_created_with_payment", master_id=master['id'], client_email=booking_input.client_email, slotta_amount=slotta_amount)
     
@@ -995,45 +1197,73 @@ async def get_booking(booking_id: str):
     return booking
 
 @api_router.get("/bookings/master/{master_id}", response_model=List[Booking])
-async def get_master_bookings(master_id: str, status: Optional[BookingStatus] = None, current_master: dict = Depends(get_current_master)):
-    """Get all bookings for a master"""
+async def get_master_bookings(
+    master_id: str,
+    response: Response,
+    status: Optional[BookingStatus] = None,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_master: dict = Depends(get_current_master)
+):
+    """Get bookings for a master, newest first (cursor-paginated, see X-Next-Cursor)"""
     require_active_subscription(current_master)
     
     query = {"master_id": master_id}
     if status:
         query["status"] = status
     
-    bookings = await db.bookings.find(query, {"_id": 0}).sort("booking_date", -1).to_list(1000)
-    return bookings
+    page = await paginate(
+        db.bookings, query, "booking_date", limit, cursor,
+        projection=trusted(Booking).projection, include_total=include_total
+    )
+    set_page_headers(response, page)
+    return trusted_response(Booking, page["items"], response)
 
 @api_router.get("/bookings/client/{client_id}", response_model=List[Booking])
-async def get_client_bookings(client_id: str):
-    """Get all bookings for a client"""
+async def get_client_bookings(
+    client_id: str,
+    response: Response,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    include_total: bool = False
+):
+    """Get bookings for a client, newest first (cursor-paginated, see X-Next-Cursor)"""
     
-    bookings = await db.bookings.find(
-        {"client_id": client_id},
-        {"_id": 0}
-    ).sort("booking_date", -1).to_list(1000)
-    return bookings
+    page = await paginate(
+        db.bookings, {"client_id": client_id}, "booking_date", limit, cursor,
+        projection=trusted(Booking).projection, include_total=include_total
+    )
+    set_page_headers(response, page)
+    return trusted_response(Booking, page["items"], response)
 
 @api_router.get("/bookings/client/email/{email}")
-async def get_client_bookings_by_email(email: str):
-    """Get all bookings for a client by email"""
+async def get_client_bookings_by_email(
+    email: str,
+    response: Response,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    include_total: bool = False
+):
+    """Get bookings for a client by email (cursor-paginated, see X-Next-Cursor)"""
     
     client = await db.clients.find_one({"email": email}, {"_id": 0})
     if not client:
         return []
     
-    bookings = await db.bookings.find(
-        {"client_id": client['id']},
-        {"_id": 0}
-    ).sort("booking_date", -1).to_list(1000)
+    page = await paginate(db.bookings, {"client_id": client['id']}, "booking_date", limit, cursor, include_total=include_total)
+    set_page_headers(response, page)
+    bookings = page["items"]
+    
+    # Enrich with service and master details (one batched query per collection)
+    loaders = Loaders(db)
+    services = await loaders.services.load_many(b['service_id'] for b in bookings)
+    masters = await loaders.masters.load_many(b['master_id'] for b in bookings)
     
-    # Enrich with service and master details
     enriched = []
     for booking in bookings:
-        service = await db.services.find_one({"id": booking['service_id']}, {"_id": 0, "name": 1, "price": 1})
-        master = await db.masters.find_one({"id": booking['master_id']}, {"_id": 0, "name": 1, "location": 1})
+        service = services.get(booking['service_id'])
+        master = masters.get(booking['master_id'])
         enriched.append({
             **booking,
             "service_name": service['name'] if service else "Unknown",
@@ -1044,6 +1274,23 @@ async def get_client_bookings_by_email(email: str):
     
     return enriched
 
+OPEN_BOOKING_STATUSES = [BookingStatus.PENDING, BookingStatus.CONFIRMED, BookingStatus.RESCHEDULED]
+
+async def _transition_booking(booking_id: str, new_status: BookingStatus) -> dict:
+    """Move an open booking to `new_status`; returns the booking as it was before
+    
+    Conditional on the current status, so of two concurrent or repeated calls
+    only one applies the transition (and its stats); the other gets a 409.
+    """
+    booking = await db.bookings.find_one_and_update(
+        {"id": booking_id, "status": {"$in": OPEN_BOOKING_STATUSES}},
+        {"$set": {"status": new_status, "updated_at": datetime.utcnow()}},
+        projection={"_id": 0}
+    )
+    if not booking:
+        raise HTTPException(status_code=409, detail="Booking status has already changed")
+    return booking
+
 @api_router.put("/bookings/{booking_id}/cancel")
 async def cancel_booking(booking_id: str, current_master: dict = Depends(get_current_master)):
     """Cancel a booking and release the payment hold"""
@@ -1060,18 +1307,21 @@ async def cancel_booking(booking_id: str, current_master: dict = Depends(get_cur
     if booking.get('reschedule_deadline') and datetime.utcnow() > booking['reschedule_deadline']:
         raise HTTPException(status_code=400, detail="Cancellation deadline has passed")
     
+    # Update booking status
+    booking = await _transition_booking(booking_id, BookingStatus.CANCELLED)
+    
     # Release payment hold
     if booking.get('stripe_payment_intent_id'):
         await stripe_service.cancel_payment(booking['stripe_payment_intent_id'])
     
-    # Update booking status
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {"status": BookingStatus.CANCELLED, "updated_at": datetime.utcnow()}}
-    )
+    await release_booking_slot(db, booking_id)
+    await record_status_change(db, booking['master_id'], booking['status'], BookingStatus.CANCELLED, booking.get('slotta_amount', 0))
+    await record_demand(db, booking['master_id'], booking['booking_date'], booking.get('duration_minutes') or 0, delta=-1)
+    await record_client_outcome(db, booking['client_id'], booking['master_id'], OUTCOME_CANCELLED, booking.get('created_at'))
 
     # Remove Google Calendar event if exists
-    await delete_google_event_for_booking(booking)
+    if booking.get('google_event_id'):
+        await outbox_worker.enqueue(db, [outbox_message("google_calendar", "delete_booking_event", {"booking_id": booking_id}, booking_id=booking_id)])
     
     # Update client stats
     await db.clients.update_one(
@@ -1094,16 +1344,32 @@ async def reschedule_booking(booking_id: str, payload: BookingReschedule, curren
     if booking['status'] in ['completed', 'cancelled', 'no-show']:
         raise HTTPException(status_code=400, detail="Booking cannot be rescheduled")
     
+    payload.new_date = to_naive_utc(payload.new_date)
     if payload.new_date <= datetime.utcnow():
         raise HTTPException(status_code=400, detail="New booking date must be in the future")
+    if not is_aligned(payload.new_date):
+        raise HTTPException(status_code=400, detail=f"New booking date must be on a {BUCKET_MINUTES}-minute boundary")
     
-    service = await db.services.find_one({"id": booking['service_id']}, {"_id": 0})
+    duration_minutes = booking.get('duration_minutes') or 0
+    if not await is_slot_available(db, booking['master_id'], payload.new_date, duration_minutes, exclude_booking_id=booking_id):
+        raise HTTPException(status_code=409, detail="Time slot is no longer available")
+    
+    # Claim the new window first (keeping buckets this booking already holds);
+    # the old reservation stays in place until the move has succeeded
+    try:
+        reservation_id = await claim_slot(db, booking['master_id'], payload.new_date, duration_minutes, held_by=booking_id)
+    except SlotUnavailableError:
+        raise HTTPException(status_code=409, detail="Time slot is no longer available")
+    
+    service = await cached_service(db, booking['service_id'])
     client = await db.clients.find_one({"id": booking['client_id']}, {"_id": 0})
-    master = await db.masters.find_one({"id": booking['master_id']}, {"_id": 0})
+    master = await cached_master(db, booking['master_id'])
     
     reschedule_deadline = payload.new_date - timedelta(hours=24)
-    await db.bookings.update_one(
-        {"id": booking_id},
+    # Conditional on the booking being unchanged since it was read, so a
+    # concurrent reschedule / cancel cannot record the same move twice
+    moved = await db.bookings.update_one(
+        {"id": booking_id, "status": booking['status'], "booking_date": booking['booking_date']},
         {"$set": {
             "booking_date": payload.new_date,
             "reschedule_deadline": reschedule_deadline,
@@ -1111,6 +1377,14 @@ async def reschedule_booking(booking_id: str, payload: BookingReschedule, curren
             "updated_at": datetime.utcnow()
         }}
     )
+    if not moved.matched_count:
+        await release_slot(db, reservation_id)
+        raise HTTPException(status_code=409, detail="Booking status has already changed")
+    await move_booking_slot(db, reservation_id, booking_id, payload.new_date, duration_minutes)
+    await record_status_change(db, booking['master_id'], booking['status'], BookingStatus.RESCHEDULED, booking.get('slotta_amount', 0))
+    await record_demand(db, booking['master_id'], booking['booking_date'], duration_minutes, delta=-1)
+    await record_demand(db, booking['master_id'], payload.new_date, duration_minutes)
+    await record_client_reschedule(db, booking['client_id'], booking['master_id'])
     
     if master and service and client:
         access_token = await get_valid_google_access_token(master)
@@ -1159,13 +1433,13 @@ async def mark_booking_complete(booking_id: str, current_master: dict = Depends(
         raise HTTPException(status_code=404, detail="Booking not found")
     
     # Update booking status
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {"status": BookingStatus.COMPLETED, "updated_at": datetime.utcnow()}}
-    )
+    booking = await _transition_booking(booking_id, BookingStatus.COMPLETED)
+    await record_status_change(db, booking['master_id'], booking['status'], BookingStatus.COMPLETED, booking.get('slotta_amount', 0))
+    await record_client_outcome(db, booking['client_id'], booking['master_id'], OUTCOME_COMPLETED, booking.get('created_at'))
 
     # Remove Google Calendar event if exists
-    await delete_google_event_for_booking(booking)
+    if booking.get('google_event_id'):
+        await outbox_worker.enqueue(db, [outbox_message("google_calendar", "delete_booking_event", {"booking_id": booking_id}, booking_id=booking_id)])
     
     # Update client stats
     await db.clients.update_one(
@@ -1200,17 +1474,18 @@ async def mark_booking_no_show(booking_id: str, current_master: dict = Depends(g
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
+    # Update booking status
+    booking = await _transition_booking(booking_id, BookingStatus.NO_SHOW)
+    
     # Calculate split
     split = SlottaEngine.calculate_no_show_split(booking['slotta_amount'])
     
-    # Update booking status
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {"status": BookingStatus.NO_SHOW, "updated_at": datetime.utcnow()}}
-    )
+    await record_status_change(db, booking['master_id'], booking['status'], BookingStatus.NO_SHOW, booking.get('slotta_amount', 0))
+    await record_client_outcome(db, booking['client_id'], booking['master_id'], OUTCOME_NO_SHOW, booking.get('created_at'))
 
     # Remove Google Calendar event if exists
-    await delete_google_event_for_booking(booking)
+    if booking.get('google_event_id'):
+        await outbox_worker.enqueue(db, [outbox_message("google_calendar", "delete_booking_event", {"booking_id": booking_id}, booking_id=booking_id)])
     
     # Update client stats
     await db.clients.update_one(
@@ -1250,6 +1525,7 @@ async def mark_booking_no_show(booking_id: str, current_master: dict = Depends(g
         description=f"No-show compensation for booking {booking_id}"
     )
     await db.transactions.insert_one(master_transaction.model_dump())
+    await record_transaction(db, master_transaction.model_dump())
     
     client_transaction = Transaction(
         booking_id=booking_id,
@@ -1260,24 +1536,28 @@ async def mark_booking_no_show(booking_id: str, current_master: dict = Depends(g
     )
     await db.transactions.insert_one(client_transaction.model_dump())
     
-    # Send notifications
-    master = await db.masters.find_one({"id": booking['master_id']}, {"_id": 0})
+    # Queue notifications (delivered by the outbox workers)
+    master = await cached_master(db, booking['master_id'])
     client_doc = await db.clients.find_one({"id": booking['client_id']}, {"_id": 0})
     
-    await email_service.send_no_show_alert(
-        to_email=master['email'],
-        master_name=master['name'],
-        client_name=client_doc['name'],
-        compensation=split['master_compensation'],
-        wallet_credit=split['client_wallet_credit']
-    )
+    messages = [
+        outbox_message("email", "send_no_show_alert", {
+            "to_email": master['email'],
+            "master_name": master['name'],
+            "client_name": client_doc['name'],
+            "compensation": split['master_compensation'],
+            "wallet_credit": split['client_wallet_credit']
+        }, booking_id=booking_id)
+    ]
     
     if master.get('telegram_chat_id'):
-        await telegram_service.notify_no_show(
-            chat_id=master['telegram_chat_id'],
-            client_name=client_doc['name'],
-            compensation=split['master_compensation']
-        )
+        messages.append(outbox_message("telegram", "notify_no_show", {
+            "chat_id": master['telegram_chat_id'],
+            "client_name": client_doc['name'],
+            "compensation": split['master_compensation']
+        }, booking_id=booking_id))
+    
+    await outbox_worker.enqueue(db, messages)
     
     log_info(logger, "booking_no_show", booking_id=booking_id, master_compensation=split['master_compensation'], client_wallet_credit=split['client_wallet_credit'])
     return {
@@ -1286,6 +1566,54 @@ async def mark_booking_no_show(booking_id: str, current_master: dict = Depends(g
         "client_wallet_credit": split['client_wallet_credit']
     }
 
+# ============================================================================
+# AVAILABILITY ENDPOINTS
+# ============================================================================
+
+@api_router.get("/availability/{master_id}")
+async def get_master_availability(
+    master_id: str,
+    service_id: str,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to")
+):
+    """Get bookable start times for a service (public booking page)"""
+    
+    master = await db.masters.find_one({"id": master_id}, {"_id": 0, "id": 1, "settings": 1})
+    if not master:
+        raise HTTPException(status_code=404, detail="Master not found")
+    
+    service = await db.services.find_one({"id": service_id, "master_id": master_id}, {"_id": 0})
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    
+    now = datetime.utcnow()
+    range_start = to_naive_utc(from_date) if from_date else now
+    range_end = to_naive_utc(to_date) if to_date else range_start + timedelta(days=7)
+    if range_end <= range_start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if range_end - range_start > timedelta(days=MAX_RANGE_DAYS):
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_RANGE_DAYS} days")
+    
+    index = await build_interval_index(db, master_id, range_start, range_end)
+    slots = free_slots(
+        index,
+        range_start,
+        range_end,
+        service['duration_minutes'],
+        settings=master.get('settings'),
+        not_before=now
+    )
+    
+    return {
+        "master_id": master_id,
+        "service_id": service_id,
+        "duration_minutes": service['duration_minutes'],
+        "from": range_start,
+        "to": range_end,
+        "slots": slots
+    }
+
 # ============================================================================
 # ANALYTICS ENDPOINTS
 # ============================================================================
@@ -1295,23 +1623,16 @@ async def get_master_analytics(master_id: str, current_master: dict = Depends(ge
     """Get analytics for a master"""
     require_active_subscription(current_master)
     
-    # Get all bookings
-    bookings = await db.bookings.find({"master_id": master_id}, {"_id": 0}).to_list(10000)
+    # Incrementally maintained counters (see master_stats.py)
+    stats = await get_master_stats(db, master_id)
+    status_counts = stats.get('status_counts', {})
     
-    # Calculate stats
-    total_bookings = len(bookings)
-    completed = len([b for b in bookings if b['status'] == BookingStatus.COMPLETED])
-    no_shows = len([b for b in bookings if b['status'] == BookingStatus.NO_SHOW])
-    
-    total_slotta_protected = sum(b.get('slotta_amount', 0) for b in bookings)
-    
-    # Get transactions
-    transactions = await db.transactions.find(
-        {"master_id": master_id},
-        {"_id": 0}
-    ).to_list(10000)
+    total_bookings = stats.get('total_bookings', 0)
+    completed = status_counts.get(BookingStatus.COMPLETED.value, 0)
+    no_shows = status_counts.get(BookingStatus.NO_SHOW.value, 0)
     
-    wallet_balance = sum(t['amount'] for t in transactions if t['type'] == 'wallet_credit')
+    total_slotta_protected = stats.get('total_slotta', 0)
+    wallet_balance = stats.get('transaction_totals', {}).get('wallet_credit', 0)
     
     return {
         "total_bookings": total_bookings,
@@ -1323,6 +1644,28 @@ async def get_master_analytics(master_id: str, current_master: dict = Depends(ge
         "avg_slotta": total_slotta_protected / total_bookings if total_bookings > 0 else 0
     }
 
+@api_router.get("/analytics/master/{master_id}/heatmap")
+async def get_master_demand_heatmap(master_id: str, current_master: dict = Depends(get_current_master)):
+    """Time-of-week booking demand histogram (see demand_heatmap.py)"""
+    require_active_subscription(current_master)
+    if current_master["id"] != master_id:
+        raise HTTPException(status_code=403, detail="Cannot view another master's demand")
+    
+    heatmap = await get_heatmap(db, master_id)
+    tz = zone_or_utc((current_master.get('settings') or {}).get('timezone'))
+    offset = datetime.now(tz).utcoffset()
+    
+    return {
+        "master_id": master_id,
+        "bucket_minutes": heatmap["bucket_minutes"],
+        "counts": heatmap["counts"],
+        "total": heatmap["total"],
+        "peak_threshold": heatmap.get("peak_threshold"),
+        "peak_buckets": heatmap["peak_buckets"],
+        "timezone": tz.key,
+        "utc_offset_minutes": int(offset.total_seconds() // 60) if offset else 0
+    }
+
 # ============================================================================
 # WALLET / TRANSACTIONS ENDPOINTS
 # ============================================================================
@@ -1332,53 +1675,87 @@ async def get_master_wallet(master_id: str, current_master: dict = Depends(get_c
     """Get wallet balance and transactions for a master"""
     require_active_subscription(current_master)
     
-    # Get all transactions for this master
+    # Balance from ledger checkpoint + recent delta (see wallet_ledger.py)
+    totals = await get_wallet_totals(db, master_id)
+    
+    # Pending holds on confirmed bookings are maintained in master_stats
+    stats = await get_master_stats(db, master_id)
+    pending_amount = stats.get('status_slotta', {}).get(BookingStatus.CONFIRMED.value, 0)
+    
+    # Last 50 transactions
     transactions = await db.transactions.find(
         {"master_id": master_id},
         {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    
-    # Calculate balances
-    total_credits = sum(t['amount'] for t in transactions if t.get('type') in ['wallet_credit', 'payout_received'])
-    total_payouts = sum(t['amount'] for t in transactions if t.get('type') == 'payout')
-    wallet_balance = total_credits - total_payouts
-    
-    # Get pending amount from confirmed bookings
-    confirmed_bookings = await db.bookings.find(
-        {"master_id": master_id, "status": "confirmed"},
-        {"_id": 0, "slotta_amount": 1}
-    ).to_list(10000)
-    pending_amount = sum(b.get('slotta_amount', 0) for b in confirmed_bookings)
-    
-    # Calculate lifetime earnings
-    lifetime_earnings = total_credits
+    ).sort("created_at", -1).limit(50).to_list(50)
     
     return {
-        "wallet_balance": round(wallet_balance, 2),
+        "wallet_balance": round(totals['balance'], 2),
         "pending_payouts": round(pending_amount, 2),
-        "lifetime_earnings": round(lifetime_earnings, 2),
-        "transactions": transactions[:50]  # Last 50 transactions
+        "lifetime_earnings": round(totals['credits'], 2),
+        "transactions": transactions
     }
 
 @api_router.get("/transactions/master/{master_id}")
-async def get_master_transactions(master_id: str, limit: int = 50, offset: int = 0, current_master: dict = Depends(get_current_master)):
-    """Get paginated transactions for a master"""
+async def get_master_transactions(
+    master_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    current_master: dict = Depends(get_current_master)
+):
+    """Get cursor-paginated transactions for a master, newest first"""
     require_active_subscription(current_master)
     
-    transactions = await db.transactions.find(
-        {"master_id": master_id},
-        {"_id": 0}
-    ).sort("created_at", -1).skip(offset).limit(limit).to_list(limit)
-    
-    total_count = await db.transactions.count_documents({"master_id": master_id})
+    page = await paginate(db.transactions, {"master_id": master_id}, "created_at", limit, cursor, include_total=include_total)
     
     return {
-        "transactions": transactions,
-        "total_count": total_count,
+        "transactions": page["items"],
+        "total_count": page.get("total"),
+        "total_is_estimate": page.get("total_is_estimate", False),
         "limit": limit,
-        "offset": offset
+        "next_cursor": page["next_cursor"],
+        "has_more": page["has_more"]
     }
 
+# ============================================================================
+# EXPORT ENDPOINTS
+# ============================================================================
+
+@api_router.get("/export/master/{master_id}/{kind}")
+async def export_master_data(
+    master_id: str,
+    kind: str,
+    format: str = "csv",
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    current_master: dict = Depends(get_current_master)
+):
+    """Stream full booking / transaction history as CSV or NDJSON"""
+    require_active_subscription(current_master)
+    if current_master["id"] != master_id:
+        raise HTTPException(status_code=403, detail="Cannot export another master's data")
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=404, detail="Unknown export type")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    
+    stream = export_stream(
+        db,
+        kind,
+        format,
+        master_id,
+        date_from=to_naive_utc(from_date) if from_date else None,
+        date_to=to_naive_utc(to_date) if to_date else None
+    )
+    filename = f"slotta-{kind}-{datetime.utcnow().strftime('%Y%m%d')}.{format}"
+    
+    log_info(logger, "export_started", master_id=master_id, kind=kind, format=format)
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # ============================================================================
 # STRIPE CONNECT & PAYOUTS
 # ============================================================================
@@ -1388,7 +1765,7 @@ async def get_stripe_connect_status(master_id: str, current_master: dict = Depen
     """Check if master has Stripe Connect setup"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1407,14 +1784,15 @@ async def get_stripe_connect_status(master_id: str, current_master: dict = Depen
     if stripe_service.enabled:
         try:
             import stripe
-            account = stripe.Account.retrieve(account_id)
+            account = await sdk_executor.run("stripe", stripe.Account.retrieve, account_id)
             payouts_enabled = account.payouts_enabled
             
             # Update database with current status
             await db.masters.update_one(
                 {"id": master_id},
-                {"$set": {"stripe_payouts_enabled": payouts_enabled}}
+                {"$set": {"stripe_payouts_enabled": payouts_enabled, "updated_at": datetime.utcnow()}}
             )
+            invalidate_master(master_id)
         except Exception as e:
             logger.error(f"Failed to fetch Stripe account status: {e}")
             payouts_enabled = bool(master.get('stripe_payouts_enabled'))
@@ -1430,7 +1808,7 @@ async def create_stripe_connect_account(master_id: str, current_master: dict = D
     """Create Stripe Connect Express account for a master"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1445,7 +1823,9 @@ async def create_stripe_connect_account(master_id: str, current_master: dict = D
         import stripe
         
         # Create Express account
-        account = stripe.Account.create(
+        account = await sdk_executor.run(
+            "stripe",
+            stripe.Account.create,
             type="express",
             country="PT",  # Portugal
             email=master['email'],
@@ -1462,6 +1842,7 @@ async def create_stripe_connect_account(master_id: str, current_master: dict = D
             {"id": master_id},
             {"$set": {"stripe_connect_id": account.id, "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(master_id)
         
         logger.info(f"✅ Stripe Connect account created: {account.id} for master {master_id}")
         return {"success": True, "account_id": account.id}
@@ -1475,7 +1856,7 @@ async def get_stripe_onboarding_link(master_id: str, return_url: str = "https://
     """Get Stripe Connect onboarding link for master"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1493,7 +1874,9 @@ async def get_stripe_onboarding_link(master_id: str, return_url: str = "https://
             account_id = result.get('account_id')
         
         # Create onboarding link
-        account_link = stripe.AccountLink.create(
+        account_link = await sdk_executor.run(
+            "stripe",
+            stripe.AccountLink.create,
             account=account_id,
             refresh_url=f"{return_url}?refresh=true",
             return_url=f"{return_url}?stripe_connected=true",
@@ -1512,7 +1895,7 @@ async def get_stripe_dashboard_link(master_id: str, current_master: dict = Depen
     """Get Stripe Express dashboard link for master to manage payouts"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1525,7 +1908,7 @@ async def get_stripe_dashboard_link(master_id: str, current_master: dict = Depen
     try:
         import stripe
         
-        login_link = stripe.Account.create_login_link(master['stripe_connect_id'])
+        login_link = await sdk_executor.run("stripe", stripe.Account.create_login_link, master['stripe_connect_id'])
         
         return {"url": login_link.url}
         
@@ -1538,7 +1921,7 @@ async def request_payout(master_id: str, amount: Optional[float] = None, current
     """Request a payout to master's connected account"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1546,8 +1929,8 @@ async def request_payout(master_id: str, amount: Optional[float] = None, current
         raise HTTPException(status_code=400, detail="Stripe not connected")
     
     # Get wallet balance
-    wallet_data = await get_master_wallet(master_id, current_master=current_master)
-    available_balance = wallet_data.get('wallet_balance', 0)
+    totals = await get_wallet_totals(db, master_id)
+    available_balance = round(totals['balance'], 2)
     
     # Determine payout amount
     payout_amount = amount if amount else available_balance
@@ -1566,7 +1949,9 @@ async def request_payout(master_id: str, amount: Optional[float] = None, current
         import stripe
         
         # Create transfer to connected account
-        transfer = stripe.Transfer.create(
+        transfer = await sdk_executor.run(
+            "stripe",
+            stripe.Transfer.create,
             amount=int(payout_amount * 100),
             currency="eur",
             destination=master['stripe_connect_id'],
@@ -1584,6 +1969,7 @@ async def request_payout(master_id: str, amount: Optional[float] = None, current
             "created_at": datetime.utcnow()
         }
         await db.transactions.insert_one(transaction)
+        await record_transaction(db, transaction)
         
         logger.info(f"✅ Payout of €{payout_amount} processed for master {master_id}")
         return {
@@ -1613,6 +1999,7 @@ async def update_bank_details(master_id: str, iban: str, account_holder: str, ba
             "updated_at": datetime.utcnow()
         }}
     )
+    invalidate_master(master_id)
     
     logger.info(f"✅ Bank details updated for master {master_id}")
     return {"success": True, "message": "Bank details saved"}
@@ -1632,7 +2019,9 @@ async def create_checkout_session(current_master: dict = Depends(get_current_mas
 
     customer_id = await get_or_create_stripe_customer(current_master)
 
-    session = stripe.checkout.Session.create(
+    session = await sdk_executor.run(
+        "stripe",
+        stripe.checkout.Session.create,
         mode="subscription",
         customer=customer_id,
         line_items=[{"price": STRIPE_PRICE_ID_MONTHLY, "quantity": 1}],
@@ -1653,7 +2042,9 @@ async def create_portal_session(current_master: dict = Depends(get_current_maste
         raise HTTPException(status_code=500, detail="FRONTEND_URL is not configured")
 
     customer_id = await get_or_create_stripe_customer(current_master)
-    session = stripe.billing_portal.Session.create(
+    session = await sdk_executor.run(
+        "stripe",
+        stripe.billing_portal.Session.create,
         customer=customer_id,
         return_url=f"{FRONTEND_URL}/master/settings"
     )
@@ -1668,7 +2059,7 @@ async def get_subscription_status(current_master: dict = Depends(get_current_mas
     if not customer_id:
         return {"active": False}
 
-    subscriptions = stripe.Subscription.list(customer=customer_id, status="all", limit=10)
+    subscriptions = await sdk_executor.run("stripe", stripe.Subscription.list, customer=customer_id, status="all", limit=10)
     active = any(s.status in ("active", "trialing") for s in subscriptions.data)
 
     if current_master.get("subscription_active") != active:
@@ -1676,6 +2067,7 @@ async def get_subscription_status(current_master: dict = Depends(get_current_mas
             {"id": current_master["id"]},
             {"$set": {"subscription_active": active, "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(current_master["id"])
 
     return {"active": active}
 
@@ -1708,10 +2100,13 @@ async def stripe_webhook(request: Request):
     async def set_subscription_by_customer(customer_id: str, active: bool):
         if not customer_id:
             return
-        await db.masters.update_one(
+        master = await db.masters.find_one_and_update(
             {"stripe_customer_id": customer_id},
-            {"$set": {"subscription_active": active, "updated_at": datetime.utcnow()}}
+            {"$set": {"subscription_active": active, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "id": 1}
         )
+        if master:
+            invalidate_master(master["id"])
 
     if event_type == "checkout.session.completed":
         if data_object.get("mode") == "subscription":
@@ -1722,6 +2117,7 @@ async def stripe_webhook(request: Request):
                     {"id": master_id},
                     {"$set": {"stripe_customer_id": customer_id, "subscription_active": True, "updated_at": datetime.utcnow()}}
                 )
+                invalidate_master(master_id)
             else:
                 await set_subscription_by_customer(customer_id, True)
 
@@ -1847,13 +2243,10 @@ async def set_telegram_webhook(request: Request, webhook_url: str = "https://slo
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
     
     try:
-        import httpx
+        url = f"/bot{bot_token}/setWebhook"
         
-        url = f"https://api.telegram.org/bot{bot_token}/setWebhook"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json={"url": webhook_url})
-            result = response.json()
+        response = await http_clients.get("telegram").post(url, json={"url": webhook_url})
+        result = response.json()
         
         logger.info(f"✅ Telegram webhook set to: {webhook_url}")
         return {"success": True, "result": result}
@@ -1866,7 +2259,7 @@ async def set_telegram_webhook(request: Request, webhook_url: str = "https://slo
 async def get_telegram_status(master_id: str):
     """Check if master has Telegram connected"""
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1879,7 +2272,7 @@ async def get_telegram_status(master_id: str):
 async def connect_telegram(master_id: str, chat_id: str):
     """Connect master's Telegram account by saving their chat_id"""
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1892,6 +2285,7 @@ async def connect_telegram(master_id: str, chat_id: str):
             "updated_at": datetime.utcnow()
         }}
     )
+    invalidate_master(master_id)
     
     # Send welcome message
     if telegram_service.enabled:
@@ -1915,6 +2309,7 @@ async def disconnect_telegram(master_id: str):
             "updated_at": datetime.utcnow()
         }}
     )
+    invalidate_master(master_id)
     
     logger.info(f"✅ Telegram disconnected for master {master_id}")
     return {"success": True, "message": "Telegram disconnected"}
@@ -1923,7 +2318,7 @@ async def disconnect_telegram(master_id: str):
 async def test_telegram_notification(master_id: str):
     """Send a test notification to master's Telegram"""
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -1976,7 +2371,7 @@ async def google_oauth_callback(code: str, state: str = ""):
     
     # If state contains master_id, update master's token
     if state:
-        master = await db.masters.find_one({"id": state}, {"_id": 0})
+        master = await cached_master(db, state)
         if not master:
             if not FRONTEND_URL:
                 raise HTTPException(status_code=500, detail="FRONTEND_URL is not configured")
@@ -1997,6 +2392,7 @@ async def google_oauth_callback(code: str, state: str = ""):
             {"id": state},
             {"$set": update_fields}
         )
+        invalidate_master(state)
         logger.info(f"✅ Google Calendar connected for master: {state}")
     
     # Redirect back to settings page with success
@@ -2010,7 +2406,7 @@ async def get_google_sync_status(master_id: str, current_master: dict = Depends(
     """Check if Google Calendar is connected for a master"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
@@ -2038,6 +2434,7 @@ async def disconnect_google_calendar(master_id: str, current_master: dict = Depe
             "updated_at": datetime.utcnow()
         }}
     )
+    invalidate_master(master_id)
     
     logger.info(f"✅ Google Calendar disconnected for master: {master_id}")
     return {"success": True, "message": "Google Calendar disconnected"}
@@ -2111,7 +2508,7 @@ async def import_google_events(master_id: str, current_master: dict = Depends(ge
     """Import Google Calendar events as blocked time (two-way sync: Google → Slotta)"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -2127,14 +2524,16 @@ async def import_google_events(master_id: str, current_master: dict = Depends(ge
         )
         await db.masters.update_one(
             {"id": master_id},
-            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "success"}}
+            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "success", "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(master_id)
         await log_google_sync(master_id, "import_events", "success", f"Imported {imported_count} events")
     except Exception as e:
         await db.masters.update_one(
             {"id": master_id},
-            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "failure"}}
+            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "failure", "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(master_id)
         await log_google_sync(master_id, "import_events", "failure", str(e))
         raise
     
@@ -2149,7 +2548,7 @@ async def sync_bookings_to_google(master_id: str, current_master: dict = Depends
     """Push all Slotta bookings to Google Calendar (two-way sync: Slotta → Google)"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -2165,10 +2564,15 @@ async def sync_bookings_to_google(master_id: str, current_master: dict = Depends
             "google_event_id": {"$exists": False}
         }, {"_id": 0}).to_list(100)
         
+        # Batch-load service and client details
+        loaders = Loaders(db)
+        services = await loaders.services.load_many(b['service_id'] for b in bookings)
+        clients = await loaders.clients.load_many(b['client_id'] for b in bookings)
+        
+        synced_count = 0
         for booking in bookings:
-            # Get service and client details
-            service = await db.services.find_one({"id": booking['service_id']}, {"_id": 0})
-            client = await db.clients.find_one({"id": booking['client_id']}, {"_id": 0})
+            service = services.get(booking['service_id'])
+            client = clients.get(booking['client_id'])
             
             if not service or not client:
                 continue
@@ -2194,14 +2598,16 @@ async def sync_bookings_to_google(master_id: str, current_master: dict = Depends
         
         await db.masters.update_one(
             {"id": master_id},
-            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "success"}}
+            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "success", "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(master_id)
         await log_google_sync(master_id, "sync_bookings", "success", f"Synced {synced_count} bookings")
     except Exception as e:
         await db.masters.update_one(
             {"id": master_id},
-            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "failure"}}
+            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "failure", "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(master_id)
         await log_google_sync(master_id, "sync_bookings", "failure", str(e))
         raise
     
@@ -2217,7 +2623,7 @@ async def full_calendar_sync(master_id: str, current_master: dict = Depends(get_
     """Full two-way sync: Slotta ↔ Google Calendar"""
     require_active_subscription(current_master)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
@@ -2234,8 +2640,9 @@ async def full_calendar_sync(master_id: str, current_master: dict = Depends(get_
         
         await db.masters.update_one(
             {"id": master_id},
-            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "success"}}
+            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "success", "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(master_id)
         await log_google_sync(master_id, "full_sync", "success", "Two-way sync completed")
         
         return {
@@ -2247,8 +2654,9 @@ async def full_calendar_sync(master_id: str, current_master: dict = Depends(get_
     except Exception as e:
         await db.masters.update_one(
             {"id": master_id},
-            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "failure"}}
+            {"$set": {"google_last_sync_at": datetime.utcnow(), "google_last_sync_status": "failure", "updated_at": datetime.utcnow()}}
         )
+        invalidate_master(master_id)
         await log_google_sync(master_id, "full_sync", "failure", str(e))
         raise
 
@@ -2258,155 +2666,92 @@ async def full_calendar_sync(master_id: str, current_master: dict = Depends(get_
 
 @api_router.post("/admin/send-daily-summaries")
 async def send_daily_summaries(request: Request):
-    """Send daily summary emails to all masters at 8:00 AM in their timezone"""
+    """Send every daily summary that is due now (the in-process scheduler does this every minute)"""
     require_admin(request)
     
-    try:
-        from zoneinfo import ZoneInfo
-    except ImportError:
-        from backports.zoneinfo import ZoneInfo
+    result = await run_due_summaries(db)
     
-    # Get all masters with email notifications enabled
-    masters = await db.masters.find(
-        {"settings.daily_summary_enabled": {"$ne": False}},
-        {"_id": 0}
-    ).to_list(10000)
+    logger.info(f"✅ Daily summaries sent to {result['sent_count']} masters (skipped {result['late_skipped_count']} - too late)")
+    return {"success": True, **result}
+
+@api_router.post("/admin/rebuild-master-stats")
+async def rebuild_master_stats_endpoint(request: Request, master_id: Optional[str] = None):
+    """Reconcile master_stats from raw bookings and transactions"""
+    require_admin(request)
     
-    sent_count = 0
-    skipped_count = 0
-    now_utc = datetime.utcnow()
+    rebuilt = await rebuild_master_stats(db, master_id)
+    return {"success": True, "masters_rebuilt": rebuilt}
+
+@api_router.post("/admin/rebuild-heatmaps")
+async def rebuild_heatmaps_endpoint(request: Request, master_id: Optional[str] = None):
+    """Recompute demand heatmaps from raw bookings"""
+    require_admin(request)
     
-    for master in masters:
-        # Get master's timezone (default to UTC)
-        master_tz = master.get('settings', {}).get('timezone', 'UTC')
-        summary_time = master.get('settings', {}).get('summary_time', '08:00')
-        
-        try:
-            tz = ZoneInfo(master_tz)
-            now_local = datetime.now(tz)
-            
-            # Check if it's 8:00 AM (or configured time) in master's timezone
-            target_hour, target_minute = map(int, summary_time.split(':'))
-            
-            # Only send if within the target hour (allows for some scheduling flexibility)
-            if now_local.hour != target_hour:
-                skipped_count += 1
-                continue
-                
-        except Exception as e:
-            logger.warning(f"Invalid timezone {master_tz} for master {master['id']}: {e}")
-            # Fall back to UTC
-            tz = ZoneInfo('UTC')
-            now_local = datetime.now(tz)
-        
-        # Get today's bookings in master's local time
-        today_local = now_local.date()
-        start_of_day = datetime.combine(today_local, datetime.min.time())
-        end_of_day = start_of_day + timedelta(days=1)
-        
-        bookings = await db.bookings.find({
-            "master_id": master['id'],
-            "booking_date": {"$gte": start_of_day, "$lt": end_of_day},
-            "status": {"$in": ["confirmed", "pending"]}
-        }, {"_id": 0}).sort("booking_date", 1).to_list(100)
-        
-        # Format bookings for email
-        upcoming = []
-        for b in bookings:
-            service = await db.services.find_one({"id": b['service_id']}, {"_id": 0, "name": 1})
-            client = await db.clients.find_one({"id": b['client_id']}, {"_id": 0, "name": 1})
-            upcoming.append({
-                "time": b['booking_date'].strftime("%H:%M"),
-                "client": client['name'] if client else "Client",
-                "service": service['name'] if service else "Service"
-            })
-        
-        # Get analytics
-        analytics = await db.bookings.aggregate([
-            {"$match": {"master_id": master['id'], "status": "confirmed"}},
-            {"$group": {"_id": None, "total_slotta": {"$sum": "$slotta_amount"}}}
-        ]).to_list(1)
-        
-        time_protected = analytics[0]['total_slotta'] if analytics else 0
-        
-        # Get pending payouts
-        wallet = await db.transactions.aggregate([
-            {"$match": {"master_id": master['id']}},
-            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-        ]).to_list(1)
-        
-        pending_payouts = wallet[0]['total'] if wallet else 0
-        
-        # Send email
-        success = await email_service.send_daily_summary(
-            to_email=master['email'],
-            master_name=master['name'],
-            upcoming_bookings=upcoming,
-            time_protected=time_protected,
-            pending_payouts=pending_payouts
-        )
-        
-        if success:
-            sent_count += 1
+    rebuilt = await rebuild_heatmaps(db, master_id)
+    return {"success": True, "masters_rebuilt": rebuilt}
+
+@api_router.post("/admin/rebuild-client-risk")
+async def rebuild_client_risk_endpoint(request: Request, client_id: Optional[str] = None):
+    """Recompute per-client risk features from raw bookings"""
+    require_admin(request)
+    
+    rebuilt = await rebuild_client_features(db, client_id)
+    return {"success": True, "clients_rebuilt": rebuilt}
+
+@api_router.get("/admin/entity-cache")
+async def get_entity_cache_stats(request: Request):
+    """Hit ratio and size of the master / service read-through caches"""
+    require_admin(request)
+    
+    return cache_stats()
+
+@api_router.get("/admin/password-hasher")
+async def get_password_hasher_stats(request: Request):
+    """Work factor, queue depth and latency of the password hashing pool"""
+    require_admin(request)
     
-    logger.info(f"✅ Daily summaries sent to {sent_count} masters (skipped {skipped_count} - wrong time)")
-    return {"success": True, "sent_count": sent_count, "skipped_count": skipped_count}
+    return password_hasher.stats()
+
+@api_router.get("/admin/sdk-executor")
+async def get_sdk_executor_stats(request: Request):
+    """Queue depth and latency of the blocking SDK thread pools"""
+    require_admin(request)
+    
+    return sdk_executor.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Request, outbound call and pool metrics in the Prometheus text format"""
+    require_admin(request)
+    
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+metrics.register_stats("sdk_executor", sdk_executor.stats, label="provider")
+metrics.register_stats("password_hasher", password_hasher.stats)
+metrics.register_stats("entity_cache", lambda: cache_stats()["caches"], label="cache")
+metrics.register_stats("log_queue", logging_stats)
+
+@api_router.post("/admin/outbox/requeue")
+async def requeue_outbox(request: Request, message_id: Optional[str] = None):
+    """Move dead-lettered notifications back to the outbox queue"""
+    require_admin(request)
+    
+    requeued = await requeue_dead(db, message_id)
+    return {"success": True, "requeued": requeued}
 
 @api_router.post("/admin/test-daily-summary/{master_id}")
 async def test_daily_summary(master_id: str, request: Request):
     """Send a test daily summary to a specific master (for testing)"""
     require_admin(request)
     
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
-    # Get today's bookings
-    today = datetime.utcnow().date()
-    start_of_day = datetime.combine(today, datetime.min.time())
-    end_of_day = start_of_day + timedelta(days=1)
-    
-    bookings = await db.bookings.find({
-        "master_id": master['id'],
-        "booking_date": {"$gte": start_of_day, "$lt": end_of_day},
-        "status": {"$in": ["confirmed", "pending"]}
-    }, {"_id": 0}).sort("booking_date", 1).to_list(100)
-    
-    # Format bookings
-    upcoming = []
-    for b in bookings:
-        service = await db.services.find_one({"id": b['service_id']}, {"_id": 0, "name": 1})
-        client = await db.clients.find_one({"id": b['client_id']}, {"_id": 0, "name": 1})
-        upcoming.append({
-            "time": b['booking_date'].strftime("%H:%M"),
-            "client": client['name'] if client else "Client",
-            "service": service['name'] if service else "Service"
-        })
-    
-    # Get analytics
-    analytics = await db.bookings.aggregate([
-        {"$match": {"master_id": master['id'], "status": "confirmed"}},
-        {"$group": {"_id": None, "total_slotta": {"$sum": "$slotta_amount"}}}
-    ]).to_list(1)
-    
-    time_protected = analytics[0]['total_slotta'] if analytics else 0
-    
-    # Get pending payouts
-    wallet = await db.transactions.aggregate([
-        {"$match": {"master_id": master['id']}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
-    
-    pending_payouts = wallet[0]['total'] if wallet else 0
+    summary = (await build_summaries(db, [master], datetime.utcnow()))[0]
     
     # Send email
-    success = await email_service.send_daily_summary(
-        to_email=master['email'],
-        master_name=master['name'],
-        upcoming_bookings=upcoming,
-        time_protected=time_protected,
-        pending_payouts=pending_payouts
-    )
+    success = await email_service.send_daily_summary(**summary)
     
     if success:
         return {"success": True, "message": f"Test daily summary sent to {master['email']}"}
@@ -2445,40 +2790,18 @@ async def send_message_to_client(
     """Send message to client via email/Telegram"""
     
     # Get master and client
-    master = await db.masters.find_one({"id": master_id}, {"_id": 0})
+    master = await cached_master(db, master_id)
     client = await db.clients.find_one({"id": client_id}, {"_id": 0})
     
     if not master or not client:
         raise HTTPException(status_code=404, detail="Master or client not found")
     
     # Send via email
-    try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-        
-        email_message = Mail(
-            from_email=os.getenv('FROM_EMAIL', 'noreply@slotta.app'),
-            to_emails=client['email'],
-            subject=f"Message from {master['name']}",
-            html_content=f'''
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <h2 style="color: #8b5cf6;">Message from {master['name']}</h2>
-                <p>Hi {client['name']},</p>
-                <div style="background: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    {message}
-                </div>
-                <p>Reply to this email to contact {master['name']} directly.</p>
-                <p style="color: #6b7280; font-size: 12px;">Slotta - Smart scheduling for professionals.</p>
-            </div>
-            ''')
-        
-        sg = SendGridAPIClient(os.getenv('SENDGRID_API_KEY'))
-        response = sg.send(email_message)
-        
-        logger.info(f"✅ Message sent to {client['email']}")
-        
-    except Exception as e:
-        logger.error(f"❌ Failed to send email: {e}")
+    await email_service.send_client_broadcast(
+        master_name=master['name'],
+        message=message,
+        recipients=[{"email": client['email'], "name": client['name']}]
+    )
     
     # Store message in database
     message_doc = {
@@ -2493,6 +2816,50 @@ async def send_message_to_client(
     
     return {"message": "Message sent successfully"}
 
+@api_router.post("/messages/broadcast/{master_id}")
+async def broadcast_message_to_clients(
+    master_id: str,
+    broadcast: BroadcastCreate,
+    current_master: dict = Depends(get_current_master)
+):
+    """Email a message to many clients at once (batched SendGrid personalizations)"""
+    require_active_subscription(current_master)
+    if current_master["id"] != master_id:
+        raise HTTPException(status_code=403, detail="Cannot message another master's clients")
+    
+    client_ids = await db.bookings.distinct("client_id", {"master_id": master_id})
+    if broadcast.client_ids is not None:
+        allowed = set(client_ids)
+        client_ids = [cid for cid in broadcast.client_ids if cid in allowed]
+    
+    clients = await db.clients.find(
+        {"id": {"$in": client_ids}, "email": {"$ne": None}},
+        {"_id": 0, "id": 1, "name": 1, "email": 1}
+    ).to_list(None)
+    
+    sent = await email_service.send_client_broadcast(
+        master_name=current_master['name'],
+        message=broadcast.message,
+        recipients=clients
+    )
+    
+    now = datetime.utcnow()
+    if clients:
+        await db.messages.insert_many([
+            {
+                "id": str(uuid.uuid4()),
+                "master_id": master_id,
+                "client_id": c['id'],
+                "booking_id": None,
+                "message": broadcast.message,
+                "broadcast": True,
+                "sent_at": now
+            }
+            for c in clients
+        ])
+    
+    return {"success": True, "recipients": len(clients), "sent_count": sent}
+
 # ============================================================================
 # CALENDAR BLOCK ENDPOINTS
 # ============================================================================
@@ -2517,16 +2884,20 @@ async def create_calendar_block(block_data: CalendarBlockCreate, current_master:
     return {"message": "Time blocked successfully", "block_id": block['id']}
 
 @api_router.get("/calendar/blocks/master/{master_id}")
-async def get_master_calendar_blocks(master_id: str, current_master: dict = Depends(get_current_master)):
-    """Get all calendar blocks for a master"""
+async def get_master_calendar_blocks(
+    master_id: str,
+    response: Response,
+    limit: int = 1000,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_master: dict = Depends(get_current_master)
+):
+    """Get calendar blocks for a master in start order (cursor-paginated, see X-Next-Cursor)"""
     require_active_subscription(current_master)
     
-    blocks = await db.calendar_blocks.find(
-        {"master_id": master_id},
-        {"_id": 0}
-    ).sort("start_datetime", 1).to_list(1000)
-    
-    return blocks
+    page = await paginate(db.calendar_blocks, {"master_id": master_id}, "start_datetime", limit, cursor, direction=1, include_total=include_total)
+    set_page_headers(response, page)
+    return page["items"]
 
 @api_router.delete("/calendar/blocks/{block_id}")
 async def delete_calendar_block(block_id: str, current_master: dict = Depends(get_current_master)):
@@ -2566,7 +2937,7 @@ async def seed_demo_data(request: Request):
         "id": demo_master_id,
         "email": "sophia@slotta.app",
         "name": "Sophia Brown",
-        "password_hash": hash_password("demo123"),  # Demo password
+        "password_hash": await hash_password("demo123"),  # Demo password
         "phone": "+1-555-0123",
         "specialty": "Hair Styling & Coloring",
         "bio": "Award-winning stylist with 10+ years experience. Specializing in balayage, creative cuts, and bridal styling.",
@@ -2660,8 +3031,12 @@ app.add_middleware(
     allow_origins=CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
+# Outermost, so rate-limited and CORS-rejected requests are counted too
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("🚀 Slotta API starting...")
@@ -2669,8 +3044,27 @@ async def startup_event():
     logger.info(f"🤖 Telegram bot: {'✅ Enabled' if telegram_service.enabled else '❌ Disabled (add TELEGRAM_BOT_TOKEN)'}")
     logger.info(f"💳 Stripe: {'✅ Enabled' if stripe_service.enabled else '❌ Disabled (add STRIPE_SECRET_KEY)'}")
     logger.info(f"📅 Google Calendar: {'✅ Enabled' if google_calendar_service.enabled else '❌ Disabled (add GOOGLE_CLIENT_ID)'}")
+    try:
+        schema_version = await run_migrations(db)
+        logger.info(f"🗄️  Database schema version: {schema_version}")
+    except Exception as e:
+        # Booking / client race protection depends on migration-created unique
+        # indexes, so never serve traffic on an outdated schema
+        log_error(logger, "db_migrations_failed", error=str(e))
+        raise
+    await http_clients.start()
+    await password_hasher.start()
+    rate_limiter.start(db)
+    outbox_worker.start(db)
+    daily_summary_scheduler.start(db)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await daily_summary_scheduler.stop()
+    await outbox_worker.stop()
+    await http_clients.close()
+    sdk_executor.shutdown()
+    password_hasher.shutdown()
     client.close()
     logger.info("👋 Slotta API shutting down...")
+    stop_logging()
@@ -3,10 +3,18 @@ from .email_service import email_service
 from .telegram_service import telegram_service
 from .stripe_service import stripe_service
 from .google_calendar_service import google_calendar_service
+from .http_clients import http_clients
+from .sdk_executor import sdk_executor
+from .sendgrid_transport import sendgrid_transport
+from .password_hasher import password_hasher
 
 __all__ = [
     'email_service',
     'telegram_service',
     'stripe_service',
-    'google_calendar_service'
+    'google_calendar_service',
+    'http_clients',
+    'sdk_executor',
+    'sendgrid_transport',
+    'password_hasher'
 ]
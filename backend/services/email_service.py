@@ -10,11 +10,67 @@ To enable:
 """
 
 import os
+import html
 import logging
-from typing import Optional
+from typing import List, Optional
+
+from metrics import instrumented
+from .sendgrid_transport import sendgrid_transport
 
 logger = logging.getLogger(__name__)
 
+# Shared by every recipient of a bulk send; -key- tags are filled per recipient
+DAILY_SUMMARY_SUBJECT = '☀️ Good morning, -master_name-! Your daily summary'
+DAILY_SUMMARY_HTML = '''
+<div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+    <h2 style="color: #8b5cf6;">Good morning, -master_name-!</h2>
+    <p>Here's your daily summary:</p>
+    
+    <div style="background: linear-gradient(135deg, #8b5cf6, #ec4899); padding: 20px; border-radius: 12px; color: white; margin: 20px 0;">
+        <h3 style="margin-top: 0;">Today's Schedule</h3>
+        <div style="background: rgba(255,255,255,0.2); padding: 15px; border-radius: 8px;">
+            -bookings_html-
+        </div>
+    </div>
+    
+    <div style="display: flex; gap: 15px; margin: 20px 0;">
+        <div style="flex: 1; background: #f3f4f6; padding: 20px; border-radius: 8px; text-align: center;">
+            <div style="font-size: 32px; font-weight: bold; color: #8b5cf6;">€-time_protected-</div>
+            <div style="color: #6b7280; font-size: 14px;">Time Protected</div>
+        </div>
+        <div style="flex: 1; background: #f3f4f6; padding: 20px; border-radius: 8px; text-align: center;">
+            <div style="font-size: 32px; font-weight: bold; color: #10b981;">€-pending_payouts-</div>
+            <div style="color: #6b7280; font-size: 14px;">Pending Payouts</div>
+        </div>
+    </div>
+    
+    <p style="text-align: center;">
+        <a href="https://slotta.app/master/dashboard" style="background: #8b5cf6; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
+            View Dashboard
+        </a>
+    </p>
+    
+    <p style="color: #6b7280; font-size: 12px; text-align: center; margin-top: 30px;">
+        Slotta - Protect your time, fairly.<br>
+        <a href="https://slotta.app/master/settings" style="color: #8b5cf6;">Manage email preferences</a>
+    </p>
+</div>
+'''
+
+# -key- values come from _client_message_data, HTML-escaped for the body
+CLIENT_MESSAGE_SUBJECT = 'Message from -master_name_text-'
+CLIENT_MESSAGE_HTML = '''
+<div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+    <h2 style="color: #8b5cf6;">Message from -master_name-</h2>
+    <p>Hi -client_name-,</p>
+    <div style="background: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
+        -message-
+    </div>
+    <p>Reply to this email to contact -master_name- directly.</p>
+    <p style="color: #6b7280; font-size: 12px;">Slotta - Smart scheduling for professionals.</p>
+</div>
+'''
+
 class EmailService:
     
     def __init__(self):
@@ -26,6 +82,7 @@ class EmailService:
             logger.warning("⚠️  Email service disabled: SENDGRID_API_KEY not found in .env")
             logger.info("📧 To enable emails: Get free API key from https://sendgrid.com")
     
+    @instrumented
     async def send_booking_confirmation(
         self,
         to_email: str,
@@ -43,12 +100,9 @@ class EmailService:
             return True
         
         try:
-            from sendgrid import SendGridAPIClient
-            from sendgrid.helpers.mail import Mail
-            
-            message = Mail(
+            sent = await sendgrid_transport.send(
                 from_email=self.from_email,
-                to_emails=to_email,
+                to_email=to_email,
                 subject=f'Booking Confirmed with {master_name}',
                 html_content=f'''
                 <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
@@ -67,8 +121,8 @@ class EmailService:
                 </div>
                 ''')
             
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
+            if not sent:
+                return False
             
             logger.info(f"✅ Booking confirmation sent to {to_email}")
             return True
@@ -77,6 +131,7 @@ class EmailService:
             logger.error(f"❌ Failed to send email: {e}")
             return False
     
+    @instrumented
     async def send_master_new_booking(
         self,
         to_email: str,
@@ -93,12 +148,9 @@ class EmailService:
             return True
         
         try:
-            from sendgrid import SendGridAPIClient
-            from sendgrid.helpers.mail import Mail
-            
-            message = Mail(
+            sent = await sendgrid_transport.send(
                 from_email=self.from_email,
-                to_emails=to_email,
+                to_email=to_email,
                 subject=f'New Booking: {client_name}',
                 html_content=f'''
                 <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
@@ -115,8 +167,8 @@ class EmailService:
                 </div>
                 ''')
             
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
+            if not sent:
+                return False
             
             logger.info(f"✅ New booking notification sent to {to_email}")
             return True
@@ -125,6 +177,7 @@ class EmailService:
             logger.error(f"❌ Failed to send email: {e}")
             return False
     
+    @instrumented
     async def send_no_show_alert(
         self,
         to_email: str,
@@ -140,12 +193,9 @@ class EmailService:
             return True
         
         try:
-            from sendgrid import SendGridAPIClient
-            from sendgrid.helpers.mail import Mail
-            
-            message = Mail(
+            sent = await sendgrid_transport.send(
                 from_email=self.from_email,
-                to_emails=to_email,
+                to_email=to_email,
                 subject=f'No-Show: {client_name}',
                 html_content=f'''
                 <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
@@ -160,8 +210,8 @@ class EmailService:
                 </div>
                 ''')
             
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
+            if not sent:
+                return False
             
             logger.info(f"✅ No-show alert sent to {to_email}")
             return True
@@ -170,6 +220,34 @@ class EmailService:
             logger.error(f"❌ Failed to send email: {e}")
             return False
     
+    def _daily_summary_data(
+        self,
+        master_name: str,
+        upcoming_bookings: list,
+        time_protected: float,
+        pending_payouts: float
+    ) -> dict:
+        """Per-recipient values for DAILY_SUMMARY_HTML"""
+        
+        # Build bookings list HTML
+        bookings_html = ""
+        if upcoming_bookings:
+            bookings_html = "<ul style='margin: 0; padding-left: 20px;'>"
+            for b in upcoming_bookings[:5]:
+                bookings_html += f"<li>{b['time']} - {b['client']} ({b['service']})</li>"
+            bookings_html += "</ul>"
+            if len(upcoming_bookings) > 5:
+                bookings_html += f"<p style='color: #6b7280; font-size: 12px;'>+ {len(upcoming_bookings) - 5} more</p>"
+        else:
+            bookings_html = "<p style='color: #6b7280;'>No bookings today</p>"
+        
+        return {
+            "master_name": master_name,
+            "bookings_html": bookings_html,
+            "time_protected": time_protected,
+            "pending_payouts": pending_payouts
+        }
+    
     async def send_daily_summary(
         self,
         to_email: str,
@@ -180,75 +258,98 @@ class EmailService:
     ) -> bool:
         """Send daily summary email to master (Quick Stats)"""
         
+        sent = await self.send_daily_summaries([{
+            "to_email": to_email,
+            "master_name": master_name,
+            "upcoming_bookings": upcoming_bookings,
+            "time_protected": time_protected,
+            "pending_payouts": pending_payouts
+        }])
+        return sent == 1
+    
+    @instrumented
+    async def send_daily_summaries(self, summaries: List[dict]) -> int:
+        """Send many daily summaries, up to 1000 per SendGrid request
+        
+        Each item has the send_daily_summary arguments. Returns the number sent.
+        """
+        
         if not self.enabled:
-            logger.info(f"[MOCK] Would send daily summary to {to_email}")
-            return True
+            for summary in summaries:
+                logger.info(f"[MOCK] Would send daily summary to {summary['to_email']}")
+            return len(summaries)
         
         try:
-            from sendgrid import SendGridAPIClient
-            from sendgrid.helpers.mail import Mail
+            recipients = [
+                {
+                    "email": summary["to_email"],
+                    "data": self._daily_summary_data(
+                        summary["master_name"],
+                        summary["upcoming_bookings"],
+                        summary["time_protected"],
+                        summary["pending_payouts"]
+                    )
+                }
+                for summary in summaries
+            ]
+            sent = await sendgrid_transport.send_bulk(
+                from_email=self.from_email,
+                recipients=recipients,
+                subject=DAILY_SUMMARY_SUBJECT,
+                html_content=DAILY_SUMMARY_HTML,
+                template_id=os.getenv('SENDGRID_TEMPLATE_DAILY_SUMMARY')
+            )
             
-            # Build bookings list HTML
-            bookings_html = ""
-            if upcoming_bookings:
-                bookings_html = "<ul style='margin: 0; padding-left: 20px;'>"
-                for b in upcoming_bookings[:5]:
-                    bookings_html += f"<li>{b['time']} - {b['client']} ({b['service']})</li>"
-                bookings_html += "</ul>"
-                if len(upcoming_bookings) > 5:
-                    bookings_html += f"<p style='color: #6b7280; font-size: 12px;'>+ {len(upcoming_bookings) - 5} more</p>"
-            else:
-                bookings_html = "<p style='color: #6b7280;'>No bookings today</p>"
+            logger.info(f"✅ Daily summary sent to {sent}/{len(summaries)} masters")
+            return sent
             
-            message = Mail(
+        except Exception as e:
+            logger.error(f"❌ Failed to send daily summary: {e}")
+            return 0
+    
+    def _client_message_data(self, master_name: str, message: str, client_name: str) -> dict:
+        """Per-recipient values for CLIENT_MESSAGE_HTML, escaped for HTML"""
+        return {
+            "master_name": html.escape(master_name),
+            # The subject is plain text; keep it on one line
+            "master_name_text": " ".join(master_name.split()),
+            "client_name": html.escape(client_name),
+            "message": html.escape(message).replace("\n", "<br>")
+        }
+    
+    @instrumented
+    async def send_client_broadcast(
+        self,
+        master_name: str,
+        message: str,
+        recipients: List[dict]
+    ) -> int:
+        """Send a master's message to many clients ({"email", "name"} each)
+        
+        Returns the number of clients the message was accepted for.
+        """
+        
+        if not self.enabled:
+            logger.info(f"[MOCK] Would send broadcast from {master_name} to {len(recipients)} clients")
+            return len(recipients)
+        
+        try:
+            sent = await sendgrid_transport.send_bulk(
                 from_email=self.from_email,
-                to_emails=to_email,
-                subject=f'☀️ Good morning, {master_name}! Your daily summary',
-                html_content=f'''
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                    <h2 style="color: #8b5cf6;">Good morning, {master_name}!</h2>
-                    <p>Here's your daily summary:</p>
-                    
-                    <div style="background: linear-gradient(135deg, #8b5cf6, #ec4899); padding: 20px; border-radius: 12px; color: white; margin: 20px 0;">
-                        <h3 style="margin-top: 0;">Today's Schedule</h3>
-                        <div style="background: rgba(255,255,255,0.2); padding: 15px; border-radius: 8px;">
-                            {bookings_html}
-                        </div>
-                    </div>
-                    
-                    <div style="display: flex; gap: 15px; margin: 20px 0;">
-                        <div style="flex: 1; background: #f3f4f6; padding: 20px; border-radius: 8px; text-align: center;">
-                            <div style="font-size: 32px; font-weight: bold; color: #8b5cf6;">€{time_protected}</div>
-                            <div style="color: #6b7280; font-size: 14px;">Time Protected</div>
-                        </div>
-                        <div style="flex: 1; background: #f3f4f6; padding: 20px; border-radius: 8px; text-align: center;">
-                            <div style="font-size: 32px; font-weight: bold; color: #10b981;">€{pending_payouts}</div>
-                            <div style="color: #6b7280; font-size: 14px;">Pending Payouts</div>
-                        </div>
-                    </div>
-                    
-                    <p style="text-align: center;">
-                        <a href="https://slotta.app/master/dashboard" style="background: #8b5cf6; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                            View Dashboard
-                        </a>
-                    </p>
-                    
-                    <p style="color: #6b7280; font-size: 12px; text-align: center; margin-top: 30px;">
-                        Slotta - Protect your time, fairly.<br>
-                        <a href="https://slotta.app/master/settings" style="color: #8b5cf6;">Manage email preferences</a>
-                    </p>
-                </div>
-                ''')
-            
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
+                recipients=[
+                    {"email": r["email"], "data": self._client_message_data(master_name, message, r.get("name") or "")}
+                    for r in recipients
+                ],
+                subject=CLIENT_MESSAGE_SUBJECT,
+                html_content=CLIENT_MESSAGE_HTML
+            )
             
-            logger.info(f"✅ Daily summary sent to {to_email}")
-            return True
+            logger.info(f"✅ Broadcast from {master_name} sent to {sent}/{len(recipients)} clients")
+            return sent
             
         except Exception as e:
-            logger.error(f"❌ Failed to send daily summary: {e}")
-            return False
+            logger.error(f"❌ Failed to send broadcast: {e}")
+            return 0
 
 # Global instance
 email_service = EmailService()
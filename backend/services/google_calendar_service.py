@@ -23,6 +23,8 @@ from urllib.parse import urlencode
 
 logger = logging.getLogger(__name__)
 from logging_utils import log_info, log_error
+from metrics import instrumented
+from .http_clients import http_clients
 
 class GoogleCalendarService:
     
@@ -55,6 +57,7 @@ class GoogleCalendarService:
         
         return f"https://accounts.google.com/o/oauth2/v2/auth?{urlencode(params)}"
     
+    @instrumented
     async def exchange_code(self, code: str) -> Optional[Dict]:
         """Exchange authorization code for tokens"""
         
@@ -62,35 +65,34 @@ class GoogleCalendarService:
             return {"access_token": "mock_token", "refresh_token": "mock_refresh"}
         
         try:
-            import httpx
-            
             log_info(logger, "google_oauth_exchange_started")
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://oauth2.googleapis.com/token",
-                    data={
-                        'client_id': self.client_id,
-                        'client_secret': self.client_secret,
-                        'code': code,
-                        'grant_type': 'authorization_code',
-                        'redirect_uri': self.redirect_uri
-                    }
-                )
-                
-                if response.status_code != 200:
-                    log_error(logger, "google_oauth_exchange_failed", status=response.status_code)
-                    return None
-                    
-                tokens = response.json()
-                
-                log_info(logger, "google_oauth_exchange_success")
-                return tokens
-                
+            client = http_clients.get("google_oauth")
+            response = await client.post(
+                "/token",
+                data={
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret,
+                    'code': code,
+                    'grant_type': 'authorization_code',
+                    'redirect_uri': self.redirect_uri
+                }
+            )
+            
+            if response.status_code != 200:
+                log_error(logger, "google_oauth_exchange_failed", status=response.status_code)
+                return None
+            
+            tokens = response.json()
+            
+            log_info(logger, "google_oauth_exchange_success")
+            return tokens
+            
         except Exception as e:
             log_error(logger, "google_oauth_exchange_exception", error=str(e))
             return None
     
+    @instrumented
     async def refresh_token(self, refresh_token: str) -> Optional[Dict]:
         """Refresh access token"""
         
@@ -98,29 +100,28 @@ class GoogleCalendarService:
             return {"access_token": "mock_refreshed_token", "expires_in": 3600}
         
         try:
-            import httpx
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://oauth2.googleapis.com/token",
-                    data={
-                        'client_id': self.client_id,
-                        'client_secret': self.client_secret,
-                        'refresh_token': refresh_token,
-                        'grant_type': 'refresh_token'
-                    }
-                )
-                response.raise_for_status()
-                tokens = response.json()
-                return {
-                    "access_token": tokens.get("access_token"),
-                    "expires_in": tokens.get("expires_in")
+            client = http_clients.get("google_oauth")
+            response = await client.post(
+                "/token",
+                data={
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret,
+                    'refresh_token': refresh_token,
+                    'grant_type': 'refresh_token'
                 }
-                
+            )
+            response.raise_for_status()
+            tokens = response.json()
+            return {
+                "access_token": tokens.get("access_token"),
+                "expires_in": tokens.get("expires_in")
+            }
+            
         except Exception as e:
             log_error(logger, "google_oauth_refresh_failed", error=str(e))
             return None
 
+    @instrumented
     async def update_event(
         self,
         access_token: str,
@@ -137,9 +138,7 @@ class GoogleCalendarService:
             return True
         
         try:
-            import httpx
-            
-            url = f"https://www.googleapis.com/calendar/v3/calendars/primary/events/{event_id}"
+            url = f"/calendar/v3/calendars/primary/events/{event_id}"
             
             event_data = {
                 'summary': summary,
@@ -154,13 +153,13 @@ class GoogleCalendarService:
                 }
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.patch(
-                    url,
-                    json=event_data,
-                    headers={'Authorization': f'Bearer {access_token}'}
-                )
-                response.raise_for_status()
+            client = http_clients.get("google_calendar")
+            response = await client.patch(
+                url,
+                json=event_data,
+                headers={'Authorization': f'Bearer {access_token}'}
+            )
+            response.raise_for_status()
             
             log_info(logger, "google_calendar_event_updated", event_id=event_id)
             return True
@@ -169,6 +168,7 @@ class GoogleCalendarService:
             log_error(logger, "google_calendar_event_update_failed", error=str(e))
             return False
     
+    @instrumented
     async def create_event(
         self,
         access_token: str,
@@ -184,9 +184,7 @@ class GoogleCalendarService:
             return "mock_event_id_123"
         
         try:
-            import httpx
-            
-            url = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+            url = "/calendar/v3/calendars/primary/events"
             
             event_data = {
                 'summary': summary,
@@ -208,22 +206,23 @@ class GoogleCalendarService:
                 }
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    json=event_data,
-                    headers={'Authorization': f'Bearer {access_token}'}
-                )
-                response.raise_for_status()
-                
-                event = response.json()
-                log_info(logger, "google_calendar_event_created", event_id=event['id'])
-                return event['id']
+            client = http_clients.get("google_calendar")
+            response = await client.post(
+                url,
+                json=event_data,
+                headers={'Authorization': f'Bearer {access_token}'}
+            )
+            response.raise_for_status()
+            
+            event = response.json()
+            log_info(logger, "google_calendar_event_created", event_id=event['id'])
+            return event['id']
             
         except Exception as e:
             log_error(logger, "google_calendar_event_create_failed", error=str(e))
             return None
     
+    @instrumented
     async def delete_event(
         self,
         access_token: str,
@@ -236,16 +235,14 @@ class GoogleCalendarService:
             return True
         
         try:
-            import httpx
+            url = f"/calendar/v3/calendars/primary/events/{event_id}"
             
-            url = f"https://www.googleapis.com/calendar/v3/calendars/primary/events/{event_id}"
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    url,
-                    headers={'Authorization': f'Bearer {access_token}'}
-                )
-                response.raise_for_status()
+            client = http_clients.get("google_calendar")
+            response = await client.delete(
+                url,
+                headers={'Authorization': f'Bearer {access_token}'}
+            )
+            response.raise_for_status()
             
             log_info(logger, "google_calendar_event_deleted", event_id=event_id)
             return True
@@ -254,6 +251,7 @@ class GoogleCalendarService:
             log_error(logger, "google_calendar_event_delete_failed", error=str(e))
             return False
     
+    @instrumented
     async def get_events(
         self,
         access_token: str,
@@ -267,9 +265,7 @@ class GoogleCalendarService:
             return []
         
         try:
-            import httpx
-            
-            url = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+            url = "/calendar/v3/calendars/primary/events"
             params = {
                 'timeMin': time_min.isoformat() + 'Z',
                 'timeMax': time_max.isoformat() + 'Z',
@@ -278,19 +274,19 @@ class GoogleCalendarService:
                 'maxResults': 250
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    params=params,
-                    headers={'Authorization': f'Bearer {access_token}'}
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                events = data.get('items', [])
-                
-                log_info(logger, "google_calendar_events_fetched", count=len(events))
-                return events
+            client = http_clients.get("google_calendar")
+            response = await client.get(
+                url,
+                params=params,
+                headers={'Authorization': f'Bearer {access_token}'}
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            events = data.get('items', [])
+            
+            log_info(logger, "google_calendar_events_fetched", count=len(events))
+            return events
             
         except Exception as e:
             log_error(logger, "google_calendar_events_fetch_failed", error=str(e))
@@ -0,0 +1,99 @@
+"""Shared Outbound HTTP Clients
+
+One long-lived `httpx.AsyncClient` per upstream host, so Telegram, Google and
+SendGrid calls reuse keep-alive connections instead of paying TCP + TLS setup on
+every request. Clients are opened in `startup_event` and closed on shutdown;
+`get()` also opens a client lazily for scripts that never run the app hooks.
+
+Each upstream has its own pool, which makes the connection limits per host.
+
+Configuration (.env):
+    HTTP_CLIENT_HTTP2=true              # needs the `h2` package, ignored otherwise
+    HTTP_CONNECT_TIMEOUT=5
+    HTTP_READ_TIMEOUT=15
+    HTTP_WRITE_TIMEOUT=15
+    HTTP_POOL_TIMEOUT=5
+    HTTP_KEEPALIVE_EXPIRY=30
+    HTTP_MAX_CONNECTIONS_<UPSTREAM>=20  # e.g. HTTP_MAX_CONNECTIONS_TELEGRAM
+"""
+
+import os
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+# upstream name -> (base url, default max connections)
+UPSTREAMS = {
+    "telegram": ("https://api.telegram.org", 20),
+    "google_oauth": ("https://oauth2.googleapis.com", 10),
+    "google_calendar": ("https://www.googleapis.com", 20),
+    "sendgrid": ("https://api.sendgrid.com", 10),
+}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpClientRegistry:
+
+    def __init__(self):
+        self._clients: Dict[str, "httpx.AsyncClient"] = {}
+        self.http2 = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() == "true" and _http2_available()
+
+    def _build(self, name: str):
+        import httpx
+
+        base_url, default_connections = UPSTREAMS[name]
+        max_connections = int(os.getenv(f"HTTP_MAX_CONNECTIONS_{name.upper()}", default_connections))
+        return httpx.AsyncClient(
+            base_url=base_url,
+            http2=self.http2,
+            timeout=httpx.Timeout(
+                connect=_env_float("HTTP_CONNECT_TIMEOUT", 5.0),
+                read=_env_float("HTTP_READ_TIMEOUT", 15.0),
+                write=_env_float("HTTP_WRITE_TIMEOUT", 15.0),
+                pool=_env_float("HTTP_POOL_TIMEOUT", 5.0)
+            ),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", 30.0)
+            )
+        )
+
+    def get(self, name: str):
+        """Return the pooled client for an upstream (opened on first use)"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build(name)
+            self._clients[name] = client
+        return client
+
+    async def start(self):
+        for name in UPSTREAMS:
+            self.get(name)
+        log_info(logger, "http_clients_started", upstreams=list(UPSTREAMS), http2=self.http2)
+
+    async def close(self):
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                log_error(logger, "http_client_close_failed", upstream=name, error=str(e))
+        self._clients = {}
+        log_info(logger, "http_clients_closed")
+
+# Global instance
+http_clients = HttpClientRegistry()
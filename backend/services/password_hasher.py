@@ -0,0 +1,228 @@
+"""Password Hashing Service
+
+bcrypt is deliberately slow (~250 ms of CPU per hash at the tuned cost), so
+it runs in a dedicated ProcessPoolExecutor: a login storm then saturates a
+fixed number of worker processes instead of the event loop or the SDK
+thread pools.
+
+- Work factor: PASSWORD_HASH_ROUNDS if set, otherwise tuned once at startup
+  so one hash takes about PASSWORD_HASH_TARGET_MS on this machine (each
+  extra round doubles the cost), clamped to [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS]
+- Concurrency is capped at the pool size; once PASSWORD_HASH_MAX_QUEUE
+  callers are waiting, new calls fail fast with PasswordHasherSaturated, so
+  login latency stays bounded instead of queueing without limit
+- Legacy unsalted SHA-256 hashes still verify; `verify()` reports
+  `needs_rehash` for them (and for bcrypt hashes below the current cost) so
+  the login path can upgrade them transparently
+- `verify_dummy()` checks against a throwaway hash at the current cost, so a
+  login for an unknown email takes as long as one with a wrong password
+
+Configuration (.env):
+    PASSWORD_HASH_WORKERS=2
+    PASSWORD_HASH_MAX_QUEUE=64
+    PASSWORD_HASH_TARGET_MS=250
+    PASSWORD_HASH_ROUNDS=              # fixed cost, skips tuning
+"""
+
+import os
+import re
+import hmac
+import time
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+from logging_utils import log_info, log_error
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 15
+CALIBRATION_ROUNDS = 10
+
+# bcrypt only uses the first 72 bytes of the password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_BCRYPT_COST = re.compile(r"^\$2[aby]\$(\d{2})\$")
+
+
+class PasswordHasherSaturated(RuntimeError):
+    """Raised when too many hash / verify calls are already waiting"""
+
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode()[:BCRYPT_MAX_PASSWORD_BYTES]
+
+
+# Worker-process functions (module level so they can be pickled)
+
+def _hash_in_worker(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds)).decode()
+
+
+def _verify_in_worker(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(_password_bytes(password), password_hash.encode())
+
+
+def _time_hash_in_worker(rounds: int) -> float:
+    salt = bcrypt.gensalt(rounds)
+    started_at = time.perf_counter()
+    bcrypt.hashpw(b"calibration-password", salt)
+    return time.perf_counter() - started_at
+
+
+def is_legacy_hash(password_hash: str) -> bool:
+    return bool(_LEGACY_SHA256.match(password_hash or ""))
+
+
+def bcrypt_cost(password_hash: str) -> Optional[int]:
+    match = _BCRYPT_COST.match(password_hash or "")
+    return int(match.group(1)) if match else None
+
+
+def rounds_for_target(seconds_at_calibration: float, target_seconds: float) -> int:
+    """Largest cost whose extrapolated hash time stays within the target"""
+    rounds = CALIBRATION_ROUNDS
+    seconds = max(seconds_at_calibration, 1e-6)
+    while rounds < BCRYPT_MAX_ROUNDS and seconds * 2 <= target_seconds:
+        seconds *= 2
+        rounds += 1
+    return max(rounds, BCRYPT_MIN_ROUNDS)
+
+
+class PasswordHasher:
+
+    def __init__(self):
+        self.max_workers = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+        self.max_queue = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+        self.target_seconds = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250")) / 1000
+        fixed_rounds = os.getenv("PASSWORD_HASH_ROUNDS")
+        self.rounds = int(fixed_rounds) if fixed_rounds else 12
+        self._tune = not fixed_rounds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._dummy_hash: Optional[str] = None
+        self.queued = 0
+        self.calls = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.latency_seconds_total = 0.0
+        self.latency_seconds_max = 0.0
+
+    async def start(self):
+        """Open the worker pool and tune the work factor"""
+        self._ensure_pool()
+        if self._tune:
+            try:
+                loop = asyncio.get_running_loop()
+                # Warm every worker, then time on one of them
+                await asyncio.gather(*(
+                    loop.run_in_executor(self._pool, _time_hash_in_worker, BCRYPT_MIN_ROUNDS)
+                    for _ in range(self.max_workers)
+                ))
+                seconds = await loop.run_in_executor(self._pool, _time_hash_in_worker, CALIBRATION_ROUNDS)
+                self.rounds = rounds_for_target(seconds, self.target_seconds)
+            except Exception as e:
+                log_error(logger, "password_hasher_tuning_failed", error=str(e), rounds=self.rounds)
+        try:
+            self._dummy_hash = await self.hash("dummy-password")
+        except Exception as e:
+            log_error(logger, "password_hasher_dummy_failed", error=str(e))
+        log_info(logger, "password_hasher_started", workers=self.max_workers, rounds=self.rounds)
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+    async def _run(self, fn, *args):
+        self._ensure_pool()
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            log_error(logger, "password_hasher_saturated", queued=self.queued)
+            raise PasswordHasherSaturated("password hashing queue is full")
+
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore
+        future = self._pool.submit(fn, *args)
+
+        def _done():
+            latency = time.perf_counter() - started_at
+            self.calls += 1
+            self.latency_seconds_total += latency
+            self.latency_seconds_max = max(self.latency_seconds_max, latency)
+            semaphore.release()
+
+        def _worker_done(_):
+            # Release when the worker finishes, even if the caller was cancelled
+            try:
+                loop.call_soon_threadsafe(_done)
+            except RuntimeError:
+                pass  # loop already closed
+
+        future.add_done_callback(_worker_done)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash_in_worker, password, self.rounds)
+
+    async def rehash(self, password: str) -> str:
+        """Hash at the current cost to replace a legacy / weaker hash"""
+        password_hash = await self.hash(password)
+        self.rehashed += 1
+        return password_hash
+
+    async def verify(self, password: str, password_hash: Optional[str]) -> Tuple[bool, bool]:
+        """(matches, needs_rehash)"""
+        if not password_hash:
+            return False, False
+        if is_legacy_hash(password_hash):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, password_hash), True
+        cost = bcrypt_cost(password_hash)
+        if cost is None:
+            return False, False
+        matches = await self._run(_verify_in_worker, password, password_hash)
+        return matches, matches and cost < self.rounds
+
+    async def verify_dummy(self, password: str) -> bool:
+        """Spend a real verify's time without an account, always False"""
+        if self._dummy_hash is None or bcrypt_cost(self._dummy_hash) != self.rounds:
+            self._dummy_hash = await self.hash("dummy-password")
+        await self._run(_verify_in_worker, password, self._dummy_hash)
+        return False
+
+    def stats(self) -> dict:
+        completed = self.calls or 1
+        return {
+            "workers": self.max_workers,
+            "rounds": self.rounds,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_latency_ms": round(self.latency_seconds_total / completed * 1000, 2),
+            "max_latency_ms": round(self.latency_seconds_max * 1000, 2)
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._semaphore = None
+
+# Global instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,143 @@
+"""Blocking SDK Executor
+
+The Stripe and SendGrid SDKs are synchronous. Calling them directly from an
+`async def` stalls the whole event loop for the network round trip, so every
+other request in the worker waits with it.
+
+`sdk_executor.run(provider, fn, *args, **kwargs)` runs such calls on a
+dedicated thread pool per provider:
+
+- Concurrency is capped per provider (SDK_MAX_WORKERS_<PROVIDER>), so a slow
+  SendGrid cannot starve Stripe and neither can exhaust the process threads
+- Callers beyond the cap wait on the event loop, not in the thread pool; once
+  SDK_MAX_QUEUE_<PROVIDER> callers are waiting, new calls fail fast with
+  SdkExecutorSaturated
+- Queue depth, in-flight count, wait time and call latency are tracked per
+  provider (see `stats()`)
+"""
+
+import os
+import time
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+DEFAULT_MAX_WORKERS = {"stripe": 8, "sendgrid": 4}
+DEFAULT_MAX_QUEUE = 200
+
+
+class SdkExecutorSaturated(RuntimeError):
+    """Raised when a provider's wait queue is full"""
+
+
+class _Provider:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.max_workers = int(os.getenv(f"SDK_MAX_WORKERS_{name.upper()}", DEFAULT_MAX_WORKERS.get(name, 4)))
+        self.max_queue = int(os.getenv(f"SDK_MAX_QUEUE_{name.upper()}", DEFAULT_MAX_QUEUE))
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"sdk-{name}")
+        self.semaphore = asyncio.Semaphore(self.max_workers)
+        self.queued = 0
+        self.max_queued_seen = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.latency_seconds_total = 0.0
+        self.latency_seconds_max = 0.0
+
+    def snapshot(self) -> dict:
+        completed = self.calls or 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "max_queued_seen": self.max_queued_seen,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds_total / completed * 1000, 2),
+            "avg_latency_ms": round(self.latency_seconds_total / completed * 1000, 2),
+            "max_latency_ms": round(self.latency_seconds_max * 1000, 2)
+        }
+
+
+class SdkExecutor:
+
+    def __init__(self):
+        self._providers: Dict[str, _Provider] = {}
+
+    def _provider(self, name: str) -> _Provider:
+        provider = self._providers.get(name)
+        if provider is None:
+            provider = _Provider(name)
+            self._providers[name] = provider
+        return provider
+
+    async def run(self, provider_name: str, fn: Callable, *args, **kwargs):
+        """Run a blocking SDK call off the event loop and return its result"""
+        provider = self._provider(provider_name)
+
+        if provider.queued >= provider.max_queue:
+            provider.rejected += 1
+            log_error(logger, "sdk_executor_saturated", provider=provider_name, queued=provider.queued)
+            raise SdkExecutorSaturated(f"{provider_name} executor queue is full")
+
+        enqueued_at = time.perf_counter()
+        provider.queued += 1
+        provider.max_queued_seen = max(provider.max_queued_seen, provider.queued)
+        try:
+            await provider.semaphore.acquire()
+        finally:
+            provider.queued -= 1
+
+        started_at = time.perf_counter()
+        provider.in_flight += 1
+        provider.wait_seconds_total += started_at - enqueued_at
+
+        loop = asyncio.get_running_loop()
+        future = provider.pool.submit(functools.partial(fn, *args, **kwargs))
+
+        def _done():
+            latency = time.perf_counter() - started_at
+            provider.in_flight -= 1
+            provider.calls += 1
+            provider.latency_seconds_total += latency
+            provider.latency_seconds_max = max(provider.latency_seconds_max, latency)
+            provider.semaphore.release()
+
+        def _thread_done(_):
+            # Release when the thread finishes, even if the caller was cancelled
+            try:
+                loop.call_soon_threadsafe(_done)
+            except RuntimeError:
+                pass  # loop already closed
+
+        future.add_done_callback(_thread_done)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            provider.errors += 1
+            raise
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: provider.snapshot() for name, provider in self._providers.items()}
+
+    def shutdown(self):
+        for provider in self._providers.values():
+            provider.pool.shutdown(wait=False, cancel_futures=True)
+        log_info(logger, "sdk_executor_shutdown", stats=self.stats())
+        self._providers = {}
+
+# Global instance
+sdk_executor = SdkExecutor()
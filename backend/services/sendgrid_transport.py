@@ -0,0 +1,112 @@
+"""Async SendGrid Transport
+
+Talks to the SendGrid v3 `mail/send` endpoint directly over the pooled
+`sendgrid` HTTP client (see http_clients.py) instead of building a blocking
+`SendGridAPIClient` per email.
+
+Bulk sends pack up to MAX_PERSONALIZATIONS recipients into one request. Each
+recipient gets its own personalization, so nobody sees anyone else's
+address, and per-recipient values are filled in by SendGrid:
+
+- with a dynamic template (`template_id`), values go in `dynamic_template_data`
+- otherwise `-key-` tags in the subject and HTML are replaced via
+  `substitutions`
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+from .http_clients import http_clients
+
+# SendGrid's hard limit per mail/send request
+MAX_PERSONALIZATIONS = 1000
+
+
+def substitution_tag(key: str) -> str:
+    return f"-{key}-"
+
+
+class SendGridTransport:
+
+    def __init__(self):
+        self.api_key = os.getenv('SENDGRID_API_KEY')
+        self.enabled = bool(self.api_key)
+        self.requests_sent = 0
+
+    async def _post(self, body: dict) -> bool:
+        response = await http_clients.get("sendgrid").post(
+            "/v3/mail/send",
+            json=body,
+            headers={'Authorization': f'Bearer {self.api_key}'}
+        )
+        self.requests_sent += 1
+        if response.status_code >= 400:
+            log_error(logger, "sendgrid_send_failed", status=response.status_code, body=response.text[:500])
+            return False
+        return True
+
+    async def send(
+        self,
+        from_email: str,
+        to_email: str,
+        subject: str,
+        html_content: str
+    ) -> bool:
+        """Send a single email"""
+        return await self._post({
+            "from": {"email": from_email},
+            "personalizations": [{"to": [{"email": to_email}]}],
+            "subject": subject,
+            "content": [{"type": "text/html", "value": html_content}]
+        })
+
+    async def send_bulk(
+        self,
+        from_email: str,
+        recipients: List[Dict],
+        subject: Optional[str] = None,
+        html_content: Optional[str] = None,
+        template_id: Optional[str] = None
+    ) -> int:
+        """Send one message to many recipients, one personalization each
+
+        `recipients` items are {"email": str, "data": dict}. Returns the number
+        of recipients whose batch was accepted by SendGrid.
+        """
+        accepted = 0
+        for i in range(0, len(recipients), MAX_PERSONALIZATIONS):
+            chunk = recipients[i:i + MAX_PERSONALIZATIONS]
+            personalizations = []
+            for recipient in chunk:
+                personalization = {"to": [{"email": recipient["email"]}]}
+                data = recipient.get("data") or {}
+                if template_id:
+                    personalization["dynamic_template_data"] = data
+                elif data:
+                    personalization["substitutions"] = {
+                        substitution_tag(key): str(value) for key, value in data.items()
+                    }
+                personalizations.append(personalization)
+
+            body = {"from": {"email": from_email}, "personalizations": personalizations}
+            if template_id:
+                body["template_id"] = template_id
+            else:
+                body["subject"] = subject
+                body["content"] = [{"type": "text/html", "value": html_content}]
+
+            try:
+                if await self._post(body):
+                    accepted += len(chunk)
+            except Exception as e:
+                log_error(logger, "sendgrid_bulk_send_failed", recipients=len(chunk), error=str(e))
+
+        log_info(logger, "sendgrid_bulk_sent", recipients=len(recipients), accepted=accepted)
+        return accepted
+
+# Global instance
+sendgrid_transport = SendGridTransport()
@@ -21,6 +21,8 @@ from typing import Optional, Dict
 
 logger = logging.getLogger(__name__)
 from logging_utils import log_info, log_error
+from metrics import instrumented
+from .sdk_executor import sdk_executor
 
 class StripeService:
     
@@ -35,6 +37,7 @@ class StripeService:
         else:
             log_error(logger, "stripe_disabled", reason="missing_secret_key")
     
+    @instrumented
     async def create_payment_intent(
         self,
         amount: float,
@@ -54,7 +57,9 @@ class StripeService:
         try:
             import stripe
             
-            intent = stripe.PaymentIntent.create(
+            intent = await sdk_executor.run(
+                "stripe",
+                stripe.PaymentIntent.create,
                 amount=int(amount * 100),  # Convert to cents
                 currency='eur',
                 capture_method='manual',  # CRITICAL: Hold, don't charge
@@ -77,6 +82,7 @@ class StripeService:
             log_error(logger, "stripe_payment_intent_failed", error=str(e))
             return None
     
+    @instrumented
     async def capture_payment(
         self,
         payment_intent_id: str,
@@ -95,7 +101,9 @@ class StripeService:
             if amount:
                 capture_args['amount_to_capture'] = int(amount * 100)
             
-            intent = stripe.PaymentIntent.capture(
+            intent = await sdk_executor.run(
+                "stripe",
+                stripe.PaymentIntent.capture,
                 payment_intent_id,
                 **capture_args
             )
@@ -107,6 +115,7 @@ class StripeService:
             log_error(logger, "stripe_capture_failed", error=str(e))
             return False
     
+    @instrumented
     async def cancel_payment(
         self,
         payment_intent_id: str
@@ -120,7 +129,7 @@ class StripeService:
         try:
             import stripe
             
-            intent = stripe.PaymentIntent.cancel(payment_intent_id)
+            intent = await sdk_executor.run("stripe", stripe.PaymentIntent.cancel, payment_intent_id)
             
             log_info(logger, "stripe_cancelled", payment_intent_id=payment_intent_id)
             return True
@@ -129,6 +138,7 @@ class StripeService:
             log_error(logger, "stripe_cancel_failed", error=str(e))
             return False
     
+    @instrumented
     async def create_payout(
         self,
         connected_account_id: str,
@@ -143,7 +153,9 @@ class StripeService:
         try:
             import stripe
             
-            payout = stripe.Payout.create(
+            payout = await sdk_executor.run(
+                "stripe",
+                stripe.Payout.create,
                 amount=int(amount * 100),
                 currency='eur',
                 stripe_account=connected_account_id
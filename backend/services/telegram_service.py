@@ -12,6 +12,9 @@ import os
 import logging
 from typing import Optional
 
+from metrics import instrumented
+from .http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 class TelegramService:
@@ -24,6 +27,7 @@ class TelegramService:
             logger.warning("⚠️  Telegram bot disabled: TELEGRAM_BOT_TOKEN not found in .env")
             logger.info("🤖 To enable Telegram: Get token from @BotFather on Telegram")
     
+    @instrumented
     async def send_message(
         self,
         chat_id: str,
@@ -36,20 +40,18 @@ class TelegramService:
             return True
         
         try:
-            import httpx
-            
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+            url = f"/bot{self.bot_token}/sendMessage"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    json={
-                        "chat_id": chat_id,
-                        "text": message,
-                        "parse_mode": "Markdown"
-                    }
-                )
-                response.raise_for_status()
+            client = http_clients.get("telegram")
+            response = await client.post(
+                url,
+                json={
+                    "chat_id": chat_id,
+                    "text": message,
+                    "parse_mode": "Markdown"
+                }
+            )
+            response.raise_for_status()
             
             logger.info(f"✅ Telegram message sent to {chat_id}")
             return True
@@ -5,11 +5,17 @@ This module calculates the fair Slotta amount based on:
 - Client reliability
 - Booking patterns
 - Slot demand
+
+The `*_batch` classmethods are NumPy counterparts of the scalar methods for
+pricing many rows at once. They return bit-identical results to the scalar
+path (see benchmarks/bench_slotta_batch.py).
 """
 
 from datetime import datetime
 from typing import Optional
 
+import numpy as np
+
 class SlottaEngine:
     
     # Base percentages by service duration
@@ -30,6 +36,17 @@ class SlottaEngine:
     MAX_PERCENTAGE = 0.70  # Never exceed 70% of service price
     MIN_AMOUNT = 10.0      # Minimum €10 for long services
     
+    # Integer codes for reliability tags in batch calls (any other code = no modifier)
+    RELIABILITY_CODES = ('new', 'reliable', 'needs-protection')
+    
+    # Cancellations at or above this count add MODIFIER_CANCELLATION_HISTORY
+    CANCELLATION_HISTORY_MIN = 2
+    CANCELLATION_BUCKETS = ('0-1', '2+')
+    
+    # Bump whenever the pricing rules above change; stored quote matrices
+    # with another version are ignored and recomputed
+    PRICING_VERSION = 1
+    
     @classmethod
     def calculate_base_slotta(cls, price: float, duration_minutes: int) -> float:
         """Calculate base Slotta based on service price and duration"""
@@ -71,7 +88,7 @@ class SlottaEngine:
             total_modifier += cls.MODIFIER_NEEDS_PROTECTION
         
         # Cancellation history
-        if cancellations >= 2:
+        if cancellations >= cls.CANCELLATION_HISTORY_MIN:
             total_modifier += cls.MODIFIER_CANCELLATION_HISTORY
         
         # Peak slot demand
@@ -138,7 +155,43 @@ class SlottaEngine:
         
         # Cap at 100
         return int(min(risk_score, 100))
-    
+
+    @classmethod
+    def calculate_risk_score_from_features(
+        cls,
+        features: dict,
+        booking_lead_time_hours: Optional[float] = None
+    ) -> int:
+        """Risk score 0-100 from a client_risk feature summary
+
+        Same weights as calculate_risk_score, but rates are the decayed
+        ones (old no-shows count less), the worse of the client's overall
+        and per-master rate is used once the client has a few bookings
+        with this master, and a booking made much closer to the slot than
+        the client usually books adds part of the short-lead penalty.
+        """
+        if not features or not features.get('total_bookings'):
+            return cls.calculate_risk_score(0, 0, 0, 0, booking_lead_time_hours)
+
+        no_show_rate = features.get('decayed_no_show_rate', 0.0)
+        cancellation_rate = features.get('decayed_cancellation_rate', 0.0)
+        if features.get('master_bookings', 0) >= 3:
+            no_show_rate = max(no_show_rate, features.get('master_no_show_rate', 0.0))
+            cancellation_rate = max(cancellation_rate, features.get('master_cancellation_rate', 0.0))
+
+        risk_score = no_show_rate * 60
+        risk_score += cancellation_rate * 20
+
+        if booking_lead_time_hours is not None:
+            if booking_lead_time_hours < 24:
+                risk_score += 20 * (1 - booking_lead_time_hours / 24)
+            else:
+                typical = features.get('typical_lead_time_hours')
+                if typical and booking_lead_time_hours < typical / 4:
+                    risk_score += 5
+
+        return int(min(risk_score, 100))
+
     @classmethod
     def determine_reliability(
         cls,
@@ -157,3 +210,169 @@ class SlottaEngine:
             return 'reliable'
         
         return 'new'
+    
+    # ------------------------------------------------------------------
+    # Batch (NumPy) counterparts
+    # ------------------------------------------------------------------
+    
+    @classmethod
+    def reliability_codes(cls, reliabilities) -> np.ndarray:
+        """Map reliability tags to RELIABILITY_CODES indexes (unknown = -1)"""
+        lookup = {tag: code for code, tag in enumerate(cls.RELIABILITY_CODES)}
+        return np.fromiter((lookup.get(r, -1) for r in reliabilities), dtype=np.int8)
+    
+    @staticmethod
+    def _round2(values: np.ndarray) -> np.ndarray:
+        """Vectorized round(x, 2) matching Python's correctly rounded result
+        
+        rint(x * 100) / 100 agrees with round() except when x * 100 lands
+        next to a .5 tie, where the multiplication error can flip the
+        direction; those few elements are recomputed with round().
+        """
+        scaled = values * 100
+        rounded = np.rint(scaled) / 100
+        near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6 * np.maximum(1.0, np.abs(scaled))
+        for i in np.flatnonzero(near_tie):
+            rounded[i] = round(float(values[i]), 2)
+        return rounded
+    
+    @classmethod
+    def calculate_base_slotta_batch(cls, prices, durations) -> np.ndarray:
+        prices = np.asarray(prices, dtype=np.float64)
+        durations = np.asarray(durations)
+        percentage = np.where(
+            durations < 60,
+            cls.BASE_PERCENTAGES['short'],
+            np.where(durations <= 180, cls.BASE_PERCENTAGES['medium'], cls.BASE_PERCENTAGES['long'])
+        )
+        return prices * percentage
+    
+    @classmethod
+    def calculate_slotta_batch(
+        cls,
+        prices,
+        durations,
+        reliability_codes,
+        cancellations,
+        peak_flags
+    ) -> np.ndarray:
+        """Array version of calculate_slotta (reliability as RELIABILITY_CODES indexes)"""
+        prices = np.asarray(prices, dtype=np.float64)
+        durations = np.asarray(durations)
+        reliability_codes = np.asarray(reliability_codes)
+        
+        base = cls.calculate_base_slotta_batch(prices, durations)
+        
+        # Modifiers are added in the scalar order so the float sums match exactly
+        total_modifier = np.zeros(prices.shape, dtype=np.float64)
+        total_modifier += np.select(
+            [reliability_codes == 1, reliability_codes == 0, reliability_codes == 2],
+            [cls.MODIFIER_RELIABLE, cls.MODIFIER_NEW_CLIENT, cls.MODIFIER_NEEDS_PROTECTION],
+            0.0
+        )
+        total_modifier += np.where(np.asarray(cancellations) >= cls.CANCELLATION_HISTORY_MIN, cls.MODIFIER_CANCELLATION_HISTORY, 0.0)
+        total_modifier += np.where(np.asarray(peak_flags, dtype=bool), cls.MODIFIER_PEAK_SLOT, 0.0)
+        
+        final_amount = base * (1 + total_modifier)
+        final_amount = np.minimum(final_amount, prices * cls.MAX_PERCENTAGE)
+        final_amount = np.where(durations >= 180, np.maximum(final_amount, cls.MIN_AMOUNT), final_amount)
+        
+        return cls._round2(final_amount)
+    
+    @classmethod
+    def calculate_risk_score_batch(
+        cls,
+        total_bookings,
+        completed_bookings,
+        no_shows,
+        cancellations,
+        booking_lead_time_hours=None
+    ) -> np.ndarray:
+        """Array version of calculate_risk_score (lead time NaN = unknown)"""
+        total = np.asarray(total_bookings, dtype=np.float64)
+        safe_total = np.where(total > 0, total, 1.0)
+        
+        risk_score = (np.asarray(no_shows, dtype=np.float64) / safe_total) * 60
+        risk_score = risk_score + (np.asarray(cancellations, dtype=np.float64) / safe_total) * 20
+        
+        if booking_lead_time_hours is not None:
+            lead = np.asarray(booking_lead_time_hours, dtype=np.float64)
+            short_lead = ~np.isnan(lead) & (lead != 0) & (lead < 24)
+            risk_score = np.where(short_lead, risk_score + 20 * (1 - lead / 24), risk_score)
+        
+        scores = np.trunc(np.minimum(risk_score, 100)).astype(np.int64)
+        return np.where(total == 0, 50, scores)
+    
+    @classmethod
+    def determine_reliability_batch(cls, total_bookings, no_shows) -> np.ndarray:
+        """Array version of determine_reliability, as RELIABILITY_CODES indexes"""
+        total = np.asarray(total_bookings)
+        no_shows = np.asarray(no_shows)
+        return np.select(
+            [total == 0, no_shows >= 2, (no_shows <= 1) & (total >= 3)],
+            [0, 2, 1],
+            0
+        ).astype(np.int8)
+    
+    # ------------------------------------------------------------------
+    # Per-service quote matrix
+    # ------------------------------------------------------------------
+    
+    @classmethod
+    def build_quote_matrix(cls, price: float, duration_minutes: int) -> dict:
+        """Every Slotta amount a service can quote
+        
+        amounts[reliability][cancellation bucket] = [off-peak, peak]
+        """
+        tiers = len(cls.RELIABILITY_CODES)
+        buckets = len(cls.CANCELLATION_BUCKETS)
+        # Rows ordered tier-major, then bucket, then peak flag
+        codes = np.repeat(np.arange(tiers), buckets * 2)
+        cancellations = np.tile(np.repeat([0, cls.CANCELLATION_HISTORY_MIN], 2), tiers)
+        peak_flags = np.tile([False, True], tiers * buckets)
+        amounts = cls.calculate_slotta_batch(
+            np.full(codes.shape, price, dtype=np.float64),
+            np.full(codes.shape, duration_minutes),
+            codes,
+            cancellations,
+            peak_flags
+        ).reshape(tiers, buckets, 2).tolist()
+        
+        return {
+            "version": cls.PRICING_VERSION,
+            "price": price,
+            "duration_minutes": duration_minutes,
+            "amounts": {
+                tier: dict(zip(cls.CANCELLATION_BUCKETS, amounts[i]))
+                for i, tier in enumerate(cls.RELIABILITY_CODES)
+            }
+        }
+    
+    @classmethod
+    def quote_for_service(
+        cls,
+        service: dict,
+        client_reliability: str = 'new',
+        cancellations: int = 0,
+        is_peak_slot: bool = False
+    ) -> float:
+        """Slotta amount for a service, from its quote matrix when it is current"""
+        
+        matrix = service.get('slotta_quotes')
+        if (
+            matrix
+            and matrix.get('version') == cls.PRICING_VERSION
+            and matrix.get('price') == service['price']
+            and matrix.get('duration_minutes') == service['duration_minutes']
+            and client_reliability in matrix['amounts']
+        ):
+            bucket = cls.CANCELLATION_BUCKETS[1 if cancellations >= cls.CANCELLATION_HISTORY_MIN else 0]
+            return matrix['amounts'][client_reliability][bucket][1 if is_peak_slot else 0]
+        
+        return cls.calculate_slotta(
+            price=service['price'],
+            duration_minutes=service['duration_minutes'],
+            client_reliability=client_reliability,
+            cancellations=cancellations,
+            is_peak_slot=is_peak_slot
+        )
@@ -0,0 +1,63 @@
+"""
+Availability Slot Grid Tests
+Tests:
+- Unaligned opening hours (09:07, 09:10) only yield starts on the
+  reservation bucket grid
+- Jumping past a busy interval that ends off the grid stays aligned
+- Working hours are read in the master's timezone and returned as naive UTC
+
+Pure functions, no server or database needed.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from availability import IntervalIndex, free_slots  # noqa: E402
+from reservations import is_aligned  # noqa: E402
+
+# Monday
+DAY_START = datetime(2025, 1, 6, 0, 0)
+DAY_END = datetime(2025, 1, 7, 0, 0)
+
+
+def _slots(settings, busy=(), duration_minutes=30):
+    return free_slots(IntervalIndex(busy), DAY_START, DAY_END, duration_minutes, settings=settings)
+
+
+class TestSlotAlignment:
+    """Candidate starts always satisfy claim_slot's bucket alignment"""
+
+    def test_unaligned_opening_rounds_up(self):
+        slots = _slots({"working_hours": {"start": "09:07", "end": "11:00"}, "slot_step_minutes": 30, "timezone": "UTC"})
+        assert slots[0] == datetime(2025, 1, 6, 9, 10)
+        assert slots == [datetime(2025, 1, 6, 9, 10), datetime(2025, 1, 6, 9, 40), datetime(2025, 1, 6, 10, 10)]
+        assert all(is_aligned(slot) for slot in slots)
+
+    def test_bucket_aligned_opening_kept(self):
+        slots = _slots({"working_hours": {"start": "09:10", "end": "10:00"}, "slot_step_minutes": 15, "timezone": "UTC"})
+        assert slots == [datetime(2025, 1, 6, 9, 10), datetime(2025, 1, 6, 9, 25)]
+
+    def test_jump_past_unaligned_busy_end(self):
+        busy = [(datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 9, 47))]
+        slots = _slots(
+            {"working_hours": {"start": "09:00", "end": "11:00"}, "slot_step_minutes": 5, "timezone": "UTC"},
+            busy=busy
+        )
+        assert slots[0] == datetime(2025, 1, 6, 9, 50)
+        assert all(is_aligned(slot) for slot in slots)
+
+
+class TestMasterTimezone:
+    """Working hours are local to the master"""
+
+    def test_hours_converted_to_utc(self):
+        slots = _slots({"working_hours": {"start": "09:00", "end": "10:00"}, "timezone": "America/New_York"})
+        # EST is UTC-5 in January
+        assert slots == [datetime(2025, 1, 6, 14, 0), datetime(2025, 1, 6, 14, 30)]
+
+    def test_invalid_timezone_falls_back_to_utc(self):
+        slots = _slots({"working_hours": {"start": "09:00", "end": "10:00"}, "timezone": "Not/AZone"})
+        assert slots == [datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 9, 30)]
@@ -0,0 +1,104 @@
+"""
+Streaming Export Tests
+Tests:
+- GET /api/export/master/{id}/{kind} rejects other masters (403), unknown
+  kinds (404) and unknown formats (400)
+- CSV starts with the column header row
+- Text cells that would be spreadsheet formulas are neutralised in CSV
+
+Runs in-process against the FastAPI app (no server or database needed).
+"""
+
+import asyncio
+import csv
+import io
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "slotta_test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from exports import EXPORT_KINDS, _csv_rows  # noqa: E402
+from server import app, get_current_master  # noqa: E402
+
+MASTER = {"id": "master-1", "email": "export@slotta.app", "subscription_active": True}
+
+
+class _Cursor:
+    """Async iterator standing in for a Motor cursor"""
+
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def _read_csv(docs, columns):
+    async def collect():
+        return b"".join([chunk async for chunk in _csv_rows(_Cursor(docs), columns)])
+    return list(csv.reader(io.StringIO(asyncio.run(collect()).decode())))
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_current_master] = lambda: MASTER
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_current_master, None)
+
+
+class TestExportEndpoint:
+    """Validation before any data is streamed"""
+
+    def test_other_master_forbidden(self, client):
+        response = client.get("/api/export/master/someone-else/bookings")
+        assert response.status_code == 403
+
+    def test_unknown_kind_not_found(self, client):
+        response = client.get(f"/api/export/master/{MASTER['id']}/invoices")
+        assert response.status_code == 404
+
+    def test_unknown_format_rejected(self, client):
+        response = client.get(f"/api/export/master/{MASTER['id']}/bookings", params={"format": "xlsx"})
+        assert response.status_code == 400
+
+
+class TestCsvRows:
+    """CSV encoding of exported documents"""
+
+    def test_header_row(self):
+        _, _, columns = EXPORT_KINDS["bookings"]
+        rows = _read_csv([], columns)
+        assert rows == [columns]
+
+    def test_formula_cells_escaped(self):
+        columns = ["id", "notes", "amount", "created_at"]
+        rows = _read_csv([{
+            "id": "b1",
+            "notes": "=HYPERLINK(\"http://evil\")",
+            "amount": -12.5,
+            "created_at": datetime(2025, 1, 2, 3, 4)
+        }, {
+            "id": "b2",
+            "notes": "@SUM(A1)",
+            "amount": None
+        }], columns)
+
+        assert rows[0] == columns
+        assert rows[1] == ["b1", "'=HYPERLINK(\"http://evil\")", "-12.5", "2025-01-02T03:04:00"]
+        assert rows[2] == ["b2", "'@SUM(A1)", "", ""]
@@ -0,0 +1,56 @@
+"""
+Rate Limiter Route Cost Tests
+Tests:
+- Every DEFAULT_ROUTE_COSTS entry matches at least one real app route
+- The expensive endpoints resolve to their configured cost, others to 1
+
+Runs in-process against the FastAPI app (no server or database needed).
+"""
+
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "slotta_test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+from fastapi.routing import APIRoute  # noqa: E402
+
+from rate_limiter import DEFAULT_ROUTE_COSTS, RouteCosts  # noqa: E402
+from server import app  # noqa: E402
+
+
+def _concrete_path(template: str) -> str:
+    """/api/export/master/{master_id}/{kind} -> /api/export/master/x/x"""
+    return re.sub(r"\{[^}]+\}", "x", template)
+
+
+@pytest.fixture(scope="module")
+def app_routes():
+    return [
+        (method, _concrete_path(route.path))
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    ]
+
+
+class TestRouteCosts:
+    """Route cost keys against the routes the app actually serves"""
+
+    @pytest.mark.parametrize("key", sorted(DEFAULT_ROUTE_COSTS))
+    def test_cost_key_matches_a_route(self, key, app_routes):
+        method, prefix = key.split(" ", 1)
+        matches = [path for route_method, path in app_routes if route_method == method and path.startswith(prefix)]
+        assert matches, f"Route cost '{key}' matches no app route"
+
+    def test_costs_resolve_for_real_routes(self):
+        costs = RouteCosts(DEFAULT_ROUTE_COSTS)
+        assert costs.cost("GET", "/api/export/master/m1/bookings") == DEFAULT_ROUTE_COSTS["GET /api/export"]
+        assert costs.cost("POST", "/api/bookings/with-payment") == DEFAULT_ROUTE_COSTS["POST /api/bookings"]
+        assert costs.cost("POST", "/api/auth/login") == DEFAULT_ROUTE_COSTS["POST /api/auth/login"]
+        assert costs.cost("GET", "/api/bookings/master/m1") == 1
+        assert costs.cost("GET", "/api/health") == 1
@@ -0,0 +1,142 @@
+"""
+Slot Reservation Concurrency Tests
+Tests:
+- Parallel POST /api/bookings/with-payment at one slot -> exactly one wins
+- Losers get 409 and never receive a payment intent
+- The claimed slot disappears from GET /api/availability
+
+Requires a master with an active subscription and at least one active service
+(defaults to the seeded demo master `sophiabrown`). Each test books its own
+slot and cancels what it created, logged in as that master.
+
+The burst defaults to 200 bookings (SLOTTA_STRESS_BOOKINGS), sent from up
+to 100 threads. All requests come from one IP, so with the default rate limit
+(120 requests / 60s, a booking costs 3) most are answered 429; those are
+counted separately from slot conflicts, and at least one request must reach
+the conflict path.
+"""
+
+import pytest
+import requests
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+MASTER_SLUG = os.environ.get('SLOTTA_TEST_MASTER_SLUG', 'sophiabrown')
+MASTER_EMAIL = os.environ.get('SLOTTA_TEST_MASTER_EMAIL', 'sophia@slotta.app')
+MASTER_PASSWORD = os.environ.get('SLOTTA_TEST_MASTER_PASSWORD', 'demo123')
+PARALLEL_BOOKINGS = int(os.environ.get('SLOTTA_STRESS_BOOKINGS', '200'))
+
+
+def _next_open_slot(days_ahead: int) -> datetime:
+    """A weekday 16:00 UTC slot (inside the demo master's New York hours), far enough ahead to avoid other test data"""
+    slot = (datetime.utcnow() + timedelta(days=days_ahead)).replace(hour=16, minute=0, second=0, microsecond=0)
+    while slot.weekday() == 6:
+        slot += timedelta(days=1)
+    return slot
+
+
+def _random_slot() -> datetime:
+    # Spread runs across the calendar so reruns don't collide
+    return _next_open_slot(30 + uuid.uuid4().int % 300)
+
+
+def _book(master: dict, service: dict, slot: datetime, client_email: str) -> requests.Response:
+    return requests.post(f"{BASE_URL}/api/bookings/with-payment", json={
+        "master_id": master["id"],
+        "service_id": service["id"],
+        "booking_date": slot.isoformat(),
+        "client_name": "Stress Client",
+        "client_email": client_email,
+        "payment_method_id": "pm_card_visa"
+    }, timeout=60)
+
+
+def _cancel(token: str, booking_id: str):
+    response = requests.put(
+        f"{BASE_URL}/api/bookings/{booking_id}/cancel",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200, f"Cleanup failed for {booking_id}: {response.text}"
+
+
+class TestSlotReservationConcurrency:
+    """Double-booking prevention under concurrent load"""
+
+    @pytest.fixture(scope="class")
+    def booking_target(self):
+        master_response = requests.get(f"{BASE_URL}/api/masters/{MASTER_SLUG}")
+        if master_response.status_code != 200:
+            pytest.skip(f"Master '{MASTER_SLUG}' not available")
+        master = master_response.json()
+
+        services_response = requests.get(f"{BASE_URL}/api/services/master/{master['id']}")
+        services = services_response.json() if services_response.status_code == 200 else []
+        if not services:
+            pytest.skip("Master has no active services")
+
+        login_response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": MASTER_EMAIL,
+            "password": MASTER_PASSWORD
+        })
+        if login_response.status_code != 200:
+            pytest.skip(f"Cannot log in as '{MASTER_EMAIL}' to clean up bookings")
+
+        return {"master": master, "service": services[0], "token": login_response.json()["token"]}
+
+    def test_parallel_bookings_single_winner(self, booking_target):
+        """Fire parallel bookings at one slot and verify exactly one succeeds"""
+        master = booking_target["master"]
+        service = booking_target["service"]
+        slot = _random_slot()
+        run_id = uuid.uuid4().hex[:8]
+
+        def book(i):
+            return _book(master, service, slot, f"stress_{run_id}_{i}@slotta.app")
+
+        with ThreadPoolExecutor(max_workers=min(PARALLEL_BOOKINGS, 100)) as pool:
+            responses = list(pool.map(book, range(PARALLEL_BOOKINGS)))
+
+        statuses = [r.status_code for r in responses]
+        winners = [r for r in responses if r.status_code == 200]
+        try:
+            if 402 in statuses:
+                pytest.skip("Master subscription is not active")
+
+            losers = [r for r in responses if r.status_code == 409]
+            rate_limited = [r for r in responses if r.status_code == 429]
+
+            assert len(winners) == 1, f"Expected exactly one winner, got {len(winners)}: {set(statuses)}"
+            assert losers, f"No request reached the slot conflict path: {set(statuses)}"
+            assert len(losers) + len(rate_limited) == PARALLEL_BOOKINGS - 1, f"Unexpected statuses: {set(statuses)}"
+            assert all("payment_intent_id" not in r.json() for r in losers)
+            print(f"✅ {PARALLEL_BOOKINGS} parallel bookings -> 1 winner, {len(losers)} rejected, {len(rate_limited)} rate limited")
+        finally:
+            for winner in winners:
+                _cancel(booking_target["token"], winner.json()["id"])
+
+    def test_claimed_slot_not_offered(self, booking_target):
+        """Verify a booked slot is no longer returned by availability"""
+        master = booking_target["master"]
+        service = booking_target["service"]
+        slot = _random_slot()
+
+        booking_response = _book(master, service, slot, f"slot_{uuid.uuid4().hex[:8]}@slotta.app")
+        if booking_response.status_code == 402:
+            pytest.skip("Master subscription is not active")
+        assert booking_response.status_code == 200, booking_response.text
+
+        try:
+            response = requests.get(f"{BASE_URL}/api/availability/{master['id']}", params={
+                "service_id": service["id"],
+                "from": (slot - timedelta(hours=1)).isoformat(),
+                "to": (slot + timedelta(hours=2)).isoformat()
+            })
+            assert response.status_code == 200
+            offered = [datetime.fromisoformat(s) for s in response.json()["slots"]]
+            assert slot not in offered
+            print(f"✅ Slot {slot.isoformat()} no longer offered")
+        finally:
+            _cancel(booking_target["token"], booking_response.json()["id"])
@@ -0,0 +1,106 @@
+"""Wallet Ledger
+
+`transactions` is the append-only ledger. To avoid summing a master's whole
+history on every wallet read, running totals are periodically frozen into
+`wallet_checkpoints`:
+
+    balance = latest checkpoint + sum(transactions created after checkpoint)
+
+The delta is an indexed range query on (master_id, created_at) and is
+bounded by CHECKPOINT_INTERVAL, so a read costs the same for 50 or 500,000
+transactions. Checkpoints only cover transactions older than SETTLE_SECONDS
+so a write that lands slightly out of order is never skipped.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+from logging_utils import log_info, log_error
+
+CREDIT_TYPES = ["wallet_credit", "payout_received"]
+PAYOUT_TYPES = ["payout"]
+
+CHECKPOINT_INTERVAL = int(os.getenv("WALLET_CHECKPOINT_INTERVAL", "200"))
+SETTLE_SECONDS = int(os.getenv("WALLET_CHECKPOINT_SETTLE_SECONDS", "60"))
+
+
+def _totals_pipeline(match: dict) -> list:
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": None,
+            "credits": {"$sum": {"$cond": [{"$in": ["$type", CREDIT_TYPES]}, "$amount", 0]}},
+            # Payouts are stored as negative amounts; count their magnitude
+            "payouts": {"$sum": {"$cond": [{"$in": ["$type", PAYOUT_TYPES]}, {"$abs": "$amount"}, 0]}},
+            "count": {"$sum": 1}
+        }}
+    ]
+
+
+async def _sum_range(db, master_id: str, after: Optional[datetime], until: Optional[datetime] = None) -> dict:
+    created_at = {}
+    if after:
+        created_at["$gt"] = after
+    if until:
+        created_at["$lte"] = until
+    match = {"master_id": master_id}
+    if created_at:
+        match["created_at"] = created_at
+
+    result = await db.transactions.aggregate(_totals_pipeline(match)).to_list(1)
+    if not result:
+        return {"credits": 0.0, "payouts": 0.0, "count": 0}
+    return result[0]
+
+
+async def _latest_checkpoint(db, master_id: str) -> Optional[dict]:
+    return await db.wallet_checkpoints.find_one(
+        {"master_id": master_id},
+        {"_id": 0},
+        sort=[("as_of", -1)]
+    )
+
+
+async def write_checkpoint(db, master_id: str, checkpoint: Optional[dict] = None) -> dict:
+    """Freeze totals up to (now - SETTLE_SECONDS) into a new checkpoint"""
+    as_of = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+    previous_as_of = checkpoint["as_of"] if checkpoint else None
+    if previous_as_of and previous_as_of >= as_of:
+        return checkpoint
+
+    delta = await _sum_range(db, master_id, previous_as_of, as_of)
+    new_checkpoint = {
+        "master_id": master_id,
+        "as_of": as_of,
+        "credits": (checkpoint or {}).get("credits", 0.0) + delta["credits"],
+        "payouts": (checkpoint or {}).get("payouts", 0.0) + delta["payouts"],
+        "count": (checkpoint or {}).get("count", 0) + delta["count"],
+        "created_at": datetime.utcnow()
+    }
+    await db.wallet_checkpoints.insert_one(dict(new_checkpoint))
+    log_info(logger, "wallet_checkpoint_written", master_id=master_id, count=new_checkpoint["count"])
+    return new_checkpoint
+
+
+async def get_wallet_totals(db, master_id: str) -> dict:
+    """Return {credits, payouts, balance} for a master"""
+    checkpoint = await _latest_checkpoint(db, master_id)
+    delta = await _sum_range(db, master_id, checkpoint["as_of"] if checkpoint else None)
+
+    credits = (checkpoint or {}).get("credits", 0.0) + delta["credits"]
+    payouts = (checkpoint or {}).get("payouts", 0.0) + delta["payouts"]
+
+    if delta["count"] >= CHECKPOINT_INTERVAL:
+        try:
+            await write_checkpoint(db, master_id, checkpoint)
+        except Exception as e:
+            log_error(logger, "wallet_checkpoint_failed", master_id=master_id, error=str(e))
+
+    return {
+        "credits": credits,
+        "payouts": payouts,
+        "balance": credits - payouts
+    }
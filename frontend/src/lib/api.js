@@ -211,8 +211,8 @@ export const analyticsAPI = {
 
 export const walletAPI = {
   getWallet: (masterId) => api.get(`/wallet/master/${masterId}`),
-  getTransactions: (masterId, limit = 50, offset = 0) => 
-    api.get(`/transactions/master/${masterId}`, { params: { limit, offset } }),
+  getTransactions: (masterId, limit = 50, cursor = undefined) => 
+    api.get(`/transactions/master/${masterId}`, { params: { limit, cursor } }),
 };
 
 // =============================================================================